@@ -0,0 +1,229 @@
+"""
+准入控制与背压
+
+- 每类模型（tts / stt）限制同时推理的请求数，超出的请求在有界队列中等待
+- 队列已满时立即返回 503 并附带 Retry-After，而不是让所有请求一起超时
+- 试听请求只能使用一部分队列，并且排在正式合成之后，负载高时最先被拒绝
+- 每个 API Key（请求头 X-API-Key 或 Authorization: Bearer）或客户端 IP 有独立的令牌桶，超出速率返回 429
+
+所有状态只在事件循环线程中修改，不需要加锁。
+"""
+import math
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException, Request
+from config import ADMISSION_LIMITS, RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+PRIORITY_FULL = 0
+PRIORITY_PREVIEW = 1
+
+# 令牌桶数量超过该值时清理已经回满的桶
+_MAX_BUCKETS = 10000
+
+
+def _reject(status_code: int, detail: str, retry_after: float):
+    raise HTTPException(status_code=status_code, detail=detail,
+                        headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+class AdmissionQueue:
+    """某一类模型的并发上限与等待队列"""
+
+    def __init__(self, name: str, max_in_flight: int, max_queue: int, preview_queue: int):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.preview_queue = preview_queue
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        # 平均处理耗时（指数滑动平均），用于估算 Retry-After
+        self._avg_seconds = 1.0
+        self.admitted = 0
+        self.rejected = 0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def expected_wait(self) -> float:
+        """按平均处理耗时估算新请求需要等待的秒数"""
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            return 0.0
+        return self._avg_seconds * (len(self._waiters) + 1) / self.max_in_flight
+
+    async def acquire(self, priority: int):
+        """获取推理名额，队列已满时抛出 503"""
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+
+        limit = self.max_queue if priority == PRIORITY_FULL else self.preview_queue
+        if len(self._waiters) >= limit and priority == PRIORITY_FULL:
+            self._shed_preview()
+        if len(self._waiters) >= limit:
+            self.rejected += 1
+            kind = "试听" if priority == PRIORITY_PREVIEW else "请求"
+            logger.warning("[准入控制] %s 队列已满（%d 等待），拒绝%s", self.name, len(self._waiters), kind)
+            _reject(503, "服务繁忙，请稍后重试", self.expected_wait())
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._seq), future)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 名额已经转交过来，但请求被取消，交给下一个等待者
+                self.release()
+            elif entry in self._waiters:
+                # 取消后到这里之前 release() 可能已经弹出并跳过了这个条目
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+        self.admitted += 1
+
+    def _shed_preview(self):
+        """队列已满时，让最晚进入队列的试听请求让出位置"""
+        previews = [entry for entry in self._waiters if entry[0] == PRIORITY_PREVIEW and not entry[2].done()]
+        if not previews:
+            return
+        entry = max(previews, key=lambda e: e[1])
+        self._waiters.remove(entry)
+        heapq.heapify(self._waiters)
+        self.rejected += 1
+        logger.warning("[准入控制] %s 队列已满，丢弃一个排队中的试听请求", self.name)
+        entry[2].set_exception(HTTPException(status_code=503, detail="服务繁忙，试听请求已取消，请稍后重试",
+                                             headers={"Retry-After": str(max(1, math.ceil(self.expected_wait())))}))
+
+    def release(self, elapsed: Optional[float] = None):
+        """释放名额：有等待者时直接转交给优先级最高的等待者"""
+        if elapsed is not None:
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * elapsed
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def status(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "preview_queue": self.preview_queue,
+            "avg_seconds": round(self._avg_seconds, 3),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+class TokenBucket:
+    """令牌桶：每秒补充 rate 个令牌，最多积攒 burst 个"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> float:
+        """取一个令牌；成功返回 0，否则返回需要等待的秒数"""
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def is_full(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class AdmissionController:
+    """按模型类别的准入队列 + 按客户端的令牌桶"""
+
+    def __init__(self, limits: Dict[str, dict], rate: float, burst: float):
+        self.queues = {
+            name: AdmissionQueue(name, cfg["max_in_flight"], cfg["max_queue"], cfg["preview_queue"])
+            for name, cfg in limits.items()
+        }
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+        self.rate_limited = 0
+
+    @staticmethod
+    def client_key(request: Request) -> str:
+        """限流对象：优先使用 API Key，其次是客户端 IP"""
+        api_key = request.headers.get("x-api-key")
+        if not api_key:
+            auth = request.headers.get("authorization", "")
+            if auth.lower().startswith("bearer "):
+                api_key = auth[7:].strip()
+        if api_key:
+            return f"key:{api_key}"
+        return f"ip:{request.client.host if request.client else 'unknown'}"
+
+    def check_rate(self, request: Request):
+        """扣减令牌，超出速率时抛出 429"""
+        if self.rate <= 0:
+            return
+        key = self.client_key(request)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= _MAX_BUCKETS:
+                now = time.monotonic()
+                self._buckets = {k: b for k, b in self._buckets.items() if not b.is_full(now)}
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+        wait = bucket.take()
+        if wait > 0:
+            self.rate_limited += 1
+            _reject(429, "请求过于频繁，请稍后重试", wait)
+
+    @asynccontextmanager
+    async def admit(self, request: Request, model_class: str, preview: bool = False, check_rate: bool = True):
+        """限流并占用一个推理名额，with 块结束时释放
+
+        Args:
+            check_rate: 是否扣减令牌（同一请求的后续推理阶段传 False，避免重复计数）
+
+        Raises:
+            HTTPException: 429（超出速率）或 503（队列已满）
+        """
+        if check_rate:
+            self.check_rate(request)
+        queue = self.queues[model_class]
+        await queue.acquire(PRIORITY_PREVIEW if preview else PRIORITY_FULL)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            queue.release(time.perf_counter() - start)
+
+    def status(self) -> dict:
+        return {
+            "queues": {name: queue.status() for name, queue in self.queues.items()},
+            "rate_limit": {
+                "per_second": self.rate,
+                "burst": self.burst,
+                "clients": len(self._buckets),
+                "rejected": self.rate_limited,
+            },
+        }
+
+
+admission = AdmissionController(ADMISSION_LIMITS, RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
@@ -0,0 +1,55 @@
+"""
+管理 API 路由 - 运行时诊断
+"""
+import json
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, Response
+from config import PROFILE_MAX_SECONDS, ADMIN_ALLOW_REMOTE
+from tracing import sample_profile, to_collapsed, to_speedscope
+from logs import get_logger
+
+router = APIRouter()
+logger = get_logger(__name__)
+
+_LOCAL_HOSTS = ("127.0.0.1", "::1", "localhost")
+
+
+def _require_local(request: Request):
+    """管理接口默认只对本机开放"""
+    if ADMIN_ALLOW_REMOTE:
+        return
+    host = request.client.host if request.client else ""
+    if host not in _LOCAL_HOSTS:
+        raise HTTPException(status_code=403, detail="管理接口仅允许本机访问")
+
+
+@router.get("/admin/profile")
+async def profile(request: Request, seconds: float = 10.0, format: str = "collapsed", interval: float = 0.005):
+    """对整个进程做 seconds 秒的采样分析，返回 collapsed stack 或 speedscope 文件"""
+    _require_local(request)
+    if format not in ("collapsed", "speedscope"):
+        raise HTTPException(status_code=400, detail="format 只能是 collapsed 或 speedscope")
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds 必须在 0 到 {PROFILE_MAX_SECONDS} 之间")
+    if not 0.001 <= interval <= 1:
+        raise HTTPException(status_code=400, detail="interval 必须在 0.001 到 1 之间")
+
+    logger.info("[采样分析] 开始: %s 秒，间隔 %s 秒", seconds, interval)
+    try:
+        # 在线程池中采样，事件循环照常处理请求，也会被采样到
+        samples = await run_in_threadpool(sample_profile, seconds, interval)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    logger.info("[采样分析] 完成: %d 个样本", sum(samples.values()))
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if format == "speedscope":
+        content = json.dumps(to_speedscope(samples, interval, f"qwen3-tts {timestamp}"), ensure_ascii=False)
+        return Response(content, media_type="application/json", headers={
+            "Content-Disposition": f'attachment; filename="profile_{timestamp}.speedscope.json"'
+        })
+    return PlainTextResponse(to_collapsed(samples), headers={
+        "Content-Disposition": f'attachment; filename="profile_{timestamp}.collapsed.txt"'
+    })
@@ -3,20 +3,25 @@
 """
 import os
 import re
-import gc
 import time
 import uuid
 import shutil
-import traceback
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from mlx_audio.tts.generate import generate_audio
+from typing import Optional
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Request
+from fastapi.concurrency import run_in_threadpool
 from config import BASE_DIR, VOICES_DIR, MODELS, TMP_DIR
-from models import load_model_cached
-from utils import cleanup_temp_files, convert_audio_if_needed, save_audio_file, get_temp_path, get_speaker_language_code, detect_language_from_text
+from utils import cleanup_temp_files, convert_audio_if_needed, save_audio_file, get_temp_path, get_speaker_language_code, unique_stem
 from history import save_history_item
+from quality import quality_policy, QUALITY_AUTO
+from postprocess import parse_options
+from langseg import plan_language_runs
+from memory import governor
+from synthesis import synthesize_shared, get_cloned_voice_reference, read_unit_stats
+from logs import get_logger
 
 router = APIRouter()
+logger = get_logger(__name__)
 
 
 @router.post("/clone")
@@ -96,8 +101,7 @@ async def clone_voice(
             cleanup_temp_files(wav_path)
         raise
     except Exception as e:
-        print(f"Clone Voice Error: {str(e)}")
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.exception("Clone Voice Error: %s", e)
         # 确保清理临时文件
         if temp_input:
             cleanup_temp_files(temp_input, wav_path if wav_path and wav_path != temp_input else None)
@@ -108,52 +112,52 @@ async def clone_voice(
 
 @router.post("/tts/clone")
 async def tts_with_cloned_voice(
+    http_request: Request,
     text: str = Form(...),
     voice_name: str = Form(...),
     use_lite: bool = Form(False),
-    preview: bool = Form(False)
+    preview: bool = Form(False),
+    quality: str = Form(QUALITY_AUTO),
+    postprocess: Optional[str] = Form(None),
+    language_routing: Optional[bool] = Form(None)
 ):
     """使用克隆音色生成语音"""
     if not text.strip():
         raise HTTPException(status_code=400, detail="文案不能为空")
+    options = parse_options(postprocess)
 
-    ref_audio = os.path.join(VOICES_DIR, f"{voice_name}.wav")
-    ref_txt = os.path.join(VOICES_DIR, f"{voice_name}.txt")
-
-    if not os.path.exists(ref_audio):
-        raise HTTPException(status_code=404, detail=f"音色未找到: {voice_name}")
-
-    ref_text = "."
-    if os.path.exists(ref_txt):
-        with open(ref_txt, 'r', encoding='utf-8') as f:
-            ref_text = f.read().strip()
+    ref_audio, ref_text = get_cloned_voice_reference(voice_name)
+    use_lite = quality_policy.choose("clone", use_lite, quality)
+    model_type = "lite" if use_lite else "pro"
 
     # 优先使用音色的语言属性，如果音色支持多语言，则根据文本检测
     # 对于克隆音色，使用音色名称和当前文本进行语言检测
     lang_code = get_speaker_language_code(voice_name, text)
+    # 混合语言文本按语言分段，克隆音色不更换，只按段设置 lang_code
+    language_runs = plan_language_runs(text, enabled=language_routing)
 
     temp_dir = None
     try:
-        model = load_model_cached("clone", use_lite)
-
-        temp_dir = get_temp_path("temp_clone")
-        os.makedirs(temp_dir, exist_ok=True)
         # 使用克隆音色名称作为 voice 参数（用于日志显示）
         # 虽然 ref_audio 和 ref_text 是主要参数，但 voice 参数会影响日志输出
-        generate_audio(
-            model=model,
-            text=text,
+        temp_dir = await synthesize_shared(
+            http_request,
+            "clone",
+            use_lite,
+            text,
+            prefix="temp_clone",
+            preview=preview,
+            language_runs=language_runs,
             voice=voice_name,  # 使用克隆音色名称，而不是默认的 'af_heart'
             ref_audio=ref_audio,
             ref_text=ref_text,
-            lang_code=lang_code,
-            output_path=temp_dir
+            lang_code=lang_code
         )
 
         if preview:
             # 预览音频保存在 tmp 目录下
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            audio_filename = f"preview_clone_{timestamp}.wav"
+            audio_filename = unique_stem(TMP_DIR, f"preview_clone_{timestamp}", [".wav"]) + ".wav"
             audio_path = os.path.join(TMP_DIR, audio_filename)
 
             source_file = os.path.join(temp_dir, "audio_000.wav")
@@ -163,18 +167,22 @@ async def tts_with_cloned_voice(
             cleanup_temp_files(temp_dir)
             temp_dir = None
 
-            gc.collect()
+            governor.request_check()
 
             relative_path = os.path.relpath(audio_path, BASE_DIR)
 
             return {
                 "success": True,
                 "audio_path": relative_path,
+                "model_type": model_type,
                 "is_preview": True
             }
         else:
-            model_info = MODELS["clone"]["lite" if use_lite else "pro"]
-            audio_path = save_audio_file(temp_dir, model_info["output_subfolder"], text)
+            model_info = MODELS["clone"][model_type]
+            units = read_unit_stats(temp_dir)
+            # 后处理在线程池中执行，不阻塞事件循环
+            audio_path = await run_in_threadpool(save_audio_file, temp_dir, model_info["output_subfolder"], text,
+                                                 options)
             temp_dir = None
 
             history_item = {
@@ -184,20 +192,26 @@ async def tts_with_cloned_voice(
                 "emotion": "克隆",
                 "speed": 1.0,
                 "audio_path": audio_path,
+                "model_type": model_type,
                 "created_at": datetime.now().isoformat()
             }
             save_history_item(history_item)
 
-            gc.collect()
+            governor.request_check()
 
             return {
                 "success": True,
                 "audio_path": audio_path,
+                "model_type": model_type,
+                "units": units,
                 "history_id": history_item["id"]
             }
+    except HTTPException:
+        if temp_dir:
+            cleanup_temp_files(temp_dir)
+        raise
     except Exception as e:
-        print(f"Clone TTS Error: {str(e)}")
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.exception("Clone TTS Error: %s", e)
         if temp_dir:
             cleanup_temp_files(temp_dir)
         raise HTTPException(status_code=500, detail=str(e))
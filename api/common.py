@@ -3,17 +3,26 @@
 """
 from fastapi import APIRouter
 from datetime import datetime
-from config import EMOTION_OPTIONS, SPEED_OPTIONS, LANGUAGE_OPTIONS
+from config import EMOTION_OPTIONS, SPEED_OPTIONS, LANGUAGE_OPTIONS, MODEL_CLASSES, WORKER_MODELS
 from models import get_models_status
 from history import get_all_speakers
+from memory import governor
+import weights
+from admission import admission
+from nodes import node_pool
+from synthesis import synthesis_flights
+from sentence_cache import sentence_cache
+from quality import quality_policy
+from api.stt import transcription_flights
 
 router = APIRouter()
 
 
 @router.get("/health")
 async def health_check():
-    """健康检查"""
-    return {"status": "ok", "timestamp": datetime.now().isoformat()}
+    """健康检查（models 为本进程负责的模型类别）"""
+    models = sorted(WORKER_MODELS) if WORKER_MODELS is not None else MODEL_CLASSES
+    return {"status": "ok", "timestamp": datetime.now().isoformat(), "models": models}
 
 
 @router.get("/config")
@@ -37,3 +46,30 @@ async def get_models_status_api():
     """获取模型加载状态"""
     return get_models_status()
 
+
+
+@router.get("/memory/status")
+async def get_memory_status():
+    """获取内存占用、回收统计与已映射的模型权重"""
+    status = governor.status()
+    status["weights"] = weights.status()
+    return status
+
+
+@router.get("/admission/status")
+async def get_admission_status():
+    """获取各模型队列、限流、相同请求合并、质量选择与分段缓存的状态"""
+    status = admission.status()
+    status["coalescing"] = {
+        "synthesis": synthesis_flights.status(),
+        "transcription": transcription_flights.status(),
+    }
+    status["quality"] = quality_policy.status()
+    status["sentence_cache"] = sentence_cache.status()
+    return status
+
+
+@router.get("/nodes/status")
+async def get_nodes_status():
+    """远程推理节点状态"""
+    return node_pool.status()
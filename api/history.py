@@ -2,10 +2,10 @@
 历史记录 API 路由
 """
 import os
-import json
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response
 from config import BASE_DIR
-from history import get_history, HISTORY_FILE
+from history import get_history_json, get_history_item, delete_history_item
 
 router = APIRouter()
 
@@ -13,38 +13,26 @@ router = APIRouter()
 @router.get("/history")
 async def get_history_api():
     """获取生成历史（包括 TTS 和 STT）"""
-    return {"history": get_history()}
+    return Response('{"history":' + get_history_json() + '}', media_type="application/json")
 
 
 @router.get("/history/stt")
 async def get_stt_history_api():
     """获取 STT 历史记录"""
-    history = get_history()
-    stt_history = [item for item in history if item.get("type") == "stt"]
-    return {"history": stt_history}
+    return Response('{"history":' + get_history_json("stt") + '}', media_type="application/json")
 
 
 @router.delete("/history/{history_id}")
 async def delete_history(history_id: str):
     """删除历史记录"""
-    history = get_history()
-    for item in history:
-        if item["id"] == history_id:
-            if "audio_path" in item:
-                audio_path = os.path.join(BASE_DIR, item["audio_path"]) if not item["audio_path"].startswith('/') else item["audio_path"]
-                if os.path.exists(audio_path):
-                    os.remove(audio_path)
-            if "txt_path" in item:
-                txt_path = os.path.join(BASE_DIR, item["txt_path"]) if not item["txt_path"].startswith('/') else item["txt_path"]
-                if os.path.exists(txt_path):
-                    os.remove(txt_path)
-            if "srt_path" in item:
-                srt_path = os.path.join(BASE_DIR, item["srt_path"]) if not item["srt_path"].startswith('/') else item["srt_path"]
-                if os.path.exists(srt_path):
-                    os.remove(srt_path)
-            history.remove(item)
-            with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-                json.dump(history, f, ensure_ascii=False, indent=2)
-            return {"success": True}
-    raise HTTPException(status_code=404, detail="历史记录未找到")
-
+    item = get_history_item(history_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="历史记录未找到")
+
+    for key in ("audio_path", "txt_path", "srt_path"):
+        if key in item:
+            path = os.path.join(BASE_DIR, item[key]) if not item[key].startswith('/') else item[key]
+            if os.path.exists(path):
+                os.remove(path)
+    delete_history_item(history_id)
+    return {"success": True}
@@ -0,0 +1,14 @@
+"""
+监控指标 API 路由
+"""
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from metrics import render_latest
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus 格式的监控指标"""
+    return PlainTextResponse(render_latest(), media_type="text/plain; version=0.0.4; charset=utf-8")
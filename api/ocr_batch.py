@@ -0,0 +1,225 @@
+"""
+OCR 批量流水线 API 路由 - 多页图片识别，并可边识别边合成语音
+"""
+import os
+import json
+import uuid
+import asyncio
+from datetime import datetime
+from typing import List
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from config import MODELS, OCR_BATCH_MAX_PAGES, OCR_BATCH_MAX_CONCURRENCY, OCR_BATCH_PAGE_GAP
+from api.ocr import (
+    recognize_image,
+    validate_ocr_config,
+    DEFAULT_OCR_BASE_URL,
+    DEFAULT_OCR_API_KEY,
+    DEFAULT_OCR_MODEL,
+)
+from synthesis import synthesize_to_temp
+from utils import cleanup_temp_files, save_audio_file, get_temp_path, get_speaker_language_code, stitch_wav_files
+from history import save_history_item
+from logs import get_logger
+
+router = APIRouter()
+logger = get_logger(__name__)
+
+
+class OCRBatchRequest(BaseModel):
+    """批量 OCR 请求模型"""
+    images: List[str]  # 按页码顺序排列的 base64 图片
+    base_url: str = DEFAULT_OCR_BASE_URL
+    api_key: str = DEFAULT_OCR_API_KEY
+    model: str = DEFAULT_OCR_MODEL
+    max_concurrency: int = OCR_BATCH_MAX_CONCURRENCY
+    # 语音合成参数（synthesize 为 True 时生效）
+    synthesize: bool = False
+    speaker: str = "Vivian"
+    emotion: str = "Normal tone"
+    speed: float = 1.0
+    use_lite: bool = False
+
+
+def _event(data: dict) -> str:
+    """序列化为一行 NDJSON"""
+    return json.dumps(data, ensure_ascii=False) + "\n"
+
+
+async def _recognize_page(semaphore: asyncio.Semaphore, request: OCRBatchRequest, image: str) -> dict:
+    """识别单页，失败时返回错误信息而不是抛出异常，避免影响其他页"""
+    import requests
+
+    async with semaphore:
+        try:
+            text = await asyncio.to_thread(recognize_image, image, request.base_url, request.api_key, request.model)
+            return {"text": text}
+        except HTTPException as e:
+            return {"error": e.detail}
+        except requests.exceptions.ConnectionError:
+            return {"error": f"无法连接到OCR服务，请确保服务已启动并可通过 {request.base_url} 访问"}
+        except requests.exceptions.Timeout:
+            return {"error": "OCR请求超时"}
+        except Exception as e:
+            logger.exception("OCR Batch Error: %s", e)
+            return {"error": f"OCR识别失败: {str(e)}"}
+
+
+def _cleanup_when_done(temp_dir: str):
+    """合成任务结束后删除临时目录的回调（同时取走任务的异常，避免未处理异常的警告）"""
+    def callback(job: asyncio.Future):
+        if not job.cancelled():
+            job.exception()
+        cleanup_temp_files(temp_dir)
+    return callback
+
+
+async def _synthesis_worker(request: OCRBatchRequest, pages: asyncio.Queue, events: asyncio.Queue, rendered: dict):
+    """按页顺序合成语音；模型不支持并发推理，因此只用一个工作协程"""
+    while True:
+        item = await pages.get()
+        if item is None:
+            break
+        page_no, text = item
+        # 合成前就确定临时目录，工作协程被取消时仍能清理这一页
+        temp_dir = get_temp_path("temp_ocr_batch")
+        try:
+            lang_code = get_speaker_language_code(request.speaker, text)
+            job = asyncio.ensure_future(asyncio.to_thread(
+                synthesize_to_temp,
+                "custom",
+                request.use_lite,
+                text,
+                temp_dir=temp_dir,
+                voice=request.speaker,
+                instruct=request.emotion,
+                speed=request.speed,
+                lang_code=lang_code,
+            ))
+            try:
+                await asyncio.shield(job)
+            except asyncio.CancelledError:
+                # 合成线程无法中断，等它结束后再删除临时目录，避免线程随后又写入文件
+                job.add_done_callback(_cleanup_when_done(temp_dir))
+                raise
+            rendered[page_no] = temp_dir
+            await events.put({"type": "page_audio", "page": page_no, "success": True})
+        except Exception as e:
+            cleanup_temp_files(temp_dir)
+            logger.exception("OCR Batch TTS Error: %s", e)
+            await events.put({"type": "page_audio", "page": page_no, "success": False, "detail": str(e)})
+
+
+async def _run_pipeline(request: OCRBatchRequest):
+    """OCR 与语音合成重叠执行：识别按并发上限进行，结果按页码顺序输出并立即送入合成队列"""
+    concurrency = max(1, min(request.max_concurrency, OCR_BATCH_MAX_CONCURRENCY))
+    semaphore = asyncio.Semaphore(concurrency)
+    ocr_tasks = [asyncio.create_task(_recognize_page(semaphore, request, image)) for image in request.images]
+
+    events: asyncio.Queue = asyncio.Queue()
+    pages: asyncio.Queue = asyncio.Queue()
+    rendered = {}
+    texts = {}
+    synth_task = None
+    if request.synthesize:
+        synth_task = asyncio.create_task(_synthesis_worker(request, pages, events, rendered))
+
+    async def emit_pages_in_order():
+        for page_no, task in enumerate(ocr_tasks, 1):
+            result = await task
+            if "error" in result:
+                await events.put({"type": "page", "page": page_no, "success": False, "detail": result["error"]})
+                continue
+            texts[page_no] = result["text"]
+            await events.put({"type": "page", "page": page_no, "success": True, "text": result["text"]})
+            if synth_task and result["text"].strip():
+                await pages.put((page_no, result["text"]))
+        await pages.put(None)
+        if synth_task:
+            await synth_task
+        await events.put(None)
+
+    producer = asyncio.create_task(emit_pages_in_order())
+    stitched_dir = None
+    try:
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield _event(event)
+        await producer
+
+        if request.synthesize:
+            page_numbers = sorted(rendered)
+            if page_numbers:
+                stitched_dir = get_temp_path("temp_ocr_batch_stitch")
+                os.makedirs(stitched_dir, exist_ok=True)
+                chapters = await asyncio.to_thread(
+                    stitch_wav_files,
+                    [os.path.join(rendered[n], "audio_000.wav") for n in page_numbers],
+                    os.path.join(stitched_dir, "audio_000.wav"),
+                    [f"第 {n} 页" for n in page_numbers],
+                    OCR_BATCH_PAGE_GAP,
+                )
+                for chapter, page_no in zip(chapters, page_numbers):
+                    chapter["page"] = page_no
+
+                full_text = "\n\n".join(texts[n] for n in page_numbers)
+                model_info = MODELS["custom"]["lite" if request.use_lite else "pro"]
+                audio_path = save_audio_file(stitched_dir, model_info["output_subfolder"], full_text)
+                stitched_dir = None
+
+                history_item = {
+                    "id": str(uuid.uuid4()),
+                    "text": full_text,
+                    "speaker": request.speaker,
+                    "emotion": request.emotion,
+                    "speed": request.speed,
+                    "audio_path": audio_path,
+                    "chapters": chapters,
+                    "created_at": datetime.now().isoformat()
+                }
+                save_history_item(history_item)
+                yield _event({
+                    "type": "audio",
+                    "audio_path": audio_path,
+                    "chapters": chapters,
+                    "history_id": history_item["id"]
+                })
+
+        yield _event({
+            "type": "done",
+            "pages": len(ocr_tasks),
+            "recognized": len(texts),
+            "synthesized": len(rendered)
+        })
+    finally:
+        # 客户端断开时生成器会被取消，这里确保后台任务与临时文件都被清理
+        for task in ocr_tasks + [producer] + ([synth_task] if synth_task else []):
+            if not task.done():
+                task.cancel()
+        cleanup_temp_files(stitched_dir, *rendered.values())
+
+
+@router.post("/ocr/batch")
+async def perform_ocr_batch(request: OCRBatchRequest):
+    """
+    多页图片批量 OCR，可选地把每页文字送入 TTS 合成并拼接为带章节标记的单个音频
+
+    以 NDJSON 流式返回，事件类型：
+    - page: 按页码顺序返回的识别结果
+    - page_audio: 某页语音合成完成
+    - audio: 拼接后的音频路径与章节列表（仅 synthesize=True）
+    - done: 汇总
+    """
+    if not request.images:
+        raise HTTPException(status_code=400, detail="图片列表不能为空")
+    if len(request.images) > OCR_BATCH_MAX_PAGES:
+        raise HTTPException(status_code=400, detail=f"单次最多处理 {OCR_BATCH_MAX_PAGES} 页")
+
+    is_valid, error_msg = validate_ocr_config(request.base_url, request.api_key, request.model)
+    if not is_valid:
+        raise HTTPException(status_code=400, detail=f"OCR配置错误: {error_msg}")
+
+    return StreamingResponse(_run_pipeline(request), media_type="application/x-ndjson")
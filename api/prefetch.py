@@ -0,0 +1,29 @@
+"""
+模型预加载 API 路由
+"""
+from typing import Optional
+from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from prefetch import prefetcher
+
+router = APIRouter()
+
+
+class PrefetchHint(BaseModel):
+    page: str
+    use_lite: Optional[bool] = None  # 未指定时沿用该模型最近一次使用的版本
+
+
+@router.post("/prefetch")
+async def prefetch_hint(hint: PrefetchHint):
+    """页面导航提示：在后台预加载该页面接下来最可能用到的模型，立即返回"""
+    # 统计使用规律需要读取历史记录，放到线程池中执行
+    result = await run_in_threadpool(prefetcher.hint, hint.page, hint.use_lite)
+    return {"success": True, **result}
+
+
+@router.get("/prefetch/status")
+async def get_prefetch_status():
+    """使用规律、各页面的预测结果与预加载统计"""
+    return await run_in_threadpool(prefetcher.status)
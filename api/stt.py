@@ -3,22 +3,127 @@ STT API 路由
 """
 import os
 import re
-import gc
+import json
+import shutil
+import time
 import uuid
-import traceback
+import hashlib
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from mlx_audio.stt.generate import generate_transcription
+from typing import Optional, Tuple
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Request
+from fastapi.concurrency import run_in_threadpool
+from config import MODEL_VERBOSE, TRANSCRIPTION_TIMEOUT
 from models import load_asr_model_cached
-from utils import cleanup_temp_files, cleanup_stt_temp_files, convert_audio_if_needed, save_stt_results, get_temp_path
+from nodes import node_pool
+from utils import cleanup_temp_files, cleanup_stt_temp_files, convert_audio_if_needed, save_stt_results, get_temp_path, get_wav_duration
 from history import save_history_item
+from memory import governor
+from admission import admission
+from singleflight import SingleFlight
+from cancellation import CancelToken, use_token, check_cancelled, until_disconnected
+from metrics import TRANSCRIPTION_SECONDS, REAL_TIME_FACTOR, current_endpoint, observe_queue_wait
+from tracing import span
 from api.stt_aligner import run_forced_alignment
+from logs import get_logger
 
 router = APIRouter()
+logger = get_logger(__name__)
+
+
+def transcribe(wav_path: str, model_key: Optional[str], language: str) -> Tuple[str, Optional[str]]:
+    """加载 ASR 模型并识别文本（阻塞，在线程池中调用）；配置了远程推理节点时由节点识别
+
+    Returns:
+        (识别文本, 检测到的语言)；模型未给出语言时为 None
+    """
+    if node_pool.enabled:
+        with span("asr"):
+            return node_pool.transcribe(wav_path, model_key, language)
+
+    observe_queue_wait(model_key or "default", "")
+    with span("model_load"):
+        asr_model = load_asr_model_cached(model_key)
+    check_cancelled()
+
+    from mlx_audio.stt.generate import generate_transcription
+
+    logger.debug("[STT] 开始转录: %s，语言: %s", wav_path, language)
+    temp_output_dir = get_temp_path("temp_stt_output")
+    os.makedirs(temp_output_dir, exist_ok=True)
+    asr_start = time.perf_counter()
+    try:
+        # 输入与输出都使用绝对路径，不切换进程的工作目录（推理在线程池中执行，切换会影响其他线程）
+        with span("asr"):
+            transcription = generate_transcription(
+                model=asr_model,
+                audio=os.path.abspath(wav_path),
+                output_path=temp_output_dir,
+                format="txt",
+                verbose=MODEL_VERBOSE,
+                language=language
+            )
+        asr_elapsed = time.perf_counter() - asr_start
+        metric_labels = {"endpoint": current_endpoint(), "model": model_key or "default", "variant": ""}
+        TRANSCRIPTION_SECONDS.observe(asr_elapsed, **metric_labels)
+        audio_seconds = get_wav_duration(wav_path)
+        if audio_seconds > 0 and asr_elapsed > 0:
+            REAL_TIME_FACTOR.observe(audio_seconds / asr_elapsed, **metric_labels)
+
+        # 提取文本内容
+        text = ""
+        if hasattr(transcription, 'text'):
+            text = transcription.text
+        elif isinstance(transcription, str):
+            text = transcription
+        else:
+            output_file = os.path.join(temp_output_dir, "transcript.txt")
+            if not os.path.exists(output_file):
+                output_file = os.path.join(temp_output_dir, "transcription.txt")
+            if os.path.exists(output_file):
+                with open(output_file, 'r', encoding='utf-8') as f:
+                    text = f.read().strip()
+        return text, getattr(transcription, 'language', None)
+    finally:
+        cleanup_stt_temp_files(temp_output_dir)
+
+
+transcription_flights = SingleFlight("transcription")
+
+
+async def _recognize(request: Request, wav_path: str, model_key: Optional[str], language: str, token: CancelToken):
+    """识别文本并做强制对齐；识别前与对齐前检查请求是否已被取消
+
+    Returns:
+        (识别文本, 检测到的语言, 对齐片段)；文本为空时不做对齐，对齐片段为 None
+    """
+    # 发起识别的请求可能先于识别结束断开并删除自己的音频文件，识别使用单独的硬链接
+    shared_path = get_temp_path("temp_stt_shared", "audio.wav")
+    try:
+        os.link(wav_path, shared_path)
+    except OSError:
+        shutil.copyfile(wav_path, shared_path)
+
+    try:
+        with use_token(token):
+            # 步骤 1: 使用 ASR 模型生成文本
+            async with admission.admit(request, "stt", check_rate=False):
+                text, detected_language = await run_in_threadpool(transcribe, shared_path, model_key, language)
+
+            # 步骤 2: 使用 ForcedAligner 生成时间戳
+            aligned_segments = None
+            if text.strip():
+                async with admission.admit(request, "stt", check_rate=False):
+                    token.check()
+                    with span("alignment"):
+                        aligned_segments = await run_in_threadpool(run_forced_alignment, shared_path, text, language)
+        return text, detected_language, aligned_segments
+    finally:
+        cleanup_temp_files(shared_path)
 
 
 @router.post("/stt")
 async def speech_to_text(
+    request: Request,
     audio: UploadFile = File(...),
     model_key: str = Form(None),
     language: str = Form("Chinese")
@@ -29,17 +134,18 @@ async def speech_to_text(
 
     temp_input = None
     wav_path = None
-    temp_output_dir = None
 
     try:
         # 保存上传的音频或视频文件到 tmp 目录
         safe_filename = re.sub(r'[^\w\s.-]', '', audio.filename).strip()
         temp_input = get_temp_path("temp_stt", safe_filename)
-        with open(temp_input, "wb") as f:
-            content = await audio.read()
-            f.write(content)
+        with span("upload"):
+            with open(temp_input, "wb") as f:
+                content = await audio.read()
+                f.write(content)
 
-        wav_path = convert_audio_if_needed(temp_input)
+        with span("convert"):
+            wav_path = convert_audio_if_needed(temp_input)
         if not wav_path:
             cleanup_temp_files(temp_input)
             temp_input = None
@@ -49,94 +155,53 @@ async def speech_to_text(
             cleanup_temp_files(temp_input)
             temp_input = None
 
-        # 加载 ASR 模型用于文本识别
-        asr_model = load_asr_model_cached(model_key)
-
-        print(f"[STT] 开始转录: {wav_path}")
-        temp_output_dir = get_temp_path("temp_stt_output")
-        os.makedirs(temp_output_dir, exist_ok=True)
-
-        try:
-            # 确保语言参数有效
-            if not language or language.lower() in ["auto", "", "null"]:
-                language = "Chinese"
-
-            print(f"[STT] 使用语言: {language}")
-
-            # 步骤 1: 使用 ASR 模型生成文本
-            original_cwd = os.getcwd()
-            try:
-                os.chdir(temp_output_dir)
-                transcription = generate_transcription(
-                    model=asr_model,
-                    audio=wav_path,
-                    output_path=temp_output_dir,
-                    format="txt",
-                    verbose=True,
-                    language=language
-                )
-            finally:
-                os.chdir(original_cwd)
-
-            # 提取文本内容
-            text = ""
-            detected_language = "unknown"
-
-            if hasattr(transcription, 'text'):
-                text = transcription.text
-            elif isinstance(transcription, str):
-                text = transcription
+        # 确保语言参数有效
+        if not language or language.lower() in ["auto", "", "null"]:
+            language = "Chinese"
+
+        # 识别与对齐（推理在线程池中执行，不阻塞事件循环）；相同音频与参数的并发请求只识别一次
+        # 客户端断开（合并的请求全部断开）或超过耗时上限时，在当前步骤结束后中止
+        admission.check_rate(request)
+        key = json.dumps([hashlib.sha256(content).hexdigest(), model_key, language])
+        token = CancelToken(TRANSCRIPTION_TIMEOUT)
+        text, detected_language, aligned_segments = await until_disconnected(request, transcription_flights.do(
+            key, lambda: _recognize(request, wav_path, model_key, language, token), on_abandon=token.cancel))
+        detected_language = detected_language or "unknown"
+
+        logger.debug("[STT] ASR 识别结果: %.100s", text)
+
+        # 使用 ForcedAligner 的时间戳生成字幕片段
+        processed_segments = []
+
+        if text.strip():
+            if aligned_segments:
+                for i, seg in enumerate(aligned_segments):
+                    processed_segments.append({
+                        "id": i,
+                        "start": seg["start_time"],
+                        "end": seg["end_time"],
+                        "text": seg["text"],
+                        "confidence": 0.0
+                    })
             else:
-                output_file = os.path.join(temp_output_dir, "transcript.txt")
-                if not os.path.exists(output_file):
-                    output_file = os.path.join(temp_output_dir, "transcription.txt")
-                if os.path.exists(output_file):
-                    with open(output_file, 'r', encoding='utf-8') as f:
-                        text = f.read().strip()
-
-
-            if hasattr(transcription, 'language'):
-                detected_language = transcription.language
-
-            print(f"[STT] ASR 识别结果: {text[:100]}...")
-
-            # 步骤 2: 使用 ForcedAligner 生成时间戳
-            processed_segments = []
-
-            if text.strip():
-                aligned_segments = run_forced_alignment(wav_path, text, language)
-
-                if aligned_segments:
-                    for i, seg in enumerate(aligned_segments):
+                logger.warning("[STT] ForcedAligner 未返回结果，使用估计时间戳")
+                sentences = re.split(r'[。！？.!?]', text)
+                current_time = 0.0
+                for i, sentence in enumerate(sentences):
+                    if sentence.strip():
+                        duration = len(sentence) / 25.0
                         processed_segments.append({
                             "id": i,
-                            "start": seg["start_time"],
-                            "end": seg["end_time"],
-                            "text": seg["text"],
+                            "start": current_time,
+                            "end": current_time + duration,
+                            "text": sentence.strip(),
                             "confidence": 0.0
                         })
-                else:
-                    print("[STT] ForcedAligner 未返回结果，使用估计时间戳")
-                    sentences = re.split(r'[。！？.!?]', text)
-                    current_time = 0.0
-                    for i, sentence in enumerate(sentences):
-                        if sentence.strip():
-                            duration = len(sentence) / 25.0
-                            processed_segments.append({
-                                "id": i,
-                                "start": current_time,
-                                "end": current_time + duration,
-                                "text": sentence.strip(),
-                                "confidence": 0.0
-                            })
-                            current_time += duration
-
-        finally:
-            cleanup_stt_temp_files(temp_output_dir)
-            temp_output_dir = None
+                        current_time += duration
 
         # 保存结果文件
-        file_paths = save_stt_results(text, processed_segments, audio.filename, wav_path)
+        with span("save_results"):
+            file_paths = save_stt_results(text, processed_segments, audio.filename, wav_path)
 
         # 保存历史记录
         history_item = {
@@ -159,7 +224,7 @@ async def speech_to_text(
         temp_input = None
         wav_path = None
 
-        gc.collect()
+        governor.request_check()
 
         # 构建返回结果
         result = {
@@ -177,11 +242,8 @@ async def speech_to_text(
         return result
     except HTTPException:
         cleanup_temp_files(temp_input, wav_path if wav_path and wav_path != temp_input else None)
-        cleanup_stt_temp_files(temp_output_dir)
         raise
     except Exception as e:
-        print(f"STT Error: {str(e)}")
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.exception("STT Error: %s", e)
         cleanup_temp_files(temp_input, wav_path if wav_path and wav_path != temp_input else None)
-        cleanup_stt_temp_files(temp_output_dir)
         raise HTTPException(status_code=500, detail=f"语音转文字失败: {str(e)}")
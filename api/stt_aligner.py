@@ -2,11 +2,15 @@
 STT ForcedAligner 对齐功能
 """
 import os
-import traceback
-from mlx_audio.stt.generate import generate_transcription
+from config import MODEL_VERBOSE
 from models import load_forced_aligner_model_cached
+from nodes import node_pool
+from metrics import ALIGNMENT_SECONDS
 from utils import cleanup_stt_temp_files, get_temp_path
 from api.stt_text_utils import split_text_by_punctuation, find_sentence_timestamps, merge_short_sentences
+from logs import get_logger
+
+logger = get_logger(__name__)
 
 
 def run_forced_alignment(audio_path: str, text: str, language: str = "Chinese") -> list:
@@ -22,24 +26,27 @@ def run_forced_alignment(audio_path: str, text: str, language: str = "Chinese")
         包含时间戳的片段列表
     """
     try:
+        if node_pool.enabled:
+            return node_pool.align(audio_path, text, language)
+
         aligner_model = load_forced_aligner_model_cached()
+        from mlx_audio.stt.generate import generate_transcription
 
         temp_align_dir = get_temp_path("temp_forced_align")
         os.makedirs(temp_align_dir, exist_ok=True)
-        original_cwd = os.getcwd()
 
+        # 使用绝对路径，不切换进程的工作目录（对齐在线程池中执行，切换会影响其他线程）
         try:
-            os.chdir(temp_align_dir)
-            transcription = generate_transcription(
-                model=aligner_model,
-                audio=audio_path,
-                text=text,
-                output_path=temp_align_dir,
-                verbose=True,
-                language=language
-            )
+            with ALIGNMENT_SECONDS.time(model="qwen3_forced_aligner"):
+                transcription = generate_transcription(
+                    model=aligner_model,
+                    audio=os.path.abspath(audio_path),
+                    text=text,
+                    output_path=temp_align_dir,
+                    verbose=MODEL_VERBOSE,
+                    language=language
+                )
         finally:
-            os.chdir(original_cwd)
             cleanup_stt_temp_files(temp_align_dir)
 
 
@@ -74,6 +81,5 @@ def run_forced_alignment(audio_path: str, text: str, language: str = "Chinese")
         return merged_segments
 
     except Exception as e:
-        print(f"[ForcedAligner] 对齐失败: {str(e)}")
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.exception("[ForcedAligner] 对齐失败: %s", e)
         return []
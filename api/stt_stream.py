@@ -0,0 +1,309 @@
+"""
+实时语音识别 WebSocket
+
+客户端连接 /ws/stt?language=Chinese&sample_rate=16000 后持续发送 16 位小端单声道 PCM（二进制帧），
+服务端用能量 VAD 把音频流切分为语句：
+- 说话过程中每隔 STT_STREAM_PARTIAL_INTERVAL 秒识别一次当前语句，推送 partial
+- 静音超过 STT_STREAM_ENDPOINT_MS 毫秒判定语句结束，识别整句并推送 final
+- 一句话超过 STT_STREAM_WINDOW_SECONDS 秒仍未停顿时，在窗口末尾能量最低处切分，窗口向后滑动
+
+时间戳为相对连接开始的秒数。客户端发送文本帧 {"type": "end"} 后，服务端识别剩余音频，推送 done 并关闭连接。
+中间结果按试听请求排队：识别繁忙时直接跳过，不影响整句结果。
+"""
+import sys
+import json
+import math
+import wave
+import asyncio
+from array import array
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from config import (STT_STREAM_SAMPLE_RATE, STT_STREAM_VAD_DB, STT_STREAM_ENDPOINT_MS,
+                    STT_STREAM_PARTIAL_INTERVAL, STT_STREAM_WINDOW_SECONDS)
+from admission import admission
+from metrics import reset_request_start
+from utils import get_temp_path, cleanup_temp_files
+from api.stt import transcribe
+from logs import get_logger
+
+router = APIRouter()
+logger = get_logger(__name__)
+
+FRAME_MS = 30
+# 语句开始前保留的音频，避免切掉起始辅音
+PRE_ROLL_MS = 300
+# 语句末尾保留的静音
+TAIL_MS = 150
+# 语音帧总时长低于该值的语句视为噪声（咳嗽、敲击）丢弃
+MIN_SPEECH_MS = 200
+# 自适应噪声底之上多少 dB 才算语音
+NOISE_MARGIN_DB = 10.0
+# 噪声底每帧向当前能量上升的比例（约 15 秒的时间常数；下降立即跟随），避免持续说话被当作噪声
+NOISE_RISE = 0.002
+SILENCE_DB = -120.0
+
+
+def frame_db(frame: bytes) -> float:
+    """一帧 16 位 PCM 的能量（dBFS）"""
+    samples = array("h", frame)
+    if sys.byteorder == "big":
+        samples.byteswap()
+    if not samples:
+        return SILENCE_DB
+    rms = math.sqrt(sum(s * s for s in samples) / len(samples))
+    return 20 * math.log10(rms / 32768) if rms > 0 else SILENCE_DB
+
+
+class EnergyVAD:
+    """按帧能量判断是否为语音：阈值取固定下限与“噪声底 + 余量”中的较大者"""
+
+    def __init__(self, threshold_db: float):
+        self.threshold_db = threshold_db
+        # 假定开始时环境安静，连接后立即说话也能被识别为语音
+        self.noise_db = threshold_db - NOISE_MARGIN_DB
+
+    def is_speech(self, db: float) -> bool:
+        if db < self.noise_db:
+            self.noise_db = db
+        else:
+            self.noise_db += NOISE_RISE * (db - self.noise_db)
+        return db > max(self.threshold_db, self.noise_db + NOISE_MARGIN_DB)
+
+
+class RecognitionJob:
+    """一次识别任务：partial 为语句进行中的中间结果，final 为整句结果"""
+
+    def __init__(self, kind: str, segment: int, start: float, end: float, pcm: bytes):
+        self.kind = kind
+        self.segment = segment
+        self.start = start
+        self.end = end
+        self.pcm = pcm
+
+
+class StreamSegmenter:
+    """把 PCM 流切分为语句，产生识别任务（纯计算，不做识别）"""
+
+    def __init__(self, sample_rate: int, vad: EnergyVAD, endpoint_ms: int = STT_STREAM_ENDPOINT_MS,
+                 partial_interval: float = STT_STREAM_PARTIAL_INTERVAL,
+                 window_seconds: float = STT_STREAM_WINDOW_SECONDS):
+        self.sample_rate = sample_rate
+        self.vad = vad
+        self.frame_samples = sample_rate * FRAME_MS // 1000
+        self.frame_bytes = self.frame_samples * 2
+        self.endpoint_frames = max(1, endpoint_ms // FRAME_MS)
+        self.partial_frames = max(1, int(partial_interval * 1000) // FRAME_MS)
+        self.window_frames = max(self.endpoint_frames * 2, int(window_seconds * 1000) // FRAME_MS)
+        self.tail_frames = TAIL_MS // FRAME_MS
+        self.min_speech_frames = MIN_SPEECH_MS // FRAME_MS
+
+        self._buffer = bytearray()
+        self._pre_roll: Deque[Tuple[bytes, float]] = deque(maxlen=PRE_ROLL_MS // FRAME_MS)
+        self.frames_seen = 0
+        self.segment = 0
+        # 当前语句：帧、各帧能量、起始帧号
+        self._frames: Optional[List[bytes]] = None
+        self._dbs: List[float] = []
+        self._start_frame = 0
+        self._speech_frames = 0
+        self._silent_frames = 0
+        self._since_partial = 0
+        self._partial_sent = False
+
+    def _seconds(self, frame_index: int) -> float:
+        return round(frame_index * FRAME_MS / 1000, 3)
+
+    @property
+    def duration(self) -> float:
+        """已处理的音频时长（秒）"""
+        return self._seconds(self.frames_seen)
+
+    def _begin(self):
+        self._frames = [frame for frame, _ in self._pre_roll]
+        self._dbs = [db for _, db in self._pre_roll]
+        self._start_frame = self.frames_seen - len(self._frames)
+        self._pre_roll.clear()
+        self._speech_frames = self._silent_frames = self._since_partial = 0
+        self._partial_sent = False
+
+    def _finish(self, end: int) -> Optional[RecognitionJob]:
+        """结束当前语句（保留前 end 帧），语音太短且未推送过中间结果时丢弃"""
+        frames, start = self._frames[:end], self._start_frame
+        keep = self._speech_frames >= self.min_speech_frames or self._partial_sent
+        segment = self.segment
+        self._frames = None
+        if not keep:
+            return None
+        self.segment += 1
+        return RecognitionJob("final", segment, self._seconds(start), self._seconds(start + len(frames)),
+                              b"".join(frames))
+
+    def _partial(self) -> RecognitionJob:
+        self._since_partial = 0
+        self._partial_sent = True
+        return RecognitionJob("partial", self.segment, self._seconds(self._start_frame),
+                              self._seconds(self._start_frame + len(self._frames)), b"".join(self._frames))
+
+    def _slide(self) -> Optional[RecognitionJob]:
+        """语句超过窗口长度：在窗口最后四分之一中能量最低的帧处切分，其后的音频作为新语句继续"""
+        search_from = len(self._frames) * 3 // 4
+        cut = min(range(search_from, len(self._frames)), key=lambda i: self._dbs[i]) + 1
+        rest, rest_dbs = self._frames[cut:], self._dbs[cut:]
+        job = self._finish(cut)
+        self._frames, self._dbs = rest, rest_dbs
+        self._start_frame += cut
+        self._speech_frames = sum(1 for db in rest_dbs if db > self.vad.threshold_db)
+        self._silent_frames = self._since_partial = 0
+        self._partial_sent = False
+        return job
+
+    def _process_frame(self, frame: bytes) -> List[RecognitionJob]:
+        db = frame_db(frame)
+        speech = self.vad.is_speech(db)
+        jobs = []
+        if self._frames is None:
+            if speech:
+                self._begin()
+            else:
+                self._pre_roll.append((frame, db))
+        if self._frames is not None:
+            self._frames.append(frame)
+            self._dbs.append(db)
+            self._since_partial += 1
+            if speech:
+                self._speech_frames += 1
+                self._silent_frames = 0
+            else:
+                self._silent_frames += 1
+
+            if self._silent_frames >= self.endpoint_frames:
+                end = len(self._frames) - self._silent_frames + self.tail_frames
+                jobs.append(self._finish(end))
+            elif len(self._frames) >= self.window_frames:
+                jobs.append(self._slide())
+            elif self._since_partial >= self.partial_frames and self._speech_frames >= self.min_speech_frames:
+                jobs.append(self._partial())
+        self.frames_seen += 1
+        return [job for job in jobs if job is not None]
+
+    def feed(self, data: bytes) -> List[RecognitionJob]:
+        """送入任意长度的 PCM 数据，返回新产生的识别任务"""
+        self._buffer.extend(data)
+        jobs = []
+        while len(self._buffer) >= self.frame_bytes:
+            frame = bytes(self._buffer[:self.frame_bytes])
+            del self._buffer[:self.frame_bytes]
+            jobs.extend(self._process_frame(frame))
+        return jobs
+
+    def flush(self) -> List[RecognitionJob]:
+        """流结束：把未结束的语句作为整句输出"""
+        if self._frames is None:
+            return []
+        job = self._finish(len(self._frames))
+        return [job] if job is not None else []
+
+
+def _write_wav(pcm: bytes, sample_rate: int) -> str:
+    path = get_temp_path("temp_stt_stream", "audio.wav")
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm)
+    return path
+
+
+@router.websocket("/ws/stt")
+async def stt_stream(websocket: WebSocket, language: str = "Chinese", model_key: Optional[str] = None,
+                     sample_rate: int = STT_STREAM_SAMPLE_RATE):
+    """实时语音识别：接收 PCM 流，推送 partial / final 识别结果"""
+    try:
+        admission.check_rate(websocket)
+    except HTTPException as e:
+        await websocket.close(code=1013, reason="rate limited")
+        logger.debug("[实时识别] 拒绝连接: %s", e.detail)
+        return
+    await websocket.accept()
+    if not 8000 <= sample_rate <= 48000:
+        await websocket.send_json({"type": "error", "detail": "sample_rate 必须在 8000 到 48000 之间"})
+        await websocket.close(code=1003)
+        return
+    if not language or language.lower() in ["auto", "", "null"]:
+        language = "Chinese"
+
+    segmenter = StreamSegmenter(sample_rate, EnergyVAD(STT_STREAM_VAD_DB))
+    jobs: asyncio.Queue = asyncio.Queue()
+    results: List[dict] = []
+
+    async def recognize(job: RecognitionJob) -> Optional[str]:
+        wav_path = _write_wav(job.pcm, sample_rate)
+        try:
+            reset_request_start()
+            async with admission.admit(websocket, "stt", preview=job.kind == "partial", check_rate=False):
+                text, _ = await run_in_threadpool(transcribe, wav_path, model_key, language)
+            return text.strip()
+        except HTTPException as e:
+            if job.kind == "final":
+                await websocket.send_json({"type": "error", "segment": job.segment, "detail": e.detail})
+            return None
+        except Exception as e:
+            logger.error("[实时识别] 第 %d 句识别失败: %s", job.segment, e, exc_info=True)
+            if job.kind == "final":
+                await websocket.send_json({"type": "error", "segment": job.segment, "detail": f"识别失败: {e}"})
+            return None
+        finally:
+            cleanup_temp_files(wav_path)
+
+    async def worker():
+        while True:
+            job = await jobs.get()
+            if job is None:
+                return
+            # 已有更新的任务排队时，过期的中间结果不再识别
+            if job.kind == "partial" and not jobs.empty():
+                continue
+            text = await recognize(job)
+            if text is None:
+                continue
+            event = {"type": job.kind, "segment": job.segment, "text": text, "start": job.start, "end": job.end}
+            if job.kind == "final":
+                results.append(event)
+            await websocket.send_json(event)
+
+    await websocket.send_json({"type": "ready", "sample_rate": sample_rate, "frame_ms": FRAME_MS})
+    logger.info("[实时识别] 连接建立: language=%s sample_rate=%d", language, sample_rate)
+    worker_task = asyncio.create_task(worker())
+    # 连接断开时 worker 发送失败的异常不再单独报告
+    worker_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes"):
+                for job in segmenter.feed(message["bytes"]):
+                    jobs.put_nowait(job)
+            elif message.get("text"):
+                try:
+                    command = json.loads(message["text"])
+                except ValueError:
+                    command = None
+                if not isinstance(command, dict) or command.get("type") != "end":
+                    await websocket.send_json({"type": "error", "detail": "未知的控制消息"})
+                    continue
+                for job in segmenter.flush():
+                    jobs.put_nowait(job)
+                jobs.put_nowait(None)
+                await worker_task
+                await websocket.send_json({"type": "done", "segments": results,
+                                           "duration": segmenter.duration})
+                await websocket.close()
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        worker_task.cancel()
+        logger.info("[实时识别] 连接关闭: %d 句", len(results))
@@ -2,21 +2,26 @@
 TTS API 路由
 """
 import os
-import gc
 import time
 import uuid
 import shutil
-import traceback
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, Form
-from pydantic import BaseModel
-from mlx_audio.tts.generate import generate_audio
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Form, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
 from config import BASE_DIR, MODELS, TMP_DIR
-from models import load_model_cached
-from utils import cleanup_temp_files, save_audio_file, get_temp_path, get_speaker_language_code
+from synthesis import synthesize_shared, synthesize_fast_speed, read_unit_stats
+from utils import cleanup_temp_files, save_audio_file, get_speaker_language_code, detect_language_from_text, unique_stem
 from history import save_history_item
+from quality import quality_policy, QUALITY_AUTO
+from postprocess import PostProcessOptions, parse_options
+from langseg import plan_language_runs
+from memory import governor
+from logs import get_logger
 
 router = APIRouter()
+logger = get_logger(__name__)
 
 
 class TTSRequest(BaseModel):
@@ -25,34 +30,68 @@ class TTSRequest(BaseModel):
     emotion: str = "Normal tone"
     speed: float = 1.0
     use_lite: bool = False
+    quality: str = QUALITY_AUTO  # auto：繁忙时可改用 Lite 模型；strict：严格按 use_lite
+    fast_speed: bool = False  # 只以 1.0x 合成一次，其他语速由变速得到（切换语速时不再推理）
+    postprocess: PostProcessOptions = Field(default_factory=PostProcessOptions)  # 保存时的去静音、响度归一化与淡入淡出
+    language_routing: Optional[bool] = None  # 混合语言文本按语言分段合成，未指定时取服务端配置
+    language_switch_speaker: Optional[bool] = None  # 按语言分段时，音色不支持某段的语言则换用支持的音色，未指定时取服务端配置
+
+
+async def _synthesize_custom(http_request: Request, request: TTSRequest, use_lite: bool, prefix: str,
+                             preview: bool = False) -> str:
+    """合成预设音色；快速变速模式下以 1.0x 合成后变速"""
+    # 根据音色和文本智能检测语言；混合语言文本可按句分段，各段使用对应的 lang_code（可选换用支持该语言的音色）
+    lang_code = get_speaker_language_code(request.speaker, request.text)
+    language_runs = plan_language_runs(request.text, request.speaker, request.language_routing,
+                                       request.language_switch_speaker)
+    # 推理在线程池中执行，不阻塞事件循环；参数相同的并发请求只合成一次
+    if request.fast_speed:
+        return await synthesize_fast_speed(
+            http_request,
+            "custom",
+            use_lite,
+            request.text,
+            request.speed,
+            prefix=prefix,
+            preview=preview,
+            language_runs=language_runs,
+            voice=request.speaker,
+            instruct=request.emotion,
+            lang_code=lang_code
+        )
+    return await synthesize_shared(
+        http_request,
+        "custom",
+        use_lite,
+        request.text,
+        prefix=prefix,
+        preview=preview,
+        language_runs=language_runs,
+        voice=request.speaker,
+        instruct=request.emotion,
+        speed=request.speed,
+        lang_code=lang_code
+    )
 
 
 @router.post("/tts")
-async def text_to_speech(request: TTSRequest):
+async def text_to_speech(request: TTSRequest, http_request: Request):
     """文字转语音"""
     if not request.text.strip():
         raise HTTPException(status_code=400, detail="文案不能为空")
     
     temp_dir = None
     try:
-        model = load_model_cached("custom", request.use_lite)
-        model_info = MODELS["custom"]["lite" if request.use_lite else "pro"]
-        
-        temp_dir = get_temp_path("temp_tts")
-        os.makedirs(temp_dir, exist_ok=True)
-        # 根据音色和文本智能检测语言
-        lang_code = get_speaker_language_code(request.speaker, request.text)
-        generate_audio(
-            model=model,
-            text=request.text,
-            voice=request.speaker,
-            instruct=request.emotion,
-            speed=request.speed,
-            lang_code=lang_code,
-            output_path=temp_dir
-        )
+        use_lite = quality_policy.choose("custom", request.use_lite, request.quality)
+        model_type = "lite" if use_lite else "pro"
+        model_info = MODELS["custom"][model_type]
         
-        audio_path = save_audio_file(temp_dir, model_info["output_subfolder"], request.text)
+        temp_dir = await _synthesize_custom(http_request, request, use_lite, "temp_tts")
+        
+        units = read_unit_stats(temp_dir)
+        # 后处理（去静音、响度归一化等）在线程池中执行，不阻塞事件循环
+        audio_path = await run_in_threadpool(save_audio_file, temp_dir, model_info["output_subfolder"], request.text,
+                                             request.postprocess)
         temp_dir = None
         
         history_item = {
@@ -62,52 +101,45 @@ async def text_to_speech(request: TTSRequest):
             "emotion": request.emotion,
             "speed": request.speed,
             "audio_path": audio_path,
+            "model_type": model_type,
             "created_at": datetime.now().isoformat()
         }
         save_history_item(history_item)
         
-        gc.collect()
+        governor.request_check()
         
         return {
             "success": True,
             "audio_path": audio_path,
+            "model_type": model_type,
+            "units": units,
             "history_id": history_item["id"]
         }
+    except HTTPException:
+        if temp_dir:
+            cleanup_temp_files(temp_dir)
+        raise
     except Exception as e:
-        print(f"TTS Error: {str(e)}")
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.exception("TTS Error: %s", e)
         if temp_dir:
             cleanup_temp_files(temp_dir)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/tts/preview")
-async def preview_voice(request: TTSRequest):
+async def preview_voice(request: TTSRequest, http_request: Request):
     """音色试听 - 不保存历史记录，音频自动删除"""
     if not request.text.strip():
         raise HTTPException(status_code=400, detail="文案不能为空")
     
     temp_dir = None
     try:
-        model = load_model_cached("custom", request.use_lite)
-        
-        temp_dir = get_temp_path("temp_tts_preview")
-        os.makedirs(temp_dir, exist_ok=True)
-        # 根据音色和文本智能检测语言
-        lang_code = get_speaker_language_code(request.speaker, request.text)
-        generate_audio(
-            model=model,
-            text=request.text,
-            voice=request.speaker,
-            instruct=request.emotion,
-            speed=request.speed,
-            lang_code=lang_code,
-            output_path=temp_dir
-        )
+        use_lite = quality_policy.choose("custom", request.use_lite, request.quality)
+        temp_dir = await _synthesize_custom(http_request, request, use_lite, "temp_tts_preview", preview=True)
         
         # 预览音频保存在 tmp 目录下
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        audio_filename = f"preview_{timestamp}.wav"
+        audio_filename = unique_stem(TMP_DIR, f"preview_{timestamp}", [".wav"]) + ".wav"
         audio_path = os.path.join(TMP_DIR, audio_filename)
         
         source_file = os.path.join(temp_dir, "audio_000.wav")
@@ -117,46 +149,56 @@ async def preview_voice(request: TTSRequest):
         cleanup_temp_files(temp_dir)
         temp_dir = None
         
-        gc.collect()
+        governor.request_check()
         
         relative_path = os.path.relpath(audio_path, BASE_DIR)
         
         return {
             "success": True,
             "audio_path": relative_path,
+            "model_type": "lite" if use_lite else "pro",
             "is_preview": True
         }
+    except HTTPException:
+        if temp_dir:
+            cleanup_temp_files(temp_dir)
+        raise
     except Exception as e:
-        print(f"Preview Error: {str(e)}")
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.exception("Preview Error: %s", e)
         if temp_dir:
             cleanup_temp_files(temp_dir)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/tts/design")
-async def design_voice(text: str = Form(...), description: str = Form(...), use_lite: bool = Form(False)):
+async def design_voice(http_request: Request, text: str = Form(...), description: str = Form(...),
+                       use_lite: bool = Form(False), quality: str = Form(QUALITY_AUTO),
+                       postprocess: Optional[str] = Form(None), language_routing: Optional[bool] = Form(None)):
     """音色设计"""
     if not text.strip() or not description.strip():
         raise HTTPException(status_code=400, detail="文案和描述不能为空")
+    options = parse_options(postprocess)
     
     try:
-        model = load_model_cached("design", use_lite)
-        model_info = MODELS["design"]["lite" if use_lite else "pro"]
+        use_lite = quality_policy.choose("design", use_lite, quality)
+        model_type = "lite" if use_lite else "pro"
+        model_info = MODELS["design"][model_type]
         
-        temp_dir = get_temp_path("temp_design")
-        os.makedirs(temp_dir, exist_ok=True)
         # 从文本检测语言
         lang_code = detect_language_from_text(text)
-        generate_audio(
-            model=model,
-            text=text,
+        temp_dir = await synthesize_shared(
+            http_request,
+            "design",
+            use_lite,
+            text,
+            prefix="temp_design",
+            language_runs=plan_language_runs(text, enabled=language_routing),
             instruct=description,
-            lang_code=lang_code,
-            output_path=temp_dir
+            lang_code=lang_code
         )
         
-        audio_path = save_audio_file(temp_dir, model_info["output_subfolder"], text)
+        units = read_unit_stats(temp_dir)
+        audio_path = await run_in_threadpool(save_audio_file, temp_dir, model_info["output_subfolder"], text, options)
         
         history_item = {
             "id": str(uuid.uuid4()),
@@ -165,17 +207,22 @@ async def design_voice(text: str = Form(...), description: str = Form(...), use_
             "emotion": description,
             "speed": 1.0,
             "audio_path": audio_path,
+            "model_type": model_type,
             "created_at": datetime.now().isoformat()
         }
         save_history_item(history_item)
         
-        gc.collect()
+        governor.request_check()
         
         return {
             "success": True,
             "audio_path": audio_path,
+            "model_type": model_type,
+            "units": units,
             "history_id": history_item["id"]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,210 @@
+"""
+批量 TTS API 路由 - 一次提交多条文案，按模型分组调度
+"""
+import os
+import uuid
+import shutil
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from pydantic import BaseModel, Field
+from config import BASE_DIR, BASE_OUTPUT_DIR, BATCH_MAX_ITEMS, BATCH_OUTPUT_SUBFOLDER
+from batch import parse_batch_file, normalize_batch_items, render_batch, write_manifest, write_zip
+from synthesis import synthesize_to_temp, get_cloned_voice_reference
+from utils import cleanup_temp_files, get_temp_path, get_speaker_language_code, detect_language_from_text
+from history import save_history_items
+from cancellation import CancelToken, use_token, until_disconnected
+from postprocess import PostProcessOptions, parse_options, process_wav
+from langseg import plan_language_runs
+from logs import get_logger
+
+router = APIRouter()
+logger = get_logger(__name__)
+
+
+class TTSBatchItem(BaseModel):
+    text: str
+    speaker: str = "Vivian"
+    emotion: str = "Normal tone"
+    speed: float = 1.0
+    use_lite: Optional[bool] = None
+    description: Optional[str] = None  # 填写时使用音色设计模型
+    voice_name: Optional[str] = None  # 填写时使用克隆音色
+
+
+class TTSBatchRequest(BaseModel):
+    items: List[TTSBatchItem]
+    use_lite: bool = False  # 任务未指定 use_lite 时的默认值
+    output: str = "manifest"  # manifest 或 zip
+    postprocess: PostProcessOptions = Field(default_factory=PostProcessOptions)
+
+
+def _render_item(item: dict, wav_path: str, temp_dir: str, postprocess: PostProcessOptions):
+    """渲染单条任务到 wav_path，所有任务复用同一个临时目录"""
+    kwargs = {}
+    if item["mode"] == "design":
+        kwargs["instruct"] = item["description"]
+        kwargs["lang_code"] = detect_language_from_text(item["text"])
+    elif item["mode"] == "clone":
+        ref_audio, ref_text = get_cloned_voice_reference(item["voice_name"])
+        kwargs["voice"] = item["voice_name"]
+        kwargs["ref_audio"] = ref_audio
+        kwargs["ref_text"] = ref_text
+        kwargs["lang_code"] = get_speaker_language_code(item["voice_name"], item["text"])
+    else:
+        kwargs["voice"] = item["speaker"]
+        kwargs["instruct"] = item["emotion"]
+        kwargs["speed"] = item["speed"]
+        kwargs["lang_code"] = get_speaker_language_code(item["speaker"], item["text"])
+
+    # 混合语言文本按语言分段；开启 QWEN3_TTS_LANGUAGE_SWITCH_SPEAKER 时，预设音色才会换用支持该段语言的音色
+    language_runs = plan_language_runs(item["text"], item["speaker"] if item["mode"] == "custom" else None)
+    synthesize_to_temp(item["mode"], item["use_lite"], item["text"], temp_dir=temp_dir, language_runs=language_runs,
+                       **kwargs)
+    source_file = os.path.join(temp_dir, "audio_000.wav")
+    if not os.path.exists(source_file):
+        raise RuntimeError("模型未生成音频文件")
+    if postprocess.enabled:
+        try:
+            process_wav(source_file, wav_path, postprocess)
+            os.remove(source_file)
+            return
+        except Exception as e:
+            logger.warning("[批量合成] 音频后处理失败，按原样保存: %s", e)
+    shutil.move(source_file, wav_path)
+
+
+def _history_item(item: dict, audio_path: str, batch_id: str, created_at: str) -> dict:
+    """构建与单条接口一致的历史记录"""
+    if item["mode"] == "design":
+        speaker, emotion, speed = f"设计音色: {item['description'][:20]}", item["description"], 1.0
+    elif item["mode"] == "clone":
+        speaker, emotion, speed = f"克隆音色: {item['voice_name']}", "克隆", 1.0
+    else:
+        speaker, emotion, speed = item["speaker"], item["emotion"], item["speed"]
+    return {
+        "id": str(uuid.uuid4()),
+        "text": item["text"],
+        "speaker": speaker,
+        "emotion": emotion,
+        "speed": speed,
+        "audio_path": audio_path,
+        "model_type": "lite" if item["use_lite"] else "pro",
+        "batch_id": batch_id,
+        "created_at": created_at
+    }
+
+
+def _run_batch(raw_items: List[dict], use_lite: bool, token: Optional[CancelToken] = None,
+               postprocess: Optional[PostProcessOptions] = None) -> dict:
+    """执行批量合成，返回 manifest 内容（在线程池中运行，避免阻塞事件循环）
+
+    token 被取消（客户端断开）时不再渲染剩余任务，删除已输出的文件，不写历史记录。
+    """
+    try:
+        items = normalize_batch_items(raw_items, use_lite)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not items:
+        raise HTTPException(status_code=400, detail="批量任务不能为空")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"单次最多提交 {BATCH_MAX_ITEMS} 条任务")
+
+    batch_id = uuid.uuid4().hex[:12]
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_dir = os.path.join(BASE_OUTPUT_DIR, BATCH_OUTPUT_SUBFOLDER, f"{timestamp}_{batch_id}")
+    temp_dir = get_temp_path("temp_batch")
+    postprocess = postprocess or PostProcessOptions()
+
+    logger.info("[批量合成] 开始: %s，共 %d 条", batch_id, len(items))
+    try:
+        results = render_batch(items, output_dir, lambda item, wav_path: _render_item(item, wav_path, temp_dir, postprocess),
+                               cancelled=(lambda: token.cancelled) if token else None)
+    finally:
+        cleanup_temp_files(temp_dir)
+    if token is not None and token.cancelled:
+        logger.info("[批量合成] 已取消: %s", batch_id)
+        shutil.rmtree(output_dir, ignore_errors=True)
+        token.check()
+
+    # 所有历史记录一次性写入
+    created_at = datetime.now().isoformat()
+    history_items = []
+    for item, result in zip(items, results):
+        if result["success"]:
+            audio_path = os.path.relpath(os.path.join(output_dir, result["file"]), BASE_DIR)
+            history_item = _history_item(item, audio_path, batch_id, created_at)
+            result["audio_path"] = audio_path
+            result["history_id"] = history_item["id"]
+            history_items.append(history_item)
+        else:
+            logger.warning("[批量合成] 第 %d 条失败: %s", result["index"] + 1, result["error"])
+    save_history_items(history_items)
+
+    manifest_path = write_manifest(output_dir, results, {"batch_id": batch_id, "created_at": created_at})
+    logger.info("[批量合成] 完成: %s，成功 %d/%d", batch_id, len(history_items), len(items))
+
+    return {
+        "success": True,
+        "batch_id": batch_id,
+        "output_dir": os.path.relpath(output_dir, BASE_DIR),
+        "manifest_path": os.path.relpath(manifest_path, BASE_DIR),
+        "total": len(results),
+        "succeeded": len(history_items),
+        "failed": len(results) - len(history_items),
+        "items": results
+    }
+
+
+async def _respond(http_request: Request, raw_items: List[dict], use_lite: bool, output: str,
+                   postprocess: PostProcessOptions):
+    """执行批量任务并按 output 返回 manifest 或 zip；客户端断开时停止剩余任务"""
+    if output not in ("manifest", "zip"):
+        raise HTTPException(status_code=400, detail="output 只能是 manifest 或 zip")
+    token = CancelToken()
+    try:
+        with use_token(token):
+            manifest = await until_disconnected(
+                http_request, run_in_threadpool(_run_batch, raw_items, use_lite, token, postprocess), token)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Batch TTS Error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if output == "zip":
+        output_dir = os.path.join(BASE_DIR, manifest["output_dir"])
+        zip_path = await run_in_threadpool(
+            write_zip, output_dir, manifest["items"], os.path.join(output_dir, f"batch_{manifest['batch_id']}.zip")
+        )
+        return FileResponse(zip_path, media_type="application/zip", filename=os.path.basename(zip_path))
+    return manifest
+
+
+@router.post("/tts/batch")
+async def batch_text_to_speech(request: TTSBatchRequest, http_request: Request):
+    """批量文字转语音"""
+    raw_items = [item.model_dump(exclude_none=True) for item in request.items]
+    return await _respond(http_request, raw_items, request.use_lite, request.output, request.postprocess)
+
+
+@router.post("/tts/batch/upload")
+async def batch_text_to_speech_upload(
+    http_request: Request,
+    file: UploadFile = File(...),
+    use_lite: bool = Form(False),
+    output: str = Form("manifest"),
+    postprocess: Optional[str] = Form(None)
+):
+    """批量文字转语音 - 上传 CSV 或 JSONL 文件"""
+    options = parse_options(postprocess)
+    try:
+        content = (await file.read()).decode('utf-8-sig')
+        raw_items = parse_batch_file(content, file.filename or "")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="文件必须是 UTF-8 编码")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await _respond(http_request, raw_items, use_lite, output, options)
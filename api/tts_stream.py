@@ -0,0 +1,241 @@
+"""
+流式语音合成 WebSocket
+
+客户端连接 /ws/tts?speaker=Vivian&emotion=Normal%20tone&speed=1.0 后陆续发送文本（如 LLM 逐个输出的 token），
+服务端把文本累积到分句缓冲区，每凑齐一个完整分句就交给 CustomVoice 模型合成，合成完立即推送该段音频，
+不必等整段回复结束。
+
+客户端消息（文本帧）：
+- {"type": "text", "text": "..."}：追加文本；不是 JSON 对象的文本帧同样按文本追加
+- {"type": "flush"}：不等标点，立即合成缓冲区中的文本
+- {"type": "cancel"}：丢弃缓冲区与尚未推送的音频（正在合成的段落完成后丢弃）
+- {"type": "end"}：合成剩余文本，推送 done 后关闭连接
+
+服务端消息：每段音频先推送一条 chunk（含文本与各阶段耗时），随后是一个二进制帧（16 位小端单声道 PCM）。
+"""
+import os
+import json
+import time
+import wave
+import asyncio
+from typing import List, Optional
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from config import SAMPLE_RATE, TTS_STREAM_MIN_CLAUSE_CHARS, TTS_STREAM_MAX_CLAUSE_CHARS
+from admission import admission
+from metrics import reset_request_start
+from synthesis import synthesize_to_temp
+from utils import cleanup_temp_files, get_speaker_language_code
+from logs import get_logger
+
+router = APIRouter()
+logger = get_logger(__name__)
+
+# 句末标点：总是在此切分
+SENTENCE_ENDINGS = "。！？!?；;…\n"
+# 句中停顿：分句够长时才切分，避免过短的段落
+CLAUSE_BREAKS = "，,、：:"
+# 紧跟在标点后、应归入前一分句的引号与括号
+CLOSING_MARKS = "\"'”’）)」』】》"
+
+
+class ClauseBuffer:
+    """累积增量文本，切出可以送去合成的完整分句"""
+
+    def __init__(self, min_chars: int = TTS_STREAM_MIN_CLAUSE_CHARS, max_chars: int = TTS_STREAM_MAX_CLAUSE_CHARS):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.text = ""
+
+    def _boundary(self) -> Optional[int]:
+        """返回第一个可切分位置（切分点之后的下标），没有时返回 None"""
+        text = self.text
+        for i, ch in enumerate(text):
+            if ch in SENTENCE_ENDINGS:
+                pass
+            elif ch == ".":
+                # 英文句号后需要有空白才算句末（排除 3.14、e.g. 等）；位于末尾时等待后续文本
+                if i + 1 >= len(text) or not text[i + 1].isspace():
+                    continue
+            elif ch in CLAUSE_BREAKS:
+                if len(text[:i].strip()) < self.min_chars:
+                    continue
+            else:
+                continue
+            end = i + 1
+            while end < len(text) and text[end] in CLOSING_MARKS:
+                end += 1
+            return end
+        if len(text) >= self.max_chars:
+            # 没有标点的长文本：在最后一个空白处切分，没有空白时直接截断
+            cut = text.rfind(" ", 0, self.max_chars)
+            return cut + 1 if cut > 0 else self.max_chars
+        return None
+
+    def push(self, text: str) -> List[str]:
+        """追加文本，返回新切出的分句"""
+        self.text += text
+        clauses = []
+        while True:
+            end = self._boundary()
+            if end is None:
+                break
+            clause, self.text = self.text[:end].strip(), self.text[end:]
+            if _speakable(clause):
+                clauses.append(clause)
+        return clauses
+
+    def flush(self) -> Optional[str]:
+        """取出缓冲区中剩余的文本"""
+        clause, self.text = self.text.strip(), ""
+        return clause if _speakable(clause) else None
+
+    def clear(self):
+        self.text = ""
+
+
+def _speakable(text: str) -> bool:
+    """只含标点与空白的片段不送去合成"""
+    return any(ch.isalnum() for ch in text)
+
+
+class SynthesisJob:
+    """一个待合成的分句"""
+
+    def __init__(self, index: int, text: str, generation: int):
+        self.index = index
+        self.text = text
+        self.generation = generation
+        self.ready_at = time.perf_counter()
+
+
+def _read_pcm(wav_path: str):
+    with wave.open(wav_path, "rb") as wf:
+        return wf.readframes(wf.getnframes()), wf.getframerate()
+
+
+@router.websocket("/ws/tts")
+async def tts_stream(websocket: WebSocket, speaker: str = "Vivian", emotion: str = "Normal tone",
+                     speed: float = 1.0, use_lite: bool = False):
+    """流式合成：增量接收文本，按分句推送 PCM 音频"""
+    try:
+        admission.check_rate(websocket)
+    except HTTPException as e:
+        await websocket.close(code=1013, reason="rate limited")
+        logger.debug("[流式合成] 拒绝连接: %s", e.detail)
+        return
+    await websocket.accept()
+
+    buffer = ClauseBuffer()
+    jobs: asyncio.Queue = asyncio.Queue()
+    # cancel 时递增，之前的分句不再合成或推送
+    state = {"generation": 0, "next_index": 0, "first_text_at": None, "first_audio_ms": None, "chunks": 0}
+
+    def enqueue(clauses: List[str]):
+        for clause in clauses:
+            jobs.put_nowait(SynthesisJob(state["next_index"], clause, state["generation"]))
+            state["next_index"] += 1
+
+    async def synthesize(job: SynthesisJob):
+        temp_dir = None
+        try:
+            lang_code = get_speaker_language_code(speaker, job.text)
+            reset_request_start()
+            async with admission.admit(websocket, "tts", check_rate=False):
+                started = time.perf_counter()
+                temp_dir = await run_in_threadpool(
+                    synthesize_to_temp, "custom", use_lite, job.text, prefix="temp_tts_stream",
+                    voice=speaker, instruct=emotion, speed=speed, lang_code=lang_code)
+            finished = time.perf_counter()
+            pcm, sample_rate = await run_in_threadpool(_read_pcm, os.path.join(temp_dir, "audio_000.wav"))
+            return pcm, sample_rate, started, finished
+        finally:
+            cleanup_temp_files(temp_dir)
+
+    async def worker():
+        while True:
+            job = await jobs.get()
+            if job is None:
+                return
+            if job.generation != state["generation"]:
+                continue
+            try:
+                pcm, sample_rate, started, finished = await synthesize(job)
+            except HTTPException as e:
+                await websocket.send_json({"type": "error", "chunk": job.index, "text": job.text, "detail": e.detail})
+                continue
+            except Exception as e:
+                logger.error("[流式合成] 第 %d 段合成失败: %s", job.index, e, exc_info=True)
+                await websocket.send_json({"type": "error", "chunk": job.index, "text": job.text,
+                                           "detail": f"合成失败: {e}"})
+                continue
+            if job.generation != state["generation"]:
+                continue
+            sent = time.perf_counter()
+            if state["first_audio_ms"] is None and state["first_text_at"] is not None:
+                state["first_audio_ms"] = round((sent - state["first_text_at"]) * 1000, 1)
+            await websocket.send_json({
+                "type": "chunk",
+                "chunk": job.index,
+                "text": job.text,
+                "sample_rate": sample_rate,
+                "bytes": len(pcm),
+                "audio_seconds": round(len(pcm) / 2 / sample_rate, 3),
+                "queue_ms": round((started - job.ready_at) * 1000, 1),
+                "synthesis_ms": round((finished - started) * 1000, 1),
+                "latency_ms": round((sent - job.ready_at) * 1000, 1),
+            })
+            await websocket.send_bytes(pcm)
+            state["chunks"] += 1
+
+    await websocket.send_json({"type": "ready", "sample_rate": SAMPLE_RATE, "format": "pcm_s16le"})
+    logger.info("[流式合成] 连接建立: speaker=%s", speaker)
+    worker_task = asyncio.create_task(worker())
+    # 连接断开时 worker 发送失败的异常不再单独报告
+    worker_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            raw = message.get("text")
+            if raw is None:
+                await websocket.send_json({"type": "error", "detail": "只接受文本消息"})
+                continue
+            try:
+                command = json.loads(raw)
+            except ValueError:
+                command = None
+            if not isinstance(command, dict):
+                command = {"type": "text", "text": raw}
+
+            kind = command.get("type")
+            if kind == "text":
+                if state["first_text_at"] is None:
+                    state["first_text_at"] = time.perf_counter()
+                enqueue(buffer.push(str(command.get("text", ""))))
+            elif kind == "flush":
+                clause = buffer.flush()
+                enqueue([clause] if clause else [])
+            elif kind == "cancel":
+                dropped = jobs.qsize()
+                state["generation"] += 1
+                buffer.clear()
+                state["first_text_at"] = state["first_audio_ms"] = None
+                await websocket.send_json({"type": "cancelled", "dropped": dropped})
+            elif kind == "end":
+                clause = buffer.flush()
+                enqueue([clause] if clause else [])
+                jobs.put_nowait(None)
+                await worker_task
+                await websocket.send_json({"type": "done", "chunks": state["chunks"],
+                                           "first_audio_ms": state["first_audio_ms"]})
+                await websocket.close()
+                break
+            else:
+                await websocket.send_json({"type": "error", "detail": "未知的控制消息"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        worker_task.cancel()
+        logger.info("[流式合成] 连接关闭: %d 段", state["chunks"])
@@ -4,47 +4,64 @@ Qwen3-TTS Web 应用主入口
 import os
 import sys
 import warnings
+import importlib.util
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
 # 导入配置
-from config import BASE_DIR, BASE_OUTPUT_DIR, VOICES_DIR, TMP_DIR
+from config import BASE_DIR, BASE_OUTPUT_DIR, VOICES_DIR, TMP_DIR, STATIC_DIR
 
 # 导入 API 路由
-from api import common, tts, stt, clone, history, files, ocr
+from api import common, tts, tts_batch, tts_stream, stt, stt_stream, clone, history, files, ocr, ocr_batch, admin, prefetch, metrics as metrics_api
 
 # 导入页面路由
-from routes import register_routes
+from routes import register_routes, warm_pages
+from assets import FingerprintedStaticFiles
+from memory import governor
+from nodes import node_pool
+from prefetch import prefetcher
+from metrics import MetricsMiddleware
+from tracing import TracingMiddleware
+from logs import setup_logging, get_logger, RequestIdMiddleware
 
 # 抑制警告
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 warnings.filterwarnings("ignore", category=UserWarning)
 warnings.filterwarnings("ignore", category=FutureWarning)
 
-# 检查依赖
-try:
-    from mlx_audio.tts.utils import load_model
-    from mlx_audio.stt.utils import load_model as load_stt_model
-except ImportError:
+# 检查依赖（只查找不导入：mlx_audio 会连带导入 transformers、librosa 等，推迟到首次推理时）
+if importlib.util.find_spec("mlx_audio") is None:
     print("Error: 'mlx_audio' library not found.")
     print("Run: source .venv/bin/activate")
     sys.exit(1)
 
 
+setup_logging()
+logger = get_logger(__name__)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
-    print("[启动] 应用启动中...")
+    logger.info("[启动] 应用启动中...")
     os.makedirs(BASE_OUTPUT_DIR, exist_ok=True)
     os.makedirs(VOICES_DIR, exist_ok=True)
     os.makedirs(TMP_DIR, exist_ok=True)
-    print("[启动] 模型将按需加载（首次使用时自动缓存）")
+    if node_pool.enabled:
+        logger.info("[启动] 推理转发到 %d 个远程节点", len(node_pool.nodes))
+        node_pool.start()
+    else:
+        logger.info("[启动] 模型将按需加载（首次使用时自动缓存）")
+    governor.start()
+    warm_pages()
     
     yield
     
-    print("[关闭] 应用关闭中...")
+    logger.info("[关闭] 应用关闭中...")
+    governor.stop()
+    node_pool.stop()
+    prefetcher.shutdown()
 
 
 # 创建 FastAPI 应用
@@ -64,22 +81,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 指标采集中间件
+app.add_middleware(MetricsMiddleware)
+
+# 请求追踪中间件（Server-Timing）
+app.add_middleware(TracingMiddleware)
+
+# 请求 ID 中间件（最外层，日志与追踪都能取到 request_id）
+app.add_middleware(RequestIdMiddleware)
+
 # 注册 API 路由
 app.include_router(common.router, prefix="/api", tags=["common"])
 app.include_router(tts.router, prefix="/api", tags=["tts"])
+app.include_router(tts_batch.router, prefix="/api", tags=["tts"])
 app.include_router(stt.router, prefix="/api", tags=["stt"])
 app.include_router(clone.router, prefix="/api", tags=["clone"])
 app.include_router(history.router, prefix="/api", tags=["history"])
 app.include_router(files.router, prefix="/api", tags=["files"])
 app.include_router(ocr.router, prefix="/api", tags=["ocr"])
+app.include_router(ocr_batch.router, prefix="/api", tags=["ocr"])
+app.include_router(admin.router, prefix="/api", tags=["admin"])
+app.include_router(prefetch.router, prefix="/api", tags=["prefetch"])
+app.include_router(metrics_api.router, tags=["metrics"])
+app.include_router(tts_stream.router, tags=["tts"])
+app.include_router(stt_stream.router, tags=["stt"])
 
 # 注册页面路由
 register_routes(app)
 
-# 挂载静态文件
-os.makedirs("static/js", exist_ok=True)
-os.makedirs("static/css", exist_ok=True)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# 挂载静态文件（带指纹的 URL 长期缓存）
+os.makedirs(os.path.join(STATIC_DIR, "js"), exist_ok=True)
+os.makedirs(os.path.join(STATIC_DIR, "css"), exist_ok=True)
+app.mount("/static", FingerprintedStaticFiles(directory=STATIC_DIR), name="static")
 
 
 if __name__ == "__main__":
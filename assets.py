@@ -0,0 +1,142 @@
+"""
+静态资源指纹
+
+页面引用的 /static 资源都带上内容哈希（如 /static/js/app.js?v=3f2a9c1b0d）：
+文件不变时 URL 不变，浏览器可以长期缓存；文件一改 URL 随之变化，不再需要手动修改版本号。
+
+运行过 build_static.py 后，页面改为引用 static/dist/ 下的构建产物（合并后的脚本、静态 Tailwind CSS，
+文件名带哈希），并按 Accept-Encoding 直接返回预先压缩好的 .br / .gz 文件。
+"""
+import os
+import json
+import stat
+import hashlib
+import mimetypes
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.types import Scope
+from config import STATIC_DIR, STATIC_MAX_AGE
+
+FINGERPRINT_LENGTH = 10
+MANIFEST_FILE = os.path.join(STATIC_DIR, "dist", "manifest.json")
+TAILWIND_CDN_TAG = '<script src="https://cdn.tailwindcss.com"></script>'
+# 按优先级排列的预压缩格式：(Content-Encoding, 文件后缀)
+PRECOMPRESSED = [("br", ".br"), ("gzip", ".gz")]
+# 相对路径 → (mtime_ns, 文件大小, 指纹)，文件未变化时不重新计算哈希
+_fingerprints: Dict[str, Tuple[int, int, str]] = {}
+# (mtime_ns, 构建清单)
+_manifest: Optional[Tuple[int, Dict[str, str]]] = None
+
+
+def get_manifest() -> Dict[str, str]:
+    """build_static.py 生成的清单：原路径 → dist/ 下的构建产物，未构建时为空"""
+    global _manifest
+    try:
+        mtime = os.stat(MANIFEST_FILE).st_mtime_ns
+    except OSError:
+        return {}
+    if _manifest is None or _manifest[0] != mtime:
+        with open(MANIFEST_FILE, encoding="utf-8") as f:
+            _manifest = (mtime, json.load(f))
+    return _manifest[1]
+
+
+def fingerprint(rel_path: str) -> str:
+    """返回 static/ 下文件内容哈希的前缀，文件不存在时返回空字符串"""
+    path = os.path.join(STATIC_DIR, rel_path)
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return ""
+    cached = _fingerprints.get(rel_path)
+    if cached and cached[:2] == (stat_result.st_mtime_ns, stat_result.st_size):
+        return cached[2]
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:FINGERPRINT_LENGTH]
+    _fingerprints[rel_path] = (stat_result.st_mtime_ns, stat_result.st_size, digest)
+    return digest
+
+
+def static_url(rel_path: str) -> str:
+    """带指纹的静态资源 URL（已构建时指向文件名带哈希的构建产物）"""
+    built = get_manifest().get(rel_path)
+    if built:
+        return "/static/" + built
+    url = "/static/" + rel_path
+    digest = fingerprint(rel_path)
+    return f"{url}?v={digest}" if digest else url
+
+
+def module_urls() -> Dict[str, str]:
+    """app.js 动态加载的模块脚本：原 URL → 带指纹的 URL"""
+    modules_dir = os.path.join(STATIC_DIR, "js", "modules")
+    # 构建后的 app.js 已包含全部模块
+    if "js/app.js" in get_manifest() or not os.path.isdir(modules_dir):
+        return {}
+    return {
+        f"/static/js/modules/{name}": static_url(f"js/modules/{name}")
+        for name in sorted(os.listdir(modules_dir)) if name.endswith(".js")
+    }
+
+
+def tailwind_tag() -> str:
+    """已构建静态 Tailwind CSS 时引用该文件，否则使用 CDN 运行时编译"""
+    built = get_manifest().get("tailwind")
+    return f'<link rel="stylesheet" href="/static/{built}">' if built else TAILWIND_CDN_TAG
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """解析 Accept-Encoding，返回客户端接受的编码（排除 q=0）"""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        if params.strip().replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _is_built(path: str) -> bool:
+    """dist/ 下除清单外的文件名都带内容哈希，内容永不改变"""
+    return path.startswith("dist" + os.sep) and os.path.basename(path) != "manifest.json"
+
+
+class FingerprintedStaticFiles(StaticFiles):
+    """静态文件服务
+
+    - 构建产物与 v 等于文件当前指纹的 URL 返回长期缓存头，其余要求浏览器用 ETag 重新验证
+    - 存在预压缩的 .br / .gz 文件且客户端支持时直接返回压缩文件
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = self._precompressed_response(path, scope) or await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+            version = query.get("v", [""])[0]
+            if _is_built(path) or (version and version == fingerprint(path)):
+                response.headers["Cache-Control"] = f"public, max-age={STATIC_MAX_AGE}, immutable"
+            else:
+                response.headers["Cache-Control"] = "no-cache"
+            if _is_built(path):
+                response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+    def _precompressed_response(self, path: str, scope: Scope) -> Optional[Response]:
+        if scope["method"] not in ("GET", "HEAD") or not _is_built(path):
+            return None
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        for encoding, suffix in PRECOMPRESSED:
+            if encoding not in accepted and "*" not in accepted:
+                continue
+            full_path, stat_result = self.lookup_path(path + suffix)
+            if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+                continue
+            media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            response = FileResponse(full_path, stat_result=stat_result, media_type=media_type,
+                                    headers={"Content-Encoding": encoding})
+            if self.is_not_modified(response.headers, Headers(scope=scope)):
+                return Response(status_code=304, headers={"ETag": response.headers["etag"]})
+            return response
+        return None
@@ -0,0 +1,183 @@
+"""
+批量合成任务的解析与调度（Web API 与命令行共用）
+
+批量文件支持两种格式：
+- JSONL：每行一个 JSON 对象
+- CSV：首行为表头
+
+每条任务的字段：text（必填）、speaker、emotion、speed、use_lite，
+以及可选的 description（音色设计）或 voice_name（克隆音色）。
+"""
+import os
+import io
+import re
+import csv
+import json
+import zipfile
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_SPEAKER = "Vivian"
+DEFAULT_EMOTION = "Normal tone"
+
+
+def _parse_bool(value) -> Optional[bool]:
+    """解析 CSV / JSON 中的布尔值，空值返回 None"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+def parse_batch_file(content: str, filename: str = "") -> List[dict]:
+    """解析批量任务文件内容
+
+    Args:
+        content: 文件文本内容
+        filename: 文件名（根据扩展名判断格式，.csv 以外均按 JSONL 解析）
+
+    Returns:
+        原始任务字典列表
+    """
+    if filename.lower().endswith(".csv"):
+        reader = csv.DictReader(io.StringIO(content))
+        return [{k.strip(): v for k, v in row.items() if k} for row in reader]
+
+    items = []
+    for line_no, line in enumerate(content.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            items.append(json.loads(line))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"第 {line_no} 行不是合法的 JSON: {e}")
+    return items
+
+
+def normalize_batch_items(raw_items: List[dict], default_use_lite: bool = False) -> List[dict]:
+    """校验并补全批量任务，推断每条任务使用的模型类型
+
+    Returns:
+        规范化后的任务列表，每项带有 index、mode、use_lite
+    """
+    items = []
+    for index, raw in enumerate(raw_items):
+        if not isinstance(raw, dict):
+            raise ValueError(f"第 {index + 1} 条任务格式错误")
+        text = str(raw.get("text") or "").strip()
+        if not text:
+            raise ValueError(f"第 {index + 1} 条任务的文案为空")
+
+        try:
+            speed = float(raw.get("speed") or 1.0)
+        except (TypeError, ValueError):
+            raise ValueError(f"第 {index + 1} 条任务的语速无效: {raw.get('speed')}")
+
+        use_lite = _parse_bool(raw.get("use_lite"))
+        description = str(raw.get("description") or "").strip()
+        voice_name = str(raw.get("voice_name") or "").strip()
+        if description:
+            mode = "design"
+        elif voice_name:
+            mode = "clone"
+        else:
+            mode = "custom"
+
+        items.append({
+            "index": index,
+            "text": text,
+            "speaker": str(raw.get("speaker") or DEFAULT_SPEAKER).strip(),
+            "emotion": str(raw.get("emotion") or DEFAULT_EMOTION).strip(),
+            "speed": speed,
+            "use_lite": default_use_lite if use_lite is None else use_lite,
+            "description": description,
+            "voice_name": voice_name,
+            "mode": mode,
+        })
+    return items
+
+
+def group_by_model(items: List[dict]) -> Dict[Tuple[str, bool], List[dict]]:
+    """按 (模型类型, 是否 Lite) 分组，组的顺序取首次出现的顺序，组内保持原顺序"""
+    groups: Dict[Tuple[str, bool], List[dict]] = {}
+    for item in items:
+        groups.setdefault((item["mode"], item["use_lite"]), []).append(item)
+    return groups
+
+
+def batch_item_filename(item: dict) -> str:
+    """批量任务输出文件名，以序号开头保证唯一且与输入顺序一致"""
+    clean_text = item["text"].replace('\n', ' ').replace('\r', ' ')
+    clean_text = re.sub(r'[^\w\s\u4e00-\u9fff-]', '', clean_text)[:20].strip().replace(' ', '_') or "audio"
+    return f"{item['index'] + 1:04d}_{clean_text}.wav"
+
+
+def render_batch(items: List[dict], output_dir: str, render_item: Callable[[dict, str], None],
+                 on_progress: Optional[Callable[[dict], None]] = None,
+                 cancelled: Optional[Callable[[], bool]] = None) -> List[dict]:
+    """按模型分组依次渲染，同一模型的任务连续执行，避免反复切换模型
+
+    Args:
+        items: normalize_batch_items 的结果
+        output_dir: 输出目录
+        render_item: 渲染函数 render_item(item, wav_path)，负责把音频写到 wav_path
+        on_progress: 每条任务结束后的回调（可选）
+        cancelled: 每条任务开始前调用，返回 True 时不再渲染剩余任务（可选）
+
+    Returns:
+        按输入顺序排列的结果列表；中途取消时未渲染的任务为 None
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    results: List[Optional[dict]] = [None] * len(items)
+
+    for (mode, use_lite), group in group_by_model(items).items():
+        for item in group:
+            if cancelled and cancelled():
+                return results
+            filename = batch_item_filename(item)
+            result = {
+                "index": item["index"],
+                "text": item["text"],
+                "mode": mode,
+                "model_type": "lite" if use_lite else "pro",
+                "speaker": item["voice_name"] or item["speaker"],
+            }
+            try:
+                render_item(item, os.path.join(output_dir, filename))
+                result["success"] = True
+                result["file"] = filename
+            except Exception as e:
+                result["success"] = False
+                result["error"] = str(e)
+            results[item["index"]] = result
+            if on_progress:
+                on_progress(result)
+
+    return results
+
+
+def write_manifest(output_dir: str, results: List[dict], extra: Optional[dict] = None) -> str:
+    """写出 manifest.json，返回其路径"""
+    manifest = dict(extra or {})
+    manifest["total"] = len(results)
+    manifest["succeeded"] = sum(1 for r in results if r.get("success"))
+    manifest["failed"] = manifest["total"] - manifest["succeeded"]
+    manifest["items"] = results
+
+    manifest_path = os.path.join(output_dir, "manifest.json")
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest_path
+
+
+def write_zip(output_dir: str, results: List[dict], zip_path: str) -> str:
+    """把成功的音频与 manifest.json 打包为 zip（WAV 已是 PCM，使用 STORED 避免无意义的压缩开销）"""
+    with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for result in results:
+            if result.get("success"):
+                zf.write(os.path.join(output_dir, result["file"]), result["file"])
+        manifest_path = os.path.join(output_dir, "manifest.json")
+        if os.path.exists(manifest_path):
+            zf.write(manifest_path, "manifest.json")
+    return zip_path
@@ -0,0 +1,124 @@
+"""
+API 端到端基准测试
+
+在进程内通过 ASGI 调用 FastAPI 应用（不经过网络），模型替换为
+benchmarks/stubs 下的确定性替身，测量各接口在不同并发度与历史记录规模下的
+延迟分布与吞吐量。
+
+用法：
+    python -m benchmarks.bench_api
+    python -m benchmarks.bench_api --concurrency 1,8 --requests 64 --history-sizes 0,5000 --rtf 0
+"""
+import sys
+import asyncio
+import argparse
+import tempfile
+
+from benchmarks.harness import (BENCH_VOICE, prepare_environment, make_wav, seed_history, quiet,
+                                run_concurrent, write_results)
+
+ENDPOINTS = ["tts", "tts_clone", "stt", "history", "speakers"]
+TTS_TEXT = "欢迎使用 Qwen3-TTS，这是一段基准测试文本。"
+
+
+def _int_list(value: str):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="API 端到端基准测试")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS),
+                        help=f"要测试的接口，逗号分隔（可选: {', '.join(ENDPOINTS)}）")
+    parser.add_argument("--concurrency", default="1,4,16", help="并发度列表，逗号分隔")
+    parser.add_argument("--requests", type=int, default=32, help="每组测试的请求数")
+    parser.add_argument("--history-sizes", default="0,1000,10000", help="历史记录条数列表，逗号分隔")
+    parser.add_argument("--stt-seconds", type=float, default=5.0, help="STT 上传音频的时长（秒）")
+    parser.add_argument("--rtf", type=float, default=None,
+                        help="替身模型的模拟实时率（每秒音频的推理秒数，0 表示不休眠）")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径（默认写到 benchmarks/results/）")
+    return parser
+
+
+async def run(args) -> list:
+    import httpx
+    with quiet():
+        from app import app
+
+    stt_audio = make_wav(args.stt_seconds)
+    transport = httpx.ASGITransport(app=app)
+    results = []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def post_tts(i):
+            response = await client.post("/api/tts", json={"text": f"{TTS_TEXT}{i}", "speaker": "Vivian"})
+            return response.status_code == 200
+
+        async def post_clone(i):
+            response = await client.post("/api/tts/clone", data={"text": f"{TTS_TEXT}{i}", "voice_name": BENCH_VOICE})
+            return response.status_code == 200
+
+        async def post_stt(i):
+            files = {"audio": (f"bench_{i}.wav", stt_audio, "audio/wav")}
+            response = await client.post("/api/stt", files=files, data={"language": "Chinese"})
+            return response.status_code == 200
+
+        async def get_history(i):
+            response = await client.get("/api/history")
+            return response.status_code == 200
+
+        async def get_speakers(i):
+            response = await client.get("/api/speakers")
+            return response.status_code == 200
+
+        senders = {
+            "tts": post_tts,
+            "tts_clone": post_clone,
+            "stt": post_stt,
+            "history": get_history,
+            "speakers": get_speakers,
+        }
+
+        # 预热：首次请求会加载（替身）模型，不计入结果
+        with quiet():
+            for name in args.endpoints:
+                await senders[name](0)
+
+        for history_size in args.history_sizes:
+            for name in args.endpoints:
+                for concurrency in args.concurrency:
+                    seed_history(history_size)
+                    with quiet():
+                        summary = await run_concurrent(senders[name], args.requests, concurrency)
+                    summary.update({"endpoint": name, "concurrency": concurrency, "history_size": history_size})
+                    results.append(summary)
+                    print(f"[基准测试] {name:<10} history={history_size:<6} c={concurrency:<3} "
+                          f"p50={summary['p50_ms']:>9.2f}ms p99={summary['p99_ms']:>9.2f}ms "
+                          f"{summary['throughput_rps']:>8.2f} req/s errors={summary['errors']}")
+    return results
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = [e for e in args.endpoints if e not in ENDPOINTS]
+    if unknown:
+        print(f"未知接口: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    args.concurrency = _int_list(args.concurrency)
+    args.history_sizes = _int_list(args.history_sizes)
+
+    with tempfile.TemporaryDirectory(prefix="qwen3_tts_bench_") as workdir:
+        prepare_environment(workdir, args.rtf)
+        results = asyncio.run(run(args))
+
+    path = write_results("api", {
+        "requests_per_run": args.requests,
+        "stt_audio_seconds": args.stt_seconds,
+        "runs": results,
+    }, args.output)
+    print(f"[基准测试] 结果已写入: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
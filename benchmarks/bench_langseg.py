@@ -0,0 +1,112 @@
+"""
+混合语言分段基准测试
+
+- 分段：在数 MB 的中英混排、纯中文、纯英文文本上测量 langseg.split_language_runs 与 langseg.detect_language，
+  并与原来逐字符多次 any() 扫描的语言检测对照，结果折算为 MB/s
+- 合成：以替身模型合成一段中英混排文本，对比整段合成与按语言段依次合成（本地模型的合成方式）的耗时，
+  即按语言分段在本地额外带来的开销
+
+用法：
+    python -m benchmarks.bench_langseg
+    python -m benchmarks.bench_langseg --sizes-mb 1,4,16 --runs 6
+"""
+import os
+import sys
+import argparse
+import tempfile
+
+from benchmarks.harness import prepare_environment, time_call, write_results
+
+ZH_SENTENCE = "今天我们讨论一下语音合成系统的性能优化，先从文本预处理开始。"
+EN_SENTENCE = "The tokenizer splits the input into subword units before synthesis. "
+
+
+def _float_list(value: str):
+    return [float(v) for v in value.split(",") if v.strip()]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="混合语言分段基准测试")
+    parser.add_argument("--sizes-mb", default="1,4", help="文本大小列表（MB，按 UTF-8 编码计），逗号分隔")
+    parser.add_argument("--runs", type=int, default=6, help="合成测试中中英交替的语言段数")
+    parser.add_argument("--rtf", type=float, default=0.05, help="替身模型模拟的实时率")
+    parser.add_argument("--repeat", type=int, default=3, help="每项测量的重复次数")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径（默认写到 benchmarks/results/）")
+    return parser
+
+
+def make_text(kind: str, size_mb: float) -> str:
+    """构造约 size_mb MB 的文本：mixed 为中英句子交替，zh / en 为单一语言"""
+    unit = {"mixed": ZH_SENTENCE + EN_SENTENCE, "zh": ZH_SENTENCE, "en": EN_SENTENCE}[kind]
+    count = max(1, int(size_mb * 1024 * 1024 / len(unit.encode("utf-8"))))
+    return unit * count
+
+
+def legacy_detect(text: str) -> str:
+    """原来的 utils.detect_language_from_text：按语言逐字符 any() 扫描"""
+    if any('一' <= c <= '鿿' for c in text):
+        return 'zh'
+    elif any('぀' <= c <= 'ゟ' or '゠' <= c <= 'ヿ' for c in text):
+        return 'ja'
+    elif any('가' <= c <= '힯' for c in text):
+        return 'ko'
+    return 'en'
+
+
+def bench_segmentation(sizes, repeat) -> list:
+    import langseg
+
+    results = []
+    for size in sizes:
+        for kind in ("mixed", "zh", "en"):
+            text = make_text(kind, size)
+            megabytes = len(text.encode("utf-8")) / 1024 / 1024
+            runs = len(langseg.split_language_runs(text))
+            row = {"kind": kind, "size_mb": round(megabytes, 2), "runs": runs}
+            for name, func in (("legacy_detect", lambda: legacy_detect(text)),
+                               ("detect_language", lambda: langseg.detect_language(text)),
+                               ("split_language_runs", lambda: langseg.split_language_runs(text))):
+                timing = time_call(func, repeat)
+                results.append(dict(function=name, **row, **timing,
+                                    mb_per_second=round(megabytes / (timing["median_ms"] / 1000), 1)))
+            summary = " ".join(f"{r['function']}={r['median_ms']:.1f}ms" for r in results[-3:])
+            print(f"[基准测试] {kind} {megabytes:.1f}MB（{runs} 段）: {summary}")
+    return results
+
+
+def bench_synthesis(runs: int, repeat) -> list:
+    import synthesis
+    from langseg import plan_language_runs
+
+    text = (ZH_SENTENCE + EN_SENTENCE) * (runs // 2) + (ZH_SENTENCE if runs % 2 else "")
+    language_runs = plan_language_runs(text, "Uncle_Fu", enabled=True)
+    results = []
+    for routing, plan in (("whole", None), ("language_runs", language_runs)):
+
+        def run():
+            temp_dir = synthesis.synthesize_to_temp("custom", False, text, language_runs=plan,
+                                                    voice="Uncle_Fu", instruct="Normal tone", speed=1.0)
+            synthesis.cleanup_temp_files(temp_dir)
+
+        run()  # 预热：加载替身模型
+        results.append(dict(routing=routing, runs=len(plan or [text]), **time_call(run, repeat)))
+        print(f"[基准测试] {routing}（{results[-1]['runs']} 段）: {results[-1]['median_ms']:.0f}ms")
+    return results
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # 每次都重新合成，不命中分段缓存
+    os.environ["QWEN3_TTS_SENTENCE_CACHE_MB"] = "0"
+    prepare_environment(tempfile.mkdtemp(prefix="qwen3_tts_bench_langseg_"), args.rtf)
+
+    segmentation = bench_segmentation(_float_list(args.sizes_mb), args.repeat)
+    synthesis_results = bench_synthesis(args.runs, args.repeat)
+
+    path = write_results("langseg", {"segmentation": segmentation, "synthesis": synthesis_results}, args.output)
+    print(f"[基准测试] 结果已写入: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+音频后处理基准测试
+
+生成带首尾静音、类似语音包络的合成音频（24kHz 单声道 16 bit），按音频时长测量 postprocess.py 各步骤的耗时：
+- trim：按 10ms 分块求峰值，定位首尾静音
+- loudness：pyloudnorm 测量积分响度并计算增益（未安装 pyloudnorm 时跳过）
+- envelope：增益与淡入淡出合成一条包络并乘到采样上
+- process_wav：完整流程，包括读取与写出 WAV 文件
+安装了 ffmpeg 时，另外测量以 ffmpeg（silenceremove + loudnorm + afade）处理同一文件的耗时作为对照。
+结果同时折算为每分钟音频的耗时。
+
+用法：
+    python -m benchmarks.bench_postprocess
+    python -m benchmarks.bench_postprocess --minutes 0.25,1,10 --repeat 5
+"""
+import os
+import sys
+import wave
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+from benchmarks.harness import REPO_ROOT, time_call, write_results
+
+SAMPLE_RATE = 24000
+
+
+def _float_list(value: str):
+    return [float(v) for v in value.split(",") if v.strip()]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="音频后处理基准测试")
+    parser.add_argument("--minutes", default="0.25,1,5", help="音频时长列表（分钟），逗号分隔")
+    parser.add_argument("--repeat", type=int, default=5, help="每项测量的重复次数")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径（默认写到 benchmarks/results/）")
+    return parser
+
+
+def make_speech_like(seconds: float):
+    """首尾各 0.5 秒静音，中间是按音节（约 4Hz）起伏的带谐波音调与噪声"""
+    import numpy as np
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    voiced = sum(np.sin(2 * np.pi * 140 * k * t) / k for k in range(1, 6))
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 2
+    samples = 0.1 * syllables * (voiced + 0.3 * rng.standard_normal(len(t)))
+    silence = np.zeros(SAMPLE_RATE // 2)
+    return np.concatenate([silence, samples, silence]).astype(np.float32)
+
+
+def write_wav(path: str, samples):
+    import numpy as np
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes((np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes())
+
+
+def bench_duration(minutes: float, workdir: str, repeat: int) -> list:
+    import postprocess
+    from postprocess import PostProcessOptions
+
+    seconds = minutes * 60
+    samples = make_speech_like(seconds)[:, None]
+    source = os.path.join(workdir, f"source_{minutes}.wav")
+    output = os.path.join(workdir, f"output_{minutes}.wav")
+    write_wav(source, samples[:, 0])
+    options = PostProcessOptions(enabled=True)
+
+    def per_minute(result):
+        result["ms_per_audio_minute"] = round(result["median_ms"] / minutes, 3)
+        return result
+
+    results = []
+    start, end = postprocess.trim_bounds(samples, SAMPLE_RATE)
+    results.append(per_minute(dict(stage="trim", minutes=minutes, **time_call(
+        lambda: postprocess.trim_bounds(samples, SAMPLE_RATE), repeat))))
+    trimmed = samples[start:end]
+
+    try:
+        import pyloudnorm  # noqa: F401
+        has_loudnorm = True
+    except ImportError:
+        has_loudnorm = False
+    if has_loudnorm:
+        results.append(per_minute(dict(stage="loudness", minutes=minutes, **time_call(
+            lambda: postprocess.loudness_gain(trimmed, SAMPLE_RATE, options.loudness_lufs), repeat))))
+    else:
+        print("[基准测试] 未安装 pyloudnorm，跳过 loudness，process_wav 不做响度归一化")
+        options = PostProcessOptions(enabled=True, loudness_lufs=None)
+
+    results.append(per_minute(dict(stage="envelope", minutes=minutes, **time_call(
+        lambda: trimmed * (postprocess.fade_envelope(trimmed.shape[0], SAMPLE_RATE, options.fade_ms) * 0.8)[:, None],
+        repeat))))
+    results.append(per_minute(dict(stage="process_wav", minutes=minutes, loudness=options.loudness_lufs is not None,
+                                   **time_call(lambda: postprocess.process_wav(source, output, options), repeat))))
+
+    if shutil.which("ffmpeg"):
+        filters = ("silenceremove=start_periods=1:start_threshold=-50dB:stop_periods=1:stop_threshold=-50dB,"
+                   f"loudnorm=I={options.loudness_lufs or -16}:TP=-1,afade=t=in:d=0.01")
+        command = ["ffmpeg", "-y", "-v", "error", "-i", source, "-af", filters, "-ar", str(SAMPLE_RATE), output]
+        results.append(per_minute(dict(stage="ffmpeg", minutes=minutes, **time_call(
+            lambda: subprocess.run(command, check=True), repeat))))
+
+    summary = " ".join(f"{r['stage']}={r['median_ms']:.1f}ms" for r in results)
+    print(f"[基准测试] {minutes:g} 分钟音频（去静音后 {(end - start) / SAMPLE_RATE:.1f}s）: {summary}")
+    return results
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    sys.path.insert(0, REPO_ROOT)
+    os.environ.setdefault("QWEN3_TTS_LOG_LEVEL", "WARNING")
+    results = []
+    with tempfile.TemporaryDirectory(prefix="qwen3_tts_bench_postprocess_") as workdir:
+        for minutes in _float_list(args.minutes):
+            results.extend(bench_duration(minutes, workdir, args.repeat))
+
+    path = write_results("postprocess", {"sample_rate": SAMPLE_RATE, "runs": results}, args.output)
+    print(f"[基准测试] 结果已写入: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
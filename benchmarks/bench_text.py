@@ -0,0 +1,108 @@
+"""
+纯 Python 热点函数基准测试
+
+覆盖字幕对齐（find_sentence_timestamps）、短句合并（merge_short_sentences）
+以及历史记录写入（save_history_item）在不同输入规模下的耗时。
+
+用法：
+    python -m benchmarks.bench_text
+    python -m benchmarks.bench_text --sizes 100,1000 --history-sizes 0,10000
+"""
+import sys
+import copy
+import argparse
+import tempfile
+
+from benchmarks.harness import prepare_environment, seed_history, time_call, write_results
+
+SENTENCE = "今天天气很好，我们去公园散步吧。"
+
+
+def _int_list(value: str):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="纯 Python 热点函数基准测试")
+    parser.add_argument("--sizes", default="100,1000,5000", help="对齐文本的字数列表，逗号分隔")
+    parser.add_argument("--history-sizes", default="0,1000,10000", help="历史记录条数列表，逗号分隔")
+    parser.add_argument("--repeat", type=int, default=5, help="每项测量的重复次数")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径（默认写到 benchmarks/results/）")
+    return parser
+
+
+def make_alignment_input(chars: int):
+    """构造约 chars 个字的文本，以及按字均分的时间戳"""
+    from api.stt_text_utils import split_text_by_punctuation
+
+    text = (SENTENCE * (chars // len(SENTENCE) + 1))[:chars]
+    char_timestamps = [{"text": c, "start": i * 0.2, "end": i * 0.2 + 0.2}
+                       for i, c in enumerate(c for c in text if not c.isspace())]
+    return split_text_by_punctuation(text), char_timestamps
+
+
+def bench_alignment(sizes, repeat) -> list:
+    from api.stt_text_utils import find_sentence_timestamps, merge_short_sentences
+
+    results = []
+    for size in sizes:
+        sentences, char_timestamps = make_alignment_input(size)
+        aligned = find_sentence_timestamps(sentences, char_timestamps)
+        results.append(dict(function="find_sentence_timestamps", chars=size, sentences=len(sentences),
+                            **time_call(lambda: find_sentence_timestamps(sentences, char_timestamps), repeat)))
+        # merge_short_sentences 会修改输入，每次传入副本
+        results.append(dict(function="merge_short_sentences", chars=size, segments=len(aligned),
+                            **time_call(lambda: merge_short_sentences(copy.deepcopy(aligned)), repeat)))
+        print(f"[基准测试] 对齐 {size} 字: "
+              f"find={results[-2]['median_ms']:.3f}ms merge={results[-1]['median_ms']:.3f}ms")
+    return results
+
+
+def bench_history(history_sizes, repeat) -> list:
+    from history import save_history_item
+
+    item = {
+        "id": "bench",
+        "text": SENTENCE,
+        "speaker": "Vivian",
+        "emotion": "Normal tone",
+        "speed": 1.0,
+        "audio_path": "outputs/CustomVoice/bench.wav",
+        "created_at": "2026-01-01T00:00:00",
+    }
+    results = []
+    for size in history_sizes:
+        # 每次测量前重置历史记录，保证各次写入面对同样的规模
+        samples = []
+        for _ in range(repeat):
+            seed_history(size)
+            samples.append(time_call(lambda: save_history_item(dict(item)), repeat=1)["min_ms"])
+        samples.sort()
+        results.append({
+            "function": "save_history_item",
+            "history_size": size,
+            "repeat": repeat,
+            "min_ms": samples[0],
+            "median_ms": samples[len(samples) // 2],
+            "max_ms": samples[-1],
+        })
+        print(f"[基准测试] 写历史记录 history={size}: {results[-1]['median_ms']:.3f}ms")
+    return results
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="qwen3_tts_bench_") as workdir:
+        prepare_environment(workdir)
+        results = {
+            "alignment": bench_alignment(_int_list(args.sizes), args.repeat),
+            "history": bench_history(_int_list(args.history_sizes), args.repeat),
+        }
+
+    path = write_results("text", results, args.output)
+    print(f"[基准测试] 结果已写入: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+模型权重加载基准测试
+
+生成一个合成的分片 safetensors 检查点（或用 --model-path 指定真实模型目录），分别用 1 个与多个进程同时加载，对比：
+- copy：不预读，直接把每个张量读入进程内存（引入 weights.py 之前的加载方式）
+- prefetch：服务的加载方式。先 weights.prefetch 映射分片并请求内核预读，再把张量复制到进程内存
+  （MLX 加载 safetensors 时同样复制到自己的缓冲区）；共享的是页缓存，不是加载后的参数
+- service：调用服务实际使用的 models.load_tts_model（预读 + mlx_audio 加载），需要 --model-path 指向
+  真实模型目录且已安装 mlx_audio
+- mmap：weights.load_tensors 返回映射区上的视图，不复制。服务目前不走这条路径（mlx_audio 只接受自己加载的权重），
+  仅作为零拷贝的上限参考
+
+每种方式测量冷启动（加载前清除这些文件的页缓存）与热启动（页缓存已就绪，相当于模型卸载后重新加载），
+记录每个进程的加载耗时（含逐页访问全部权重）与内存：RSS，以及 Linux 上的匿名页 / 文件页 RSS 与按共享比例
+折算的 PSS。PSS 之和才是多个进程实际占用的物理内存。
+
+用法：
+    python -m benchmarks.bench_weights
+    python -m benchmarks.bench_weights --size-mb 1024 --shards 4 --processes 1,4
+    python -m benchmarks.bench_weights --model-path models/Qwen3-TTS-...-8bit --modes prefetch,service
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing
+from typing import Dict, List
+
+from benchmarks.harness import REPO_ROOT, write_results
+
+PAGE_SIZE = 4096
+# 每个张量 1024 x 1024 个 F16
+TENSOR_SHAPE = [1024, 1024]
+TENSOR_BYTES = 1024 * 1024 * 2
+
+
+def _int_list(value: str):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="模型权重加载基准测试")
+    parser.add_argument("--size-mb", type=int, default=256, help="合成检查点的大小（MB）")
+    parser.add_argument("--shards", type=int, default=4, help="分片数")
+    parser.add_argument("--processes", default="1,4", help="同时加载的进程数列表，逗号分隔")
+    parser.add_argument("--modes", default="copy,prefetch,mmap",
+                        help="加载方式列表，逗号分隔：copy / prefetch / service / mmap")
+    parser.add_argument("--model-path", default=None, help="使用真实模型目录代替合成检查点（service 方式需要）")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径（默认写到 benchmarks/results/）")
+    return parser
+
+
+def write_checkpoint(model_path: str, size_mb: int, shards: int) -> List[str]:
+    """写出合成的分片检查点与索引文件，返回分片路径"""
+    os.makedirs(model_path, exist_ok=True)
+    tensor_count = max(shards, size_mb * 1024 * 1024 // TENSOR_BYTES)
+    weight_map = {}
+    paths = []
+    for shard in range(shards):
+        filename = f"model-{shard + 1:05d}-of-{shards:05d}.safetensors"
+        names = [f"layers.{i}.weight" for i in range(shard, tensor_count, shards)]
+        header = {name: {"dtype": "F16", "shape": TENSOR_SHAPE,
+                         "data_offsets": [i * TENSOR_BYTES, (i + 1) * TENSOR_BYTES]}
+                  for i, name in enumerate(names)}
+        header["__metadata__"] = {"format": "mlx"}
+        header_bytes = json.dumps(header).encode("utf-8")
+        header_bytes += b" " * (-len(header_bytes) % 8)
+        path = os.path.join(model_path, filename)
+        with open(path, "wb") as f:
+            f.write(len(header_bytes).to_bytes(8, "little"))
+            f.write(header_bytes)
+            for _ in names:
+                f.write(os.urandom(TENSOR_BYTES))
+        weight_map.update({name: filename for name in names})
+        paths.append(path)
+    with open(os.path.join(model_path, "model.safetensors.index.json"), "w", encoding="utf-8") as f:
+        json.dump({"metadata": {}, "weight_map": weight_map}, f)
+    return paths
+
+
+def drop_page_cache(paths: List[str]) -> bool:
+    """清除文件的页缓存（posix_fadvise DONTNEED，仅 Linux 等支持的平台）"""
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return True
+
+
+def memory_mb() -> Dict[str, float]:
+    """当前进程的内存占用（MB）"""
+    usage = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "RssAnon", "RssFile"):
+                    usage[{"VmRSS": "rss", "RssAnon": "rss_anon", "RssFile": "rss_file"}[key]] = int(value.split()[0]) / 1024
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    usage["pss"] = int(line.split()[1]) / 1024
+    except OSError:
+        import resource
+        # macOS 上 ru_maxrss 单位为字节，Linux 上为 KB
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        usage["rss"] = maxrss / 1024 / 1024 if sys.platform == "darwin" else maxrss / 1024
+    return {key: round(value, 1) for key, value in usage.items()}
+
+
+def _load(model_path: str, mode: str, barrier, results):
+    """子进程：加载并逐页访问全部权重，等所有进程都加载完后测量内存"""
+    import numpy as np
+    import weights
+
+    start = time.perf_counter()
+    checksum = 0
+    if mode == "service":
+        import models
+        model = models.load_tts_model(model_path)  # noqa: F841  测量内存时模型须仍在内存中
+    else:
+        if mode == "prefetch":
+            weights.prefetch(model_path)
+        tensors = weights.load_tensors(model_path, use_mmap=(mode == "mmap"))
+        for array in tensors.values():
+            checksum += int(array.reshape(-1).view(np.uint8)[::PAGE_SIZE].sum())
+    elapsed = time.perf_counter() - start
+
+    barrier.wait()
+    results.put({"load_seconds": elapsed, "checksum": checksum, **memory_mb()})
+    # 所有进程都测量完之后再退出，保证测量时共享页仍被各进程映射
+    barrier.wait()
+
+
+def run(model_path: str, paths: List[str], mode: str, processes: int, cold: bool) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    if cold:
+        drop_page_cache(paths)
+    barrier = ctx.Barrier(processes)
+    results = ctx.Queue()
+    workers = [ctx.Process(target=_load, args=(model_path, mode, barrier, results)) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    samples = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    def total(key):
+        return round(sum(s.get(key, 0.0) for s in samples), 1)
+
+    loads = sorted(s["load_seconds"] for s in samples)
+    return {
+        "mode": mode,
+        "processes": processes,
+        "cache": "cold" if cold else "warm",
+        "load_mean_ms": round(sum(loads) / len(loads) * 1000, 1),
+        "load_max_ms": round(loads[-1] * 1000, 1),
+        "rss_per_process_mb": round(total("rss") / processes, 1),
+        "rss_total_mb": total("rss"),
+        "rss_anon_total_mb": total("rss_anon"),
+        "rss_file_total_mb": total("rss_file"),
+        "pss_total_mb": total("pss"),
+    }
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    sys.path.insert(0, REPO_ROOT)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="qwen3_tts_bench_weights_") as workdir:
+        if args.model_path:
+            import weights
+            model_path = os.path.abspath(args.model_path)
+            paths = weights.checkpoint_files(model_path)
+            if not paths:
+                print(f"[基准测试] {model_path} 下没有 safetensors 文件")
+                return 1
+        else:
+            model_path = os.path.join(workdir, "synthetic-model")
+            paths = write_checkpoint(model_path, args.size_mb, args.shards)
+        modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+        if "service" in modes and not args.model_path:
+            print("[基准测试] service 方式需要 --model-path 指向真实模型目录，跳过")
+            modes.remove("service")
+        size_mb = sum(os.path.getsize(p) for p in paths) / 1024 / 1024
+        print(f"[基准测试] 检查点: {size_mb:.0f} MB，{len(paths)} 个分片")
+        if not hasattr(os, "posix_fadvise"):
+            print("[基准测试] 当前平台无法清除页缓存，冷启动结果与热启动相同")
+
+        for mode in modes:
+            for processes in _int_list(args.processes):
+                for cold in (True, False):
+                    result = run(model_path, paths, mode, processes, cold)
+                    results.append(result)
+                    print(f"[基准测试] {mode:8s} x{processes} {result['cache']:4s}: "
+                          f"加载 {result['load_mean_ms']:.0f}ms（最慢 {result['load_max_ms']:.0f}ms） "
+                          f"RSS 合计 {result['rss_total_mb']:.0f}MB "
+                          f"匿名页 {result['rss_anon_total_mb']:.0f}MB PSS 合计 {result['pss_total_mb']:.0f}MB")
+
+    path = write_results("weights", {"checkpoint_mb": round(size_mb, 1), "model_path": args.model_path,
+                                     "runs": results}, args.output)
+    print(f"[基准测试] 结果已写入: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
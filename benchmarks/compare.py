@@ -0,0 +1,71 @@
+"""
+对比两次基准测试结果
+
+用法：
+    python -m benchmarks.compare benchmarks/results/api_abc1234_*.json benchmarks/results/api_def5678_*.json
+"""
+import sys
+import json
+import argparse
+
+# 每类结果中用于匹配同一测量项的字段，以及参与对比的指标
+_API_KEYS = ("endpoint", "history_size", "concurrency")
+_API_METRICS = ("p50_ms", "p99_ms", "throughput_rps")
+_TEXT_KEYS = ("function", "chars", "history_size")
+_TEXT_METRICS = ("median_ms",)
+
+
+def _rows(payload: dict):
+    results = payload["results"]
+    if "runs" in results:
+        return [(_API_KEYS, _API_METRICS, row) for row in results["runs"]]
+    rows = []
+    for group in results.values():
+        rows.extend((_TEXT_KEYS, _TEXT_METRICS, row) for row in group)
+    return rows
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> int:
+    """打印各指标的变化，返回超过阈值的退化项数量"""
+    def index(payload):
+        return {tuple((k, row.get(k)) for k in keys): (metrics, row) for keys, metrics, row in _rows(payload)}
+
+    base_rows = index(baseline)
+    regressions = 0
+    print(f"基准: {baseline['commit']}  对比: {current['commit']}")
+    for key, (metrics, row) in index(current).items():
+        if key not in base_rows:
+            continue
+        base = base_rows[key][1]
+        label = " ".join(f"{k}={v}" for k, v in key if v is not None)
+        for metric in metrics:
+            old, new = base.get(metric), row.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            # 吞吐量越高越好，其余指标越低越好
+            worse = -change if metric.endswith("rps") else change
+            flag = "  <-- 退化" if worse > threshold else ""
+            regressions += bool(flag)
+            print(f"{label:<48} {metric:<15} {old:>11.3f} -> {new:>11.3f} ({change:+.1%}){flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="对比两次基准测试结果")
+    parser.add_argument("baseline", help="基准结果 JSON")
+    parser.add_argument("current", help="对比结果 JSON")
+    parser.add_argument("--threshold", type=float, default=0.10, help="判定为退化的相对变化（默认 10%%）")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    print(f"退化项: {regressions}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
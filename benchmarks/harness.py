@@ -0,0 +1,232 @@
+"""
+基准测试公共工具
+
+prepare_environment() 必须在导入任何项目模块之前调用：
+它把 mlx_audio 替身放到 sys.path 最前面，并把输出目录、历史文件、
+模型目录等数据路径改到临时目录，避免污染仓库中的真实数据。
+"""
+import io
+import os
+import sys
+import json
+import math
+import time
+import wave
+import struct
+import platform
+import subprocess
+import contextlib
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUBS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stubs")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+BENCH_VOICE = "bench_voice"
+
+
+def prepare_environment(workdir: str, rtf: Optional[float] = None):
+    """使用替身模型和临时数据目录初始化环境，返回 config 模块"""
+    if rtf is not None:
+        os.environ["QWEN3_TTS_BENCH_RTF"] = str(rtf)
+    # 默认关闭限流并放宽排队上限，测的是处理能力而不是准入策略（可通过环境变量覆盖）
+    os.environ.setdefault("QWEN3_TTS_RATE_LIMIT_PER_SECOND", "0")
+    os.environ.setdefault("QWEN3_TTS_LOG_LEVEL", "WARNING")
+    for name in ("QWEN3_TTS_TTS_MAX_QUEUE", "QWEN3_TTS_STT_MAX_QUEUE"):
+        os.environ.setdefault(name, "100000")
+    for path in (REPO_ROOT, STUBS_DIR):
+        if path in sys.path:
+            sys.path.remove(path)
+    sys.path.insert(0, REPO_ROOT)
+    sys.path.insert(0, STUBS_DIR)
+    # app.py 以相对路径挂载 static 目录
+    os.chdir(REPO_ROOT)
+
+    import config
+    config.BASE_OUTPUT_DIR = os.path.join(workdir, "outputs")
+    config.STT_OUTPUT_DIR = os.path.join(config.BASE_OUTPUT_DIR, "STT")
+    config.MODELS_DIR = os.path.join(workdir, "models")
+    config.VOICES_DIR = os.path.join(workdir, "voices")
+    config.HISTORY_FILE = os.path.join(workdir, "history.json")
+    config.HISTORY_DB = os.path.join(workdir, "history.db")
+    config.TMP_DIR = os.path.join(workdir, "tmp")
+    config.SENTENCE_CACHE_DIR = os.path.join(config.TMP_DIR, "sentence_cache")
+
+    # 替身模型只需要模型目录存在
+    folders = [info["folder"] for variants in config.MODELS.values() for info in variants.values()]
+    folders += [info["folder"] for info in config.ASR_MODELS.values()]
+    folders += [info["folder"] for info in config.FORCED_ALIGNER_MODELS.values()]
+    for folder in folders:
+        os.makedirs(os.path.join(config.MODELS_DIR, folder), exist_ok=True)
+    for path in (config.BASE_OUTPUT_DIR, config.VOICES_DIR, config.TMP_DIR):
+        os.makedirs(path, exist_ok=True)
+
+    # 克隆接口使用的参考音色
+    with open(os.path.join(config.VOICES_DIR, f"{BENCH_VOICE}.wav"), "wb") as f:
+        f.write(make_wav(3.0))
+    with open(os.path.join(config.VOICES_DIR, f"{BENCH_VOICE}.txt"), "w", encoding="utf-8") as f:
+        f.write("这是一段用于基准测试的参考音频。")
+    return config
+
+
+def make_wav(seconds: float, sample_rate: int = 24000) -> bytes:
+    """生成一段正弦波 WAV（内存中）"""
+    samples = int(seconds * sample_rate)
+    pcm = struct.pack(f"<{samples}h", *(int(8000 * math.sin(2 * math.pi * 440 * i / sample_rate))
+                                        for i in range(samples)))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def make_history(size: int) -> List[dict]:
+    """生成 size 条与真实接口结构一致的历史记录（最新的在前）"""
+    items = []
+    for i in range(size):
+        if i % 5 == 0:
+            items.append({
+                "id": f"stt-{i}",
+                "type": "stt",
+                "audio_filename": f"meeting_{i}.wav",
+                "text": "今天天气很好，我们去公园散步吧。" * 4,
+                "language": "Chinese",
+                "segments": [{"id": j, "start": j * 2.0, "end": j * 2.0 + 1.8,
+                              "text": "今天天气很好", "confidence": 0.0} for j in range(8)],
+                "txt_path": f"outputs/STT/meeting_{i}.txt",
+                "srt_path": f"outputs/STT/meeting_{i}.srt",
+                "created_at": "2026-01-01T00:00:00",
+            })
+        else:
+            items.append({
+                "id": f"tts-{i}",
+                "text": "欢迎使用 Qwen3-TTS，这是一条历史记录。",
+                "speaker": "Vivian",
+                "emotion": "Normal tone",
+                "speed": 1.0,
+                "audio_path": f"outputs/CustomVoice/20260101_000000_{i}.wav",
+                "created_at": "2026-01-01T00:00:00",
+            })
+    return items
+
+
+def seed_history(size: int):
+    """把历史记录重置为 size 条"""
+    from history import _connect, save_history_items
+
+    _connect().execute("DELETE FROM history")
+    # make_history 最新的在前，save_history_items 按保存顺序写入
+    save_history_items(list(reversed(make_history(size))))
+
+
+@contextlib.contextmanager
+def quiet():
+    """屏蔽被测代码的 print 输出"""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """线性插值百分位数（输入需已排序）"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(latencies: List[float], wall_seconds: float, errors: int = 0) -> dict:
+    """汇总延迟（毫秒）与吞吐量"""
+    values = sorted(latencies)
+    return {
+        "requests": len(values) + errors,
+        "errors": errors,
+        "wall_seconds": round(wall_seconds, 4),
+        "throughput_rps": round(len(values) / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p90_ms": round(percentile(values, 0.90) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+async def run_concurrent(send: Callable[[int], Awaitable[bool]], total: int, concurrency: int) -> dict:
+    """以固定并发度执行 total 次请求
+
+    Args:
+        send: 发送第 i 个请求的协程函数，成功返回 True
+        total: 请求总数
+        concurrency: 同时进行的请求数
+    """
+    import asyncio
+
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            ok = await send(i)
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+def time_call(func: Callable[[], object], repeat: int = 5, number: int = 1) -> dict:
+    """多次调用 func，返回单次调用的耗时统计（毫秒）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    samples.sort()
+    return {
+        "repeat": repeat,
+        "number": number,
+        "min_ms": round(samples[0] * 1000, 4),
+        "median_ms": round(percentile(samples, 0.5) * 1000, 4),
+        "max_ms": round(samples[-1] * 1000, 4),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return "unknown"
+
+
+def write_results(name: str, results: dict, output: Optional[str] = None) -> str:
+    """把结果连同运行环境写为 JSON，返回文件路径"""
+    commit = _git_commit()
+    payload = {
+        "benchmark": name,
+        "commit": commit,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "simulated_rtf": float(os.environ.get("QWEN3_TTS_BENCH_RTF", "0.05")),
+        "results": results,
+    }
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{name}_{commit}_{timestamp}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    return output
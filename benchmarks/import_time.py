@@ -0,0 +1,177 @@
+"""
+启动耗时基准测试
+
+- 用 python -X importtime 分别测量 import app 与 import main 的导入耗时，列出最慢的模块
+- 检查启动时没有导入应当推迟到首次推理的重量级依赖（mlx_audio、transformers、librosa 等）
+- 启动 uvicorn，测量从进程启动到 /api/health 与首页可用的时间
+
+默认使用 benchmarks/stubs 下的 mlx_audio 替身；--real 使用已安装的 mlx_audio。
+存在不应在启动时导入的模块时退出码为 1。
+
+用法：
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --repeat 5 --top 15
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import subprocess
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional
+
+from benchmarks.harness import REPO_ROOT, STUBS_DIR, percentile, write_results
+
+TARGETS = ["app", "main"]
+# 启动时不应导入的模块（只在首次推理、OCR 或远程节点调用时导入）
+DEFERRED_MODULES = ["mlx_audio", "mlx", "transformers", "librosa", "numba", "requests", "httpx"]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="启动耗时基准测试")
+    parser.add_argument("--repeat", type=int, default=3, help="每项测量的重复次数（取中位数）")
+    parser.add_argument("--top", type=int, default=10, help="列出累计耗时最长的模块数")
+    parser.add_argument("--real", action="store_true", help="使用已安装的 mlx_audio，而不是替身")
+    parser.add_argument("--skip-server", action="store_true", help="不测量服务启动到可用的时间")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径（默认写到 benchmarks/results/）")
+    return parser
+
+
+def _env(real: bool) -> dict:
+    env = dict(os.environ, QWEN3_TTS_LOG_LEVEL="WARNING")
+    if not real:
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [STUBS_DIR, env.get("PYTHONPATH")]))
+    return env
+
+
+def parse_importtime(stderr: str) -> List[dict]:
+    """解析 -X importtime 输出，返回 [{module, depth, self_us, cumulative_us}]"""
+    rows = []
+    for line in stderr.splitlines():
+        parts = line[len("import time:"):].split("|") if line.startswith("import time:") else []
+        # 跳过表头 "self [us] | cumulative | imported package"
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        name = parts[2]
+        stripped = name.lstrip(" ")
+        rows.append({
+            "module": stripped.strip(),
+            "depth": (len(name) - len(stripped) - 1) // 2,
+            "self_us": int(parts[0]),
+            "cumulative_us": int(parts[1]),
+        })
+    return rows
+
+
+def measure_import(target: str, env: dict) -> dict:
+    """在新进程中导入 target，返回墙钟耗时、各模块导入耗时与已导入的推迟模块"""
+    code = (f"import sys; import {target}; "
+            f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))")
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"import {target} 失败:\n{result.stderr[-2000:]}")
+    rows = parse_importtime(result.stderr)
+    target_row = next((r for r in rows if r["module"] == target and r["depth"] == 0), None)
+    return {
+        "wall_seconds": wall,
+        "import_seconds": target_row["cumulative_us"] / 1e6 if target_row else 0.0,
+        "rows": rows,
+        "deferred_imported": [m for m in result.stdout.strip().split(",") if m],
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(url: str, deadline: float) -> Optional[float]:
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.01)
+    return None
+
+
+def measure_server(env: dict, timeout: float = 60) -> Dict[str, Optional[float]]:
+    """启动 uvicorn，返回进程启动到 /api/health 与首页返回 200 的秒数"""
+    port = _free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1",
+                                "--port", str(port), "--log-level", "warning"],
+                               cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = start + timeout
+        health = _wait_for(f"http://127.0.0.1:{port}/api/health", deadline)
+        page = _wait_for(f"http://127.0.0.1:{port}/tts", deadline) if health else None
+        return {
+            "health_seconds": health - start if health else None,
+            "page_seconds": page - start if page else None,
+        }
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def _median(values: List[float]) -> float:
+    return round(percentile(sorted(values), 0.5), 4) if values else 0.0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    env = _env(args.real)
+    results = {"imports": {}, "server": None}
+    deferred_imported = set()
+
+    for target in TARGETS:
+        runs = [measure_import(target, env) for _ in range(args.repeat)]
+        last = runs[-1]
+        deferred_imported.update(last["deferred_imported"])
+        direct = sorted((r for r in last["rows"] if r["depth"] == 1), key=lambda r: r["cumulative_us"], reverse=True)
+        heaviest = sorted(last["rows"], key=lambda r: r["self_us"], reverse=True)
+        results["imports"][target] = {
+            "wall_seconds": _median([r["wall_seconds"] for r in runs]),
+            "import_seconds": _median([r["import_seconds"] for r in runs]),
+            "modules": len(last["rows"]),
+            "deferred_imported": last["deferred_imported"],
+            "top_direct_imports": [{"module": r["module"], "cumulative_ms": round(r["cumulative_us"] / 1000, 2)}
+                                   for r in direct[:args.top]],
+            "top_self": [{"module": r["module"], "self_ms": round(r["self_us"] / 1000, 2)}
+                         for r in heaviest[:args.top]],
+        }
+        summary = results["imports"][target]
+        print(f"[基准测试] import {target:<4} 导入={summary['import_seconds'] * 1000:8.1f}ms "
+              f"进程={summary['wall_seconds'] * 1000:8.1f}ms 模块数={summary['modules']}")
+        for row in summary["top_direct_imports"]:
+            print(f"             {row['module']:<40} {row['cumulative_ms']:8.1f}ms")
+        if summary["deferred_imported"]:
+            print(f"[基准测试] import {target} 在启动时导入了: {', '.join(summary['deferred_imported'])}")
+
+    if not args.skip_server:
+        runs = [measure_server(env) for _ in range(args.repeat)]
+        health = [r["health_seconds"] for r in runs if r["health_seconds"] is not None]
+        page = [r["page_seconds"] for r in runs if r["page_seconds"] is not None]
+        results["server"] = {
+            "health_seconds": _median(health) if health else None,
+            "page_seconds": _median(page) if page else None,
+            "failures": len(runs) - len(health),
+        }
+        print(f"[基准测试] 启动到 /api/health 可用: "
+              f"{results['server']['health_seconds']}s，首页: {results['server']['page_seconds']}s")
+
+    path = write_results("import", results, args.output)
+    print(f"[基准测试] 结果已写入: {path}")
+    return 1 if deferred_imported else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,14 @@
+"""
+基准测试用的 mlx_audio 替身
+
+只实现本项目用到的 load_model / generate_audio / generate_transcription，
+输出完全由输入决定，推理耗时按音频时长乘以固定实时率模拟，
+使基准测试可以在没有 Apple Silicon 的 Linux 机器上复现。
+"""
+import os
+
+# 模拟推理耗时：每秒音频耗费的墙钟秒数（0 表示不休眠，只测框架开销）
+SIMULATED_RTF = float(os.environ.get("QWEN3_TTS_BENCH_RTF", "0.05"))
+# 每个字符对应的音频时长（秒）
+SECONDS_PER_CHAR = 0.2
+SAMPLE_RATE = 24000
@@ -0,0 +1,38 @@
+"""STT 生成替身：ASR 返回固定文本，对齐返回按字均分的时间戳"""
+import time
+import wave
+from mlx_audio import SIMULATED_RTF
+
+TRANSCRIPT = "今天天气很好，我们去公园散步吧。路上遇到了很多朋友！大家一起聊天，非常开心。"
+
+
+class StubTranscription:
+    def __init__(self, text: str, segments: list, language: str = "Chinese"):
+        self.text = text
+        self.segments = segments
+        self.language = language
+
+
+def _duration(audio: str) -> float:
+    try:
+        with wave.open(audio, "rb") as wf:
+            return wf.getnframes() / float(wf.getframerate())
+    except (wave.Error, OSError, EOFError):
+        return 0.0
+
+
+def generate_transcription(model=None, audio: str = "", text: str = None, language: str = "Chinese", **kwargs):
+    duration = _duration(audio)
+    if SIMULATED_RTF > 0:
+        time.sleep(duration * SIMULATED_RTF)
+
+    if text is None:
+        # ASR
+        return StubTranscription(TRANSCRIPT, [{"text": TRANSCRIPT, "start": 0.0, "end": duration}], language)
+
+    # ForcedAligner：逐字均分时间
+    chars = [c for c in text if not c.isspace()]
+    step = duration / max(1, len(chars))
+    segments = [{"text": c, "start": round(i * step, 3), "end": round((i + 1) * step, 3)}
+                for i, c in enumerate(chars)]
+    return StubTranscription(text, segments, language)
@@ -0,0 +1,2 @@
+"""STT 模型加载替身"""
+from mlx_audio.tts.utils import StubModel, load_model  # noqa: F401
@@ -0,0 +1,32 @@
+"""TTS 生成替身：写出确定性的正弦波 WAV"""
+import os
+import math
+import time
+import wave
+import struct
+import zlib
+from mlx_audio import SIMULATED_RTF, SECONDS_PER_CHAR, SAMPLE_RATE
+
+
+def _render_pcm(text: str, seconds: float) -> bytes:
+    # 频率由文本决定，保证同一输入得到完全相同的输出
+    frequency = 200 + zlib.crc32(text.encode("utf-8")) % 400
+    period = SAMPLE_RATE / frequency
+    cycle = [int(8000 * math.sin(2 * math.pi * i / period)) for i in range(int(period))]
+    samples = int(seconds * SAMPLE_RATE)
+    frame = struct.pack(f"<{len(cycle)}h", *cycle)
+    repeats = samples // len(cycle) + 1
+    return (frame * repeats)[:samples * 2]
+
+
+def generate_audio(model=None, text: str = "", output_path: str = ".", **kwargs):
+    seconds = max(1, len(text.strip())) * SECONDS_PER_CHAR * (1.0 / float(kwargs.get("speed") or 1.0))
+    if SIMULATED_RTF > 0:
+        time.sleep(seconds * SIMULATED_RTF)
+
+    os.makedirs(output_path, exist_ok=True)
+    with wave.open(os.path.join(output_path, "audio_000.wav"), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(_render_pcm(text, seconds))
@@ -0,0 +1,17 @@
+"""TTS 模型加载替身"""
+import os
+import time
+
+
+class StubModel:
+    """替身模型，只记录模型路径"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path.rstrip("/"))
+
+
+def load_model(model_path: str) -> StubModel:
+    # 模拟从磁盘读取权重的固定开销
+    time.sleep(0.05)
+    return StubModel(model_path)
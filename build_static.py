@@ -0,0 +1,154 @@
+"""
+前端静态资源构建
+
+- 把 app.js 与它动态加载的模块按加载顺序合并为一个脚本，页面只需一次请求
+- 安装了 Tailwind CSS v3 命令行工具时，按模板与脚本中实际用到的类生成静态 CSS，替代 CDN 运行时编译
+- 输出文件名带内容哈希，并预先生成 .gz 与 .br（需安装 brotli）压缩版本，由 /static 直接返回
+
+结果写入 static/dist/，manifest.json 记录原路径到构建产物的映射；页面渲染时读取该映射，
+未构建时仍使用原始文件与 CDN。重新构建后需重启服务（或设置 QWEN3_TTS_PAGE_CACHE=0）。
+
+用法：
+    python build_static.py
+    python build_static.py --tailwind ./node_modules/.bin/tailwindcss
+    python build_static.py --clean
+"""
+import os
+import re
+import sys
+import gzip
+import json
+import shutil
+import hashlib
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, List, Optional
+
+from config import BASE_DIR, STATIC_DIR
+
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_FILE = os.path.join(DIST_DIR, "manifest.json")
+HASH_LENGTH = 10
+# 只压缩文本资源，太小的文件压缩收益不足以抵消解压开销
+COMPRESS_MIN_BYTES = 1024
+
+TAILWIND_INPUT = "@tailwind base;\n@tailwind components;\n@tailwind utilities;\n"
+TAILWIND_CONFIG = "module.exports = {{ content: {content}, theme: {{ extend: {{}} }}, plugins: [] }};\n"
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="构建前端静态资源")
+    parser.add_argument("--tailwind", default=None,
+                        help="Tailwind CSS v3 命令行工具路径（默认在 PATH 与 node_modules/.bin 中查找）")
+    parser.add_argument("--no-tailwind", action="store_true", help="不生成 Tailwind CSS，页面继续使用 CDN")
+    parser.add_argument("--clean", action="store_true", help="只删除 static/dist/")
+    return parser
+
+
+def module_scripts() -> List[str]:
+    """app.js 中 scripts 列表的模块路径（相对 static/），保持加载顺序"""
+    with open(os.path.join(STATIC_DIR, "js", "app.js"), encoding="utf-8") as f:
+        return re.findall(r"'/static/(js/modules/[^']+\.js)'", f.read())
+
+
+def bundle_js() -> str:
+    """合并模块与 app.js；模块本来就是共享全局作用域的普通脚本，按原顺序拼接语义不变"""
+    parts = ["/* 由 build_static.py 生成，请勿手动修改 */\nwindow.ASSET_BUNDLED = true;\n"]
+    for rel_path in module_scripts() + ["js/app.js"]:
+        with open(os.path.join(STATIC_DIR, rel_path), encoding="utf-8") as f:
+            parts.append(f"\n/* ---- {rel_path} ---- */\n{f.read().rstrip()}\n;\n")
+    return "".join(parts)
+
+
+def find_tailwind(path: Optional[str]) -> Optional[str]:
+    if path:
+        return path
+    local = os.path.join(BASE_DIR, "node_modules", ".bin", "tailwindcss")
+    return shutil.which("tailwindcss") or (local if os.path.exists(local) else None)
+
+
+def _brotli():
+    """brotli 为可选依赖"""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def build_tailwind(executable: str) -> str:
+    """只包含模板与脚本中用到的类的 Tailwind CSS（与 cdn.tailwindcss.com 同为 v3 默认主题）"""
+    content = [os.path.join(BASE_DIR, "templates.py"), os.path.join(STATIC_DIR, "js", "**", "*.js")]
+    with tempfile.TemporaryDirectory(prefix="qwen3_tts_tailwind_") as workdir:
+        config_path = os.path.join(workdir, "tailwind.config.js")
+        input_path = os.path.join(workdir, "input.css")
+        output_path = os.path.join(workdir, "output.css")
+        with open(config_path, "w", encoding="utf-8") as f:
+            f.write(TAILWIND_CONFIG.format(content=json.dumps(content)))
+        with open(input_path, "w", encoding="utf-8") as f:
+            f.write(TAILWIND_INPUT)
+        result = subprocess.run([executable, "-c", config_path, "-i", input_path, "-o", output_path, "--minify"],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"tailwindcss 执行失败:\n{result.stderr[-2000:]}")
+        with open(output_path, encoding="utf-8") as f:
+            return f.read()
+
+
+def write_asset(name: str, ext: str, content: str) -> str:
+    """写入带内容哈希的文件及其压缩版本，返回相对 static/ 的路径"""
+    data = content.encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    filename = f"{name}.{digest}{ext}"
+    path = os.path.join(DIST_DIR, filename)
+    with open(path, "wb") as f:
+        f.write(data)
+
+    sizes = [f"{len(data) / 1024:.1f}KB"]
+    if len(data) >= COMPRESS_MIN_BYTES:
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        with open(path + ".gz", "wb") as f:
+            f.write(compressed)
+        sizes.append(f"gzip {len(compressed) / 1024:.1f}KB")
+        brotli = _brotli()
+        if brotli is not None:
+            compressed = brotli.compress(data, quality=11)
+            with open(path + ".br", "wb") as f:
+                f.write(compressed)
+            sizes.append(f"br {len(compressed) / 1024:.1f}KB")
+    print(f"[构建] dist/{filename}: {', '.join(sizes)}")
+    return f"dist/{filename}"
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    shutil.rmtree(DIST_DIR, ignore_errors=True)
+    if args.clean:
+        print("[构建] 已删除 static/dist/")
+        return 0
+    os.makedirs(DIST_DIR)
+
+    manifest: Dict[str, str] = {"js/app.js": write_asset("app", ".js", bundle_js())}
+    with open(os.path.join(STATIC_DIR, "css", "styles.css"), encoding="utf-8") as f:
+        manifest["css/styles.css"] = write_asset("styles", ".css", f.read())
+
+    executable = None if args.no_tailwind else find_tailwind(args.tailwind)
+    if executable:
+        try:
+            manifest["tailwind"] = write_asset("tailwind", ".css", build_tailwind(executable))
+        except (OSError, RuntimeError) as e:
+            print(f"[构建] 生成 Tailwind CSS 失败，页面继续使用 CDN: {e}", file=sys.stderr)
+    elif not args.no_tailwind:
+        print("[构建] 未找到 tailwindcss 命令行工具，页面继续使用 CDN（npm install -D tailwindcss@3 后重新构建）")
+
+    if _brotli() is None:
+        print("[构建] 未安装 brotli，只生成 gzip 压缩版本（pip install brotli）")
+    with open(MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"[构建] 清单已写入: {os.path.relpath(MANIFEST_FILE, BASE_DIR)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
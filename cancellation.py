@@ -0,0 +1,119 @@
+"""
+请求取消与耗时上限
+
+客户端断开（关闭页面、前端 abort）或请求超过耗时上限后，不再为它继续推理：
+- 每个请求有一个 CancelToken，推理代码在段与段之间（长文本的各文本段之间、识别与对齐之间）调用
+  check_cancelled()，令牌已取消时抛出 RequestCancelled，已生成的临时文件随异常路径清理
+- until_disconnected 在等待推理结果的同时轮询客户端连接，断开时立即放弃等待
+- 推理库的单次调用无法从外部打断，取消在当前段完成后生效
+"""
+import time
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Awaitable, Optional, TypeVar
+from fastapi import HTTPException, Request
+from config import DISCONNECT_POLL_INTERVAL
+from metrics import CANCELLED_REQUESTS
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# 客户端已断开（沿用 nginx 的 499 Client Closed Request，客户端收不到该响应，只用于日志与指标）
+STATUS_CLIENT_CLOSED = 499
+
+
+class RequestCancelled(HTTPException):
+    """请求被取消：客户端断开为 499，超过耗时上限为 504"""
+
+    def __init__(self, reason: str):
+        if reason == "timeout":
+            super().__init__(status_code=504, detail="处理超时，已中止")
+        else:
+            super().__init__(status_code=STATUS_CLIENT_CLOSED, detail="客户端已断开，已取消处理")
+        self.reason = reason
+
+
+class CancelToken:
+    """协作式取消令牌（线程安全）
+
+    Args:
+        budget: 耗时上限（秒），从创建令牌时开始计算；0 表示不限
+    """
+
+    def __init__(self, budget: float = 0):
+        self.deadline = time.monotonic() + budget if budget > 0 else None
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+
+    def cancel(self, reason: str = "disconnected"):
+        if self._event.is_set():
+            return
+        self.reason = reason
+        self._event.set()
+        CANCELLED_REQUESTS.inc(reason=reason)
+        logger.info("[请求取消] 原因: %s", reason)
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._event.is_set() and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("timeout")
+        return self._event.is_set()
+
+    def check(self):
+        """已取消或超过耗时上限时抛出 RequestCancelled"""
+        if self.cancelled:
+            raise RequestCancelled(self.reason)
+
+
+_current_token: contextvars.ContextVar[Optional[CancelToken]] = contextvars.ContextVar("cancel_token", default=None)
+
+
+@contextmanager
+def use_token(token: CancelToken):
+    """在当前上下文（及由它调用的 run_in_threadpool）中启用令牌"""
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+
+def check_cancelled():
+    """当前请求已取消时抛出 RequestCancelled；没有令牌时（命令行、推理节点）什么也不做"""
+    token = _current_token.get()
+    if token is not None:
+        token.check()
+
+
+async def wait_disconnected(request: Request):
+    """客户端断开时返回（请求体读取完之后才能调用）"""
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+
+async def until_disconnected(request: Request, awaitable: Awaitable[T], token: Optional[CancelToken] = None) -> T:
+    """等待 awaitable 完成；客户端先断开时取消令牌、放弃等待并抛出 RequestCancelled"""
+    work = asyncio.ensure_future(awaitable)
+    watcher = asyncio.ensure_future(wait_disconnected(request))
+    try:
+        await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        work.cancel()
+        raise
+    finally:
+        watcher.cancel()
+    if work.done():
+        return work.result()
+
+    if token is not None:
+        token.cancel("disconnected")
+    work.cancel()
+    try:
+        await work
+    except asyncio.CancelledError:
+        pass
+    raise RequestCancelled("disconnected")
@@ -0,0 +1,338 @@
+"""
+多进程部署入口
+
+按模型类别启动多个 uvicorn 工作进程（每个进程只加载分配给它的模型），
+并在对外端口上运行一个轻量反向代理，把请求转发给负责对应模型的进程。
+历史记录保存在共享的 SQLite 数据库中，音色与输出文件位于共享目录，因此任一进程都能读写。
+
+注意：不要使用 uvicorn --workers 启动 app.py，多个进程会各自加载全部模型。
+
+用法：
+    python cluster.py
+    python cluster.py --workers "custom;design,clone;stt" --port 8766
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import itertools
+import subprocess
+from typing import List, Optional
+
+import httpx
+
+from config import BASE_DIR, MODEL_CLASSES, CLUSTER_WORKERS, CLUSTER_BASE_PORT
+from logs import setup_logging, get_logger
+
+logger = get_logger(__name__)
+
+# 路径 → 需要的模型类别（精确匹配；未列出的路径不依赖模型，交给任一进程处理）
+ROUTE_CLASSES = {
+    "/api/tts": "custom",
+    "/api/tts/preview": "custom",
+    "/api/tts/design": "design",
+    "/api/tts/clone": "clone",
+    "/api/stt": "stt",
+    "/api/ocr/batch": "custom",
+}
+# 批量合成可能同时用到多个 TTS 模式，优先交给覆盖最多模式的进程
+BATCH_PATHS = ("/api/tts/batch", "/api/tts/batch/upload")
+TTS_CLASSES = ("custom", "design", "clone")
+# 转发给所有进程的路径：页面导航提示由每个进程各自预加载自己负责的模型
+BROADCAST_PATHS = ("/api/prefetch",)
+
+# 不转发的逐跳请求头 / 响应头
+HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade", "host",
+}
+
+HEALTH_TIMEOUT = 120
+RESTART_DELAY = 2.0
+
+
+def parse_workers(spec: str) -> List[List[str]]:
+    """解析 "custom,design;stt" 形式的进程划分"""
+    workers = []
+    for group in spec.split(";"):
+        classes = [c.strip() for c in group.split(",") if c.strip()]
+        if not classes:
+            continue
+        unknown = [c for c in classes if c not in MODEL_CLASSES]
+        if unknown:
+            raise ValueError(f"未知模型类别: {', '.join(unknown)}（可选: {', '.join(MODEL_CLASSES)}）")
+        workers.append(classes)
+    if not workers:
+        raise ValueError("至少需要一个工作进程")
+    missing = [c for c in MODEL_CLASSES if not any(c in w for w in workers)]
+    if missing:
+        logger.warning("[集群] 以下模型类别没有进程负责，相关请求将返回 503: %s", ", ".join(missing))
+    return workers
+
+
+class Worker:
+    """一个 uvicorn 工作进程"""
+
+    def __init__(self, index: int, classes: List[str], port: int):
+        self.index = index
+        self.classes = classes
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.process: Optional[subprocess.Popen] = None
+        self.in_flight = 0
+        self.restarts = 0
+
+    def start(self):
+        env = dict(os.environ, QWEN3_TTS_WORKER_MODELS=",".join(self.classes))
+        # 工作进程信任本机代理传来的 X-Forwarded-For，限流和管理接口据此识别真实客户端
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(self.port),
+             "--proxy-headers", "--forwarded-allow-ips", "127.0.0.1"],
+            cwd=BASE_DIR, env=env,
+        )
+        logger.info("[集群] 工作进程 #%d 已启动: pid=%d port=%d models=%s",
+                    self.index, self.process.pid, self.port, ",".join(self.classes))
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        if self.alive:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+    def status(self) -> dict:
+        return {
+            "port": self.port,
+            "models": self.classes,
+            "alive": self.alive,
+            "pid": self.process.pid if self.process else None,
+            "in_flight": self.in_flight,
+            "restarts": self.restarts,
+        }
+
+
+class ClusterProxy:
+    """按路由把请求转发给对应工作进程的 ASGI 应用"""
+
+    def __init__(self, workers: List[Worker]):
+        self.workers = workers
+        self._round_robin = itertools.cycle(workers)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._supervisor: Optional[asyncio.Task] = None
+
+    def pick_worker(self, path: str) -> Optional[Worker]:
+        """选择处理该路径的进程：同类别有多个进程时选在途请求最少的"""
+        alive = [w for w in self.workers if w.alive]
+        if not alive:
+            return None
+        model_class = ROUTE_CLASSES.get(path)
+        if model_class is not None:
+            candidates = [w for w in alive if model_class in w.classes]
+        elif path in BATCH_PATHS:
+            coverage = max(sum(c in w.classes for c in TTS_CLASSES) for w in alive)
+            candidates = [w for w in alive if sum(c in w.classes for c in TTS_CLASSES) == coverage]
+        else:
+            for _ in range(len(self.workers)):
+                worker = next(self._round_robin)
+                if worker.alive:
+                    return worker
+            return None
+        if not candidates:
+            return None
+        return min(candidates, key=lambda w: w.in_flight)
+
+    async def _supervise(self):
+        """工作进程意外退出时自动重启"""
+        while True:
+            await asyncio.sleep(RESTART_DELAY)
+            for worker in self.workers:
+                if worker.process is not None and not worker.alive:
+                    logger.error("[集群] 工作进程 #%d 已退出（code=%s），正在重启",
+                                 worker.index, worker.process.returncode)
+                    worker.restarts += 1
+                    worker.start()
+
+    async def _send_json(self, send, status: int, body: bytes):
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            # 暂不代理 WebSocket，请直接连接工作进程
+            await send({"type": "websocket.close", "code": 1003})
+            return
+
+        path = scope["path"]
+        client_host = scope["client"][0] if scope.get("client") else ""
+        if path == "/cluster/status":
+            body = json.dumps({"workers": [w.status() for w in self.workers]}, ensure_ascii=False).encode()
+            await self._send_json(send, 200, body)
+            return
+
+        if path in BROADCAST_PATHS and scope["method"] == "POST":
+            await self._broadcast(path, receive, send)
+            return
+
+        worker = self.pick_worker(path)
+        if worker is None:
+            await self._send_json(send, 503, '{"detail":"没有可处理该请求的工作进程"}'.encode())
+            return
+
+        headers = [(k, v) for k, v in scope["headers"]
+                   if k.decode("latin-1").lower() not in HOP_HEADERS and k.lower() != b"x-forwarded-for"]
+        # 覆盖而不是追加，避免客户端伪造来源 IP
+        if client_host:
+            headers.append((b"x-forwarded-for", client_host.encode("latin-1")))
+        url = path + (("?" + scope["query_string"].decode("latin-1")) if scope["query_string"] else "")
+
+        async def request_body():
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                chunk = message.get("body", b"")
+                if chunk:
+                    yield chunk
+                if not message.get("more_body", False):
+                    return
+
+        worker.in_flight += 1
+        try:
+            request = self._client.build_request(scope["method"], worker.url + url, headers=headers,
+                                                 content=request_body())
+            try:
+                response = await self._client.send(request, stream=True)
+            except httpx.TransportError as e:
+                logger.error("[集群] 转发到工作进程 #%d 失败: %s", worker.index, e)
+                await self._send_json(send, 502, '{"detail":"工作进程不可用"}'.encode())
+                return
+            try:
+                response_headers = [(k, v) for k, v in response.headers.raw
+                                    if k.decode("latin-1").lower() not in HOP_HEADERS]
+                await send({"type": "http.response.start", "status": response.status_code,
+                            "headers": response_headers})
+                async for chunk in response.aiter_raw():
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                await send({"type": "http.response.body", "body": b""})
+            finally:
+                await response.aclose()
+        finally:
+            worker.in_flight -= 1
+
+    async def _broadcast(self, path: str, receive, send):
+        """把请求转发给所有存活的进程，合并各进程安排的预加载"""
+        body = b""
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            if not message.get("more_body", False):
+                break
+
+        alive = [w for w in self.workers if w.alive]
+        responses = await asyncio.gather(
+            *(self._client.post(w.url + path, content=body, headers={"content-type": "application/json"}, timeout=10.0)
+              for w in alive),
+            return_exceptions=True)
+        merged = None
+        for worker, response in zip(alive, responses):
+            if isinstance(response, Exception) or response.status_code != 200:
+                if isinstance(response, httpx.Response) and response.status_code < 500:
+                    # 请求本身有误（如未知页面），各进程的结果相同，直接返回
+                    await self._send_json(send, response.status_code, response.content)
+                    return
+                logger.warning("[集群] 转发到工作进程 #%d 失败: %s", worker.index,
+                               response if isinstance(response, Exception) else response.status_code)
+                continue
+            result = response.json()
+            if merged is None:
+                merged = result
+            else:
+                merged["predictions"].update(result.get("predictions", {}))
+                merged["scheduled"].extend(result.get("scheduled", []))
+        if merged is None:
+            await self._send_json(send, 503, '{"detail":"没有可处理该请求的工作进程"}'.encode())
+            return
+        await self._send_json(send, 200, json.dumps(merged, ensure_ascii=False).encode())
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                # 推理可能持续数分钟，不设读超时
+                self._client = httpx.AsyncClient(timeout=httpx.Timeout(None, connect=5.0))
+                self._supervisor = asyncio.create_task(self._supervise())
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self._supervisor.cancel()
+                await self._client.aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def wait_until_healthy(workers: List[Worker], timeout: float = HEALTH_TIMEOUT) -> bool:
+    """等待所有工作进程的 /api/health 可用"""
+    deadline = time.monotonic() + timeout
+    pending = list(workers)
+    while pending and time.monotonic() < deadline:
+        for worker in list(pending):
+            if not worker.alive:
+                logger.error("[集群] 工作进程 #%d 启动失败", worker.index)
+                return False
+            try:
+                if httpx.get(worker.url + "/api/health", timeout=1.0).status_code == 200:
+                    pending.remove(worker)
+            except httpx.HTTPError:
+                pass
+        time.sleep(0.2)
+    return not pending
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Qwen3-TTS 多进程部署")
+    parser.add_argument("--host", default="0.0.0.0", help="代理监听地址")
+    parser.add_argument("--port", type=int, default=8766, help="代理监听端口")
+    parser.add_argument("--workers", default=CLUSTER_WORKERS,
+                        help="进程划分：分号分隔进程，逗号分隔模型类别（如 \"custom;design,clone;stt\"）")
+    parser.add_argument("--base-port", type=int, default=CLUSTER_BASE_PORT, help="工作进程的起始端口")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    try:
+        groups = parse_workers(args.workers)
+    except ValueError as e:
+        logger.error("[集群] %s", e)
+        return 2
+    workers = [Worker(i, classes, args.base_port + i) for i, classes in enumerate(groups)]
+    for worker in workers:
+        worker.start()
+    try:
+        if not wait_until_healthy(workers):
+            logger.error("[集群] 工作进程未能在 %d 秒内就绪", HEALTH_TIMEOUT)
+            return 1
+        logger.info("[集群] %d 个工作进程已就绪，代理监听 %s:%d", len(workers), args.host, args.port)
+
+        import uvicorn
+        # 代理自身不信任客户端传来的 X-Forwarded-For；Date / Server 头沿用工作进程的响应
+        uvicorn.run(ClusterProxy(workers), host=args.host, port=args.port, log_level="warning",
+                    proxy_headers=False, server_header=False, date_header=False)
+    finally:
+        for worker in workers:
+            worker.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,9 +8,11 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 BASE_OUTPUT_DIR = os.path.join(BASE_DIR, "outputs")
 MODELS_DIR = os.path.join(BASE_DIR, "models")
 VOICES_DIR = os.path.join(BASE_DIR, "voices")
-HISTORY_FILE = os.path.join(BASE_DIR, "history.json")
+HISTORY_FILE = os.path.join(BASE_DIR, "history.json")  # 旧版历史文件，启动时导入到 HISTORY_DB
+HISTORY_DB = os.path.join(BASE_DIR, "history.db")
 STT_OUTPUT_DIR = os.path.join(BASE_OUTPUT_DIR, "STT")
 TMP_DIR = os.path.join(BASE_DIR, "tmp")
+STATIC_DIR = os.path.join(BASE_DIR, "static")
 
 # 设置
 SAMPLE_RATE = 24000
@@ -91,3 +93,147 @@ LANGUAGE_OPTIONS = [
     {"value": "Korean", "label": "韩语"},
 ]
 
+
+# OCR 批量流水线设置
+OCR_BATCH_MAX_PAGES = 50
+OCR_BATCH_MAX_CONCURRENCY = 4
+OCR_BATCH_PAGE_GAP = 0.6  # 页与页之间插入的静音（秒）
+
+# 批量合成设置
+BATCH_MAX_ITEMS = 500
+BATCH_OUTPUT_SUBFOLDER = "Batch"
+
+# 内存回收策略（单位 MB，可通过环境变量覆盖）
+# 进程内存超过软水位时在后台执行 gc 并释放 MLX 缓存，超过硬水位时按最近最少使用顺序卸载模型
+MEMORY_SOFT_LIMIT_MB = int(os.environ.get("QWEN3_TTS_MEMORY_SOFT_LIMIT_MB", "8192"))
+MEMORY_HARD_LIMIT_MB = int(os.environ.get("QWEN3_TTS_MEMORY_HARD_LIMIT_MB", "12288"))
+MEMORY_CHECK_INTERVAL = float(os.environ.get("QWEN3_TTS_MEMORY_CHECK_INTERVAL", "10"))
+# 加载模型前以 mmap 映射 safetensors 分片并请求内核预读（weights.py）：多个工作进程共享页缓存，
+# 模型被卸载后再次加载时从内存而不是磁盘读取
+MODEL_WEIGHTS_PREFETCH = os.environ.get("QWEN3_TTS_MODEL_PREFETCH", "1").lower() not in ("0", "false", "no")
+
+# 音频后处理（postprocess.py）：保存合成结果时去除首尾静音、响度归一化并加淡入淡出，可在请求中单独设置
+POSTPROCESS_ENABLED = os.environ.get("QWEN3_TTS_POSTPROCESS", "1").lower() not in ("0", "false", "no")
+# 峰值低于该电平（dBFS）的首尾部分视为静音，去除后两端各保留 POSTPROCESS_TRIM_PAD_MS 毫秒
+POSTPROCESS_TRIM_DB = float(os.environ.get("QWEN3_TTS_POSTPROCESS_TRIM_DB", "-50"))
+POSTPROCESS_TRIM_PAD_MS = float(os.environ.get("QWEN3_TTS_POSTPROCESS_TRIM_PAD_MS", "50"))
+# 目标响度（LUFS，ITU-R BS.1770）；归一化后的峰值不超过 POSTPROCESS_PEAK_DB（dBFS）
+POSTPROCESS_LOUDNESS_LUFS = float(os.environ.get("QWEN3_TTS_POSTPROCESS_LOUDNESS_LUFS", "-16"))
+POSTPROCESS_PEAK_DB = float(os.environ.get("QWEN3_TTS_POSTPROCESS_PEAK_DB", "-1"))
+# 淡入淡出时长（毫秒）
+POSTPROCESS_FADE_MS = float(os.environ.get("QWEN3_TTS_POSTPROCESS_FADE_MS", "10"))
+
+# 预测性模型预加载（prefetch.py）：页面导航时提示服务端，按历史记录学到的使用规律在后台预先加载下一步可能用到的模型
+PREFETCH_ENABLED = os.environ.get("QWEN3_TTS_PREFETCH", "1").lower() not in ("0", "false", "no")
+# 学习使用规律时读取的最近历史记录条数，以及使用规律的重新统计间隔（秒）
+PREFETCH_HISTORY_LIMIT = int(os.environ.get("QWEN3_TTS_PREFETCH_HISTORY_LIMIT", "500"))
+PREFETCH_REFRESH_INTERVAL = float(os.environ.get("QWEN3_TTS_PREFETCH_REFRESH_INTERVAL", "300"))
+# 相邻两条历史记录间隔不超过该秒数时视为一次连续使用，计入"上一个模型 → 下一个模型"的转移次数
+PREFETCH_SESSION_GAP = float(os.environ.get("QWEN3_TTS_PREFETCH_SESSION_GAP", "1800"))
+# 页面可能用到多种模型时，只预加载预测概率不低于该值的模型
+PREFETCH_MIN_SCORE = float(os.environ.get("QWEN3_TTS_PREFETCH_MIN_SCORE", "0.3"))
+
+# 请求追踪与采样分析
+# 开启后所有 /api 请求都返回 Server-Timing 头并输出 JSON 追踪日志；未开启时可用请求头 X-Trace: 1 单独开启
+TRACING_ENABLED = os.environ.get("QWEN3_TTS_TRACING", "").lower() in ("1", "true", "yes")
+PROFILE_MAX_SECONDS = 60
+# /api/admin/* 默认只允许本机访问
+ADMIN_ALLOW_REMOTE = os.environ.get("QWEN3_TTS_ADMIN_ALLOW_REMOTE", "").lower() in ("1", "true", "yes")
+
+# 日志（QWEN3_TTS_LOG_FORMAT=json 时每行输出一条 JSON）
+LOG_LEVEL = os.environ.get("QWEN3_TTS_LOG_LEVEL", "INFO")
+LOG_FORMAT = os.environ.get("QWEN3_TTS_LOG_FORMAT", "text")
+# 是否打印 mlx_audio 推理过程的详细输出（调试用，生产环境应关闭）
+MODEL_VERBOSE = os.environ.get("QWEN3_TTS_MODEL_VERBOSE", "").lower() in ("1", "true", "yes")
+
+# 远程推理节点（node.py 启动），逗号分隔的地址，如 http://10.0.0.2:8780
+# 设置后本进程只做路由：合成、识别与对齐转发到已加载对应模型、排队最短的健康节点执行
+INFERENCE_NODES = [url.strip().rstrip("/") for url in os.environ.get("QWEN3_TTS_INFERENCE_NODES", "").split(",") if url.strip()]
+NODE_HEALTH_INTERVAL = float(os.environ.get("QWEN3_TTS_NODE_HEALTH_INTERVAL", "5"))
+# 选择节点时，未加载所需模型的节点按多排队这么多个请求计算（加载模型的代价）
+NODE_COLD_PENALTY = int(os.environ.get("QWEN3_TTS_NODE_COLD_PENALTY", "1"))
+# 前端与推理节点共用的口令：设置后节点只接受带 X-Node-Token 请求头的请求，前端发往节点的请求都会带上
+NODE_TOKEN = os.environ.get("QWEN3_TTS_NODE_TOKEN", "")
+# 单次推理请求的超时（秒）
+NODE_REQUEST_TIMEOUT = float(os.environ.get("QWEN3_TTS_NODE_REQUEST_TIMEOUT", "600"))
+
+# 准入控制（可通过环境变量覆盖）
+# max_in_flight: 同时推理的请求数；max_queue: 排队上限；preview_queue: 试听请求可用的排队上限（应小于 max_queue）
+# 本地 STT 模型不支持并发推理，max_in_flight 只能为 1；使用远程节点时默认每个节点一个名额
+ADMISSION_LIMITS = {
+    "tts": {
+        "max_in_flight": int(os.environ.get("QWEN3_TTS_TTS_MAX_IN_FLIGHT", str(max(1, len(INFERENCE_NODES))))),
+        "max_queue": int(os.environ.get("QWEN3_TTS_TTS_MAX_QUEUE", "16")),
+        "preview_queue": int(os.environ.get("QWEN3_TTS_TTS_PREVIEW_QUEUE", "4")),
+    },
+    "stt": {
+        "max_in_flight": max(1, len(INFERENCE_NODES)),
+        "max_queue": int(os.environ.get("QWEN3_TTS_STT_MAX_QUEUE", "8")),
+        # 实时识别（/ws/stt）的中间结果按试听请求排队
+        "preview_queue": int(os.environ.get("QWEN3_TTS_STT_PREVIEW_QUEUE", "2")),
+    },
+}
+# 负载自适应质量（quality.py）：请求 Pro 模型且未指定 quality=strict 时，系统繁忙则改用 Lite 模型
+QUALITY_AUTO_ENABLED = os.environ.get("QWEN3_TTS_QUALITY_AUTO", "1").lower() not in ("0", "false", "no")
+# 合成队列排队数达到该值时降级（0 表示不按排队数降级）
+QUALITY_DEGRADE_QUEUE = int(os.environ.get("QWEN3_TTS_QUALITY_DEGRADE_QUEUE", "2"))
+# 延迟目标：预计排队等待超过该秒数时降级（0 表示不按延迟降级）
+QUALITY_LATENCY_SLO = float(os.environ.get("QWEN3_TTS_QUALITY_LATENCY_SLO", "10"))
+# 内存余量（距软水位，MB）低于该值且 Pro 模型尚未加载时降级（0 表示不按内存降级）
+QUALITY_MIN_HEADROOM_MB = float(os.environ.get("QWEN3_TTS_QUALITY_MIN_HEADROOM_MB", "2048"))
+
+# 推理耗时上限（秒，从开始排队时计算，包含排队时间），超过后在当前文本段完成时中止并返回 504；0 表示不限
+SYNTHESIS_TIMEOUT = float(os.environ.get("QWEN3_TTS_SYNTHESIS_TIMEOUT", "300"))
+TRANSCRIPTION_TIMEOUT = float(os.environ.get("QWEN3_TTS_TRANSCRIPTION_TIMEOUT", "900"))
+# 超过该字数的长文本按句分段合成，段与段之间检查请求是否已取消；0 表示不分段
+SYNTHESIS_SEGMENT_CHARS = int(os.environ.get("QWEN3_TTS_SYNTHESIS_SEGMENT_CHARS", "200"))
+# 分段时不足该字数的短句并入下一句（只取决于句子本身，修改一句不会改变其他句子的分段）
+SYNTHESIS_UNIT_MIN_CHARS = int(os.environ.get("QWEN3_TTS_SYNTHESIS_UNIT_MIN_CHARS", "20"))
+# 长文本各段的音频缓存（sentence_cache.py）：修改长文本中的个别句子后重新提交时，只重新合成改动的段；
+# 超过上限（MB）时按最近最少使用删除，0 表示不缓存
+SENTENCE_CACHE_DIR = os.path.join(TMP_DIR, "sentence_cache")
+SENTENCE_CACHE_MAX_MB = int(os.environ.get("QWEN3_TTS_SENTENCE_CACHE_MB", "1024"))
+# 混合语言文本按句确定语言并分段（langseg.py），各段使用对应的 lang_code，默认关闭；
+# LANGUAGE_SWITCH_SPEAKER 开启时，预设音色不支持某段的语言才换用支持的音色，否则始终保持请求的音色；
+# 不足 LANGUAGE_RUN_MIN_WORDS 个词（英文按单词、中日韩按字计）的短句并入前一段；
+# 本地模型上各语言段依次合成，配置了远程推理节点时各段分别排队、分发到不同节点
+LANGUAGE_ROUTING_ENABLED = os.environ.get("QWEN3_TTS_LANGUAGE_ROUTING", "0").lower() not in ("0", "false", "no")
+LANGUAGE_SWITCH_SPEAKER = os.environ.get("QWEN3_TTS_LANGUAGE_SWITCH_SPEAKER", "0").lower() not in ("0", "false", "no")
+LANGUAGE_RUN_MIN_WORDS = int(os.environ.get("QWEN3_TTS_LANGUAGE_RUN_MIN_WORDS", "3"))
+# 检查客户端是否已断开的间隔（秒）
+DISCONNECT_POLL_INTERVAL = 0.5
+
+# 实时语音识别（/ws/stt）
+# 默认采样率（客户端可用 sample_rate 参数指定）；能量低于 STT_STREAM_VAD_DB（dBFS）的帧一律视为静音
+STT_STREAM_SAMPLE_RATE = 16000
+STT_STREAM_VAD_DB = float(os.environ.get("QWEN3_TTS_STT_STREAM_VAD_DB", "-45"))
+# 静音持续多少毫秒判定一句话结束
+STT_STREAM_ENDPOINT_MS = int(os.environ.get("QWEN3_TTS_STT_STREAM_ENDPOINT_MS", "600"))
+# 说话过程中每隔多少秒推送一次中间结果
+STT_STREAM_PARTIAL_INTERVAL = float(os.environ.get("QWEN3_TTS_STT_STREAM_PARTIAL_INTERVAL", "1.0"))
+# 一句话超过该时长仍未停顿时，在窗口末尾能量最低处切分
+STT_STREAM_WINDOW_SECONDS = float(os.environ.get("QWEN3_TTS_STT_STREAM_WINDOW_SECONDS", "15"))
+
+# 流式合成（/ws/tts）：在逗号等句中停顿处切分所需的最少字数；一直没有标点时超过最多字数强制切分
+TTS_STREAM_MIN_CLAUSE_CHARS = int(os.environ.get("QWEN3_TTS_TTS_STREAM_MIN_CLAUSE_CHARS", "8"))
+TTS_STREAM_MAX_CLAUSE_CHARS = int(os.environ.get("QWEN3_TTS_TTS_STREAM_MAX_CLAUSE_CHARS", "120"))
+
+# 每个 API Key / IP 的令牌桶：每秒补充的请求数与突发上限（per_second 为 0 时不限流）
+RATE_LIMIT_PER_SECOND = float(os.environ.get("QWEN3_TTS_RATE_LIMIT_PER_SECOND", "2"))
+RATE_LIMIT_BURST = float(os.environ.get("QWEN3_TTS_RATE_LIMIT_BURST", "10"))
+
+# 多进程部署（cluster.py）
+# 模型类别：custom / design / clone 为 TTS 模式，stt 包含 ASR 与 ForcedAligner
+MODEL_CLASSES = ["custom", "design", "clone", "stt"]
+# 本进程负责的模型类别（逗号分隔），未设置时加载全部；由 cluster.py 为每个工作进程设置
+WORKER_MODELS = frozenset(c.strip() for c in os.environ.get("QWEN3_TTS_WORKER_MODELS", "").split(",") if c.strip()) or None
+# cluster.py 启动的工作进程，分号分隔每个进程，逗号分隔该进程的模型类别
+CLUSTER_WORKERS = os.environ.get("QWEN3_TTS_CLUSTER_WORKERS", "custom,design,clone;stt")
+# 工作进程只监听本机，端口从该值开始依次递增
+CLUSTER_BASE_PORT = int(os.environ.get("QWEN3_TTS_CLUSTER_BASE_PORT", "8770"))
+
+# 页面缓存：每个页面只渲染一次，之后从内存返回（带 ETag 与 gzip）
+# 修改前端文件时可设为 0，每次请求重新渲染并重新计算静态资源指纹
+PAGE_CACHE_ENABLED = os.environ.get("QWEN3_TTS_PAGE_CACHE", "1").lower() not in ("0", "false", "no")
+# 带指纹（?v=内容哈希）的静态资源 URL 的缓存时长（秒）
+STATIC_MAX_AGE = 31536000
@@ -1,32 +1,162 @@
 """
 历史记录管理
+
+历史记录保存在 SQLite（WAL 模式）中，多个 worker 进程可以同时读写；
+首次启动时自动导入旧版的 history.json。
 """
 import os
 import json
-from typing import List
-from config import HISTORY_FILE, VOICES_DIR, SPEAKER_MAP
+import sqlite3
+import threading
+from typing import List, Optional
+from config import HISTORY_FILE, HISTORY_DB, VOICES_DIR, SPEAKER_MAP
+from langseg import detect_language, LANGUAGE_NAMES
+from metrics import HISTORY_WRITE_SECONDS
+from tracing import span
+from logs import get_logger
 
 # 导出 HISTORY_FILE 供其他模块使用
-__all__ = ['get_history', 'save_history_item', 'get_all_speakers', 'HISTORY_FILE']
+__all__ = ['get_history', 'get_history_json', 'get_history_item', 'save_history_item', 'save_history_items', 'delete_history_item',
+           'get_usage_records', 'get_all_speakers', 'HISTORY_FILE']
+
+logger = get_logger(__name__)
+
+# 每个线程一个连接（sqlite3 连接不能跨线程使用）
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized_db: Optional[str] = None
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    type TEXT NOT NULL DEFAULT 'tts',
+    created_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_type ON history (type, seq);
+"""
+
+
+def _connect() -> sqlite3.Connection:
+    """获取当前线程的数据库连接，首次使用时建表并导入旧数据"""
+    conn = getattr(_local, "conn", None)
+    if conn is not None and getattr(_local, "path", None) == HISTORY_DB:
+        return conn
 
+    conn = sqlite3.connect(HISTORY_DB, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    _local.conn = conn
+    _local.path = HISTORY_DB
+    _initialize(conn)
+    return conn
 
-def get_history() -> List[dict]:
-    """获取历史记录"""
+
+def _initialize(conn: sqlite3.Connection):
+    global _initialized_db
+    with _init_lock:
+        if _initialized_db == HISTORY_DB:
+            return
+        conn.executescript(_SCHEMA)
+        _migrate_json(conn)
+        _initialized_db = HISTORY_DB
+
+
+def _migrate_json(conn: sqlite3.Connection):
+    """导入旧版 history.json（只导入一次，导入后重命名为 .migrated）"""
     if not os.path.exists(HISTORY_FILE):
-        return []
+        return
     try:
         with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except:
-        return []
+            items = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("[历史记录] 无法读取旧版历史文件 %s: %s", HISTORY_FILE, e)
+        return
+    # 其他 worker 可能正在同时导入，放在一个写事务中并忽略重复 id
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if os.path.exists(HISTORY_FILE):
+            _insert(conn, list(reversed(items)), ignore_duplicates=True)
+            os.replace(HISTORY_FILE, HISTORY_FILE + ".migrated")
+            logger.info("[历史记录] 已从 %s 导入 %d 条记录", HISTORY_FILE, len(items))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _insert(conn: sqlite3.Connection, items: List[dict], ignore_duplicates: bool = False):
+    verb = "INSERT OR IGNORE" if ignore_duplicates else "INSERT OR REPLACE"
+    conn.executemany(
+        f"{verb} INTO history (id, type, created_at, data) VALUES (?, ?, ?, ?)",
+        [(item["id"], item.get("type", "tts"), item.get("created_at"), json.dumps(item, ensure_ascii=False))
+         for item in items]
+    )
+
+
+def get_history(item_type: Optional[str] = None) -> List[dict]:
+    """获取历史记录（最新的在前）
+
+    Args:
+        item_type: 只返回指定类型（如 "stt"），None 表示全部
+    """
+    return json.loads(get_history_json(item_type))
+
+
+def get_history_json(item_type: Optional[str] = None) -> str:
+    """以 JSON 数组文本返回历史记录，直接拼接库中保存的 JSON，省去解析再序列化"""
+    conn = _connect()
+    if item_type is None:
+        rows = conn.execute("SELECT data FROM history ORDER BY seq DESC").fetchall()
+    else:
+        rows = conn.execute("SELECT data FROM history WHERE type = ? ORDER BY seq DESC", (item_type,)).fetchall()
+    return "[" + ",".join(row[0] for row in rows) + "]"
+
+
+def get_history_item(history_id: str) -> Optional[dict]:
+    """按 id 获取一条历史记录"""
+    row = _connect().execute("SELECT data FROM history WHERE id = ?", (history_id,)).fetchone()
+    return json.loads(row[0]) if row else None
 
 
 def save_history_item(item: dict):
     """保存历史记录"""
-    history = get_history()
-    history.insert(0, item)
-    with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-        json.dump(history, f, ensure_ascii=False, indent=2)
+    with span("save_history"), HISTORY_WRITE_SECONDS.time(operation="save"):
+        _insert(_connect(), [item])
+
+
+def save_history_items(items: List[dict]):
+    """批量保存历史记录，在一个事务中写入（顺序等同于逐条调用 save_history_item）"""
+    if not items:
+        return
+    with span("save_history"), HISTORY_WRITE_SECONDS.time(operation="save_batch"):
+        conn = _connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            _insert(conn, items)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def delete_history_item(history_id: str) -> bool:
+    """删除历史记录，返回是否存在该记录"""
+    with HISTORY_WRITE_SECONDS.time(operation="delete"):
+        cursor = _connect().execute("DELETE FROM history WHERE id = ?", (history_id,))
+    return cursor.rowcount > 0
+
+
+def get_usage_records(limit: int) -> List[dict]:
+    """最近 limit 条历史记录的类型、音色、模型版本与时间（最早的在前），只取出统计使用规律所需的字段"""
+    rows = _connect().execute(
+        "SELECT type, created_at, json_extract(data, '$.speaker'), json_extract(data, '$.model_type') "
+        "FROM history ORDER BY seq DESC LIMIT ?", (limit,)
+    ).fetchall()
+    return [{"type": row[0], "created_at": row[1], "speaker": row[2], "model_type": row[3]}
+            for row in reversed(rows)]
 
 
 def get_all_speakers() -> List[dict]:
@@ -62,15 +192,7 @@ def get_all_speakers() -> List[dict]:
                     try:
                         with open(txt_path, 'r', encoding='utf-8') as tf:
                             content = tf.read()
-                            # 简单判断语言
-                            if any('\u4e00' <= c <= '\u9fff' for c in content):
-                                language = "Chinese"
-                            elif any('\u3040' <= c <= '\u309f' or '\u30a0' <= c <= '\u30ff' for c in content):
-                                language = "Japanese"
-                            elif any('\uac00' <= c <= '\ud7af' for c in content):
-                                language = "Korean"
-                            else:
-                                language = "English"
+                            language = LANGUAGE_NAMES[detect_language(content)]
                     except:
                         pass
                 
@@ -0,0 +1,143 @@
+"""
+混合语言文本的分段与按语言选择音色
+
+中英文混排等文本不再整段使用同一个 lang_code：按句切分文本，按每句的主要书写系统（汉字、假名、谚文、拉丁字母）
+确定该句的语言，相邻同语言的句子合并为一个语言段，各段以对应的 lang_code 分别合成后按顺序拼接。
+
+- 整段文本只用一个预编译的正则扫描一遍：同一个正则既匹配句末标点，也按书写系统匹配连续的文字，
+  边扫描边累计当前句子各书写系统的词数（英文按单词、中日韩按字计），遇到句末标点时确定该句的语言
+- 只在句末标点处切分，句子内部夹杂的外文（如「我用了 iPhone 15 Pro Max 拍照」）不会单独成段
+- 句子的语言取词数最多的书写系统；含假名的句子中汉字计入日语
+- 不足 LANGUAGE_RUN_MIN_WORDS 个词的短句（如 "OK."）并入前一段，没有文字的句子同样并入前一段
+- 默认保持请求的音色，只按段设置 lang_code；开启 switch_speaker 时，预设音色不支持某段的语言才换用支持的音色
+"""
+import re
+from typing import Dict, List, Optional
+from config import SPEAKER_MAP, LANGUAGE_ROUTING_ENABLED, LANGUAGE_RUN_MIN_WORDS, LANGUAGE_SWITCH_SPEAKER
+
+# 各书写系统的码位区间（正则字符类）
+_HAN = "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_KANA = "\u3040-\u309f\u30a0-\u30ff\u31f0-\u31ff\uff66-\uff9f"
+_HANGUL = "\u1100-\u11ff\u3130-\u318f\uac00-\ud7af"
+_LATIN = "A-Za-z\u00c0-\u024f"
+
+# 分段扫描：句末（句末标点，连续的算一处，英文句点须后跟空白或位于结尾，不切开 3.14、e.g 等；连同其后的空白）
+# 或一串同种文字（英文为以单个空格隔开的若干单词，词数为空格数加一）
+_TOKEN = re.compile(
+    r"(?P<end>(?:[。！？!?；;…\n]|\.(?=\s|$))+\s*)"
+    f"|(?P<zh>[{_HAN}]+)|(?P<ja>[{_KANA}]+)|(?P<ko>[{_HANGUL}]+)|(?P<en>[{_LATIN}]+(?: [{_LATIN}]+)*)"
+)
+# 整段检测语言：遇到汉字立即返回，连续的假名 / 谚文一次匹配
+_CJK = re.compile(f"(?P<zh>[{_HAN}])|(?P<ja>[{_KANA}]+)|(?P<ko>[{_HANGUL}]+)")
+
+# 语言代码 ↔ 语言名称（SPEAKER_MAP、音色信息中使用语言名称）
+LANGUAGE_NAMES = {"zh": "Chinese", "ja": "Japanese", "ko": "Korean", "en": "English"}
+# 预设音色 → 支持的语言名称
+_SPEAKER_LANGUAGES: Dict[str, List[str]] = {}
+for _language, _names in SPEAKER_MAP.items():
+    for _name in _names:
+        _SPEAKER_LANGUAGES.setdefault(_name, []).append(_language)
+
+
+def detect_language(text: str) -> str:
+    """整段文本的语言代码：含汉字为 zh，否则含假名为 ja，否则含谚文为 ko，其余为 en"""
+    if not text or text.isascii():
+        return "en"
+    found = set()
+    for match in _CJK.finditer(text):
+        if match.lastgroup == "zh":
+            return "zh"
+        found.add(match.lastgroup)
+    for code in ("ja", "ko"):
+        if code in found:
+            return code
+    return "en"
+
+
+def _sentence_language(counts: Dict[str, int], min_words: int) -> Optional[str]:
+    """句子的语言代码：词数最多的书写系统，含假名时汉字计入日语；没有文字或不足 min_words 个词时返回 None"""
+    if counts["ja"]:
+        counts = {**counts, "ja": counts["ja"] + counts["zh"], "zh": 0}
+    code = max(counts, key=counts.get)
+    return code if counts[code] >= max(min_words, 1) else None
+
+
+def split_language_runs(text: str, min_words: int = LANGUAGE_RUN_MIN_WORDS) -> List[dict]:
+    """把文本按句切成语言段（单次正则扫描）
+
+    Returns:
+        [{"text": 段文本, "lang_code": 语言代码}, ...]，按原文顺序；拼接各段文本即为原文
+        （没有足够长的句子时整段为一段，语言同 detect_language）
+    """
+    runs: List[list] = []
+    totals = dict.fromkeys(("zh", "ja", "ko", "en"), 0)
+    counts = dict(totals)
+    start = 0
+
+    def close_sentence(end: int):
+        """结束 start..end 这一句：并入前一段或开始新的一段（第一段之前的短句并入第一段）"""
+        nonlocal start
+        code = _sentence_language(counts, min_words)
+        if code is None or (runs and code == runs[-1][0]):
+            if runs:
+                runs[-1][2] = end
+        else:
+            runs.append([code, runs[-1][2] if runs else 0, end])
+        start = end
+
+    for match in _TOKEN.finditer(text):
+        group = match.lastgroup
+        if group == "end":
+            close_sentence(match.end())
+            for code, count in counts.items():
+                totals[code] += count
+                counts[code] = 0
+        else:
+            counts[group] += match.group().count(" ") + 1 if group == "en" else match.end() - match.start()
+    if start < len(text):
+        close_sentence(len(text))
+        for code, count in counts.items():
+            totals[code] += count
+    if not runs:
+        code = next((code for code in ("zh", "ja", "ko") if totals[code]), "en")
+        return [{"text": text, "lang_code": code}]
+    return [{"text": text[begin:end], "lang_code": code} for code, begin, end in runs]
+
+
+def compatible_speaker(speaker: str, language: str) -> str:
+    """支持 language 的预设音色：speaker 本身支持时不变，否则优先选与 speaker 有共同语言的音色"""
+    languages = _SPEAKER_LANGUAGES.get(speaker)
+    candidates = SPEAKER_MAP.get(language)
+    if languages is None or not candidates or language in languages:
+        return speaker
+    for name in candidates:
+        if set(_SPEAKER_LANGUAGES[name]) & set(languages):
+            return name
+    return candidates[0]
+
+
+def plan_language_runs(text: str, speaker: Optional[str] = None, enabled: Optional[bool] = None,
+                       switch_speaker: Optional[bool] = None) -> Optional[List[dict]]:
+    """混合语言文本按语言分段合成的计划
+
+    Args:
+        text: 要合成的文本
+        speaker: 预设音色名称（克隆音色与音色设计不指定，只按段设置 lang_code）
+        enabled: 是否按语言分段，None 时取 LANGUAGE_ROUTING_ENABLED
+        switch_speaker: 指定 speaker 时，是否为不支持该段语言的段换用支持的音色，None 时取 LANGUAGE_SWITCH_SPEAKER
+
+    Returns:
+        [{"text", "lang_code", "voice"（换用音色时）}, ...]；未开启或只有一种语言时返回 None（整段合成）
+    """
+    if not (LANGUAGE_ROUTING_ENABLED if enabled is None else enabled):
+        return None
+    runs = split_language_runs(text)
+    if len(runs) < 2:
+        return None
+    if switch_speaker is None:
+        switch_speaker = LANGUAGE_SWITCH_SPEAKER
+    for run in runs:
+        run["text"] = run["text"].strip()
+        if speaker and switch_speaker:
+            run["voice"] = compatible_speaker(speaker, LANGUAGE_NAMES[run["lang_code"]])
+    return [run for run in runs if run["text"]]
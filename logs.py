@@ -0,0 +1,150 @@
+"""
+日志配置
+
+- 各模块通过 get_logger(__name__) 获取日志器，统一挂在 qwen3_tts 下
+- 日志记录先放入内存队列，由后台线程写到控制台，请求线程不等待 I/O
+- 支持 text（默认）与 json 两种格式，每条记录都带有当前请求的 request_id
+- 消息使用 %s 占位符，级别不够时不做字符串格式化
+"""
+import sys
+import json
+import uuid
+import queue
+import atexit
+import logging
+import contextvars
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from config import LOG_LEVEL, LOG_FORMAT
+
+ROOT_LOGGER = "qwen3_tts"
+REQUEST_ID_HEADER = b"x-request-id"
+
+# 当前请求的 ID（由 RequestIdMiddleware 设置）
+_request_id: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="-")
+
+_listener: Optional[QueueListener] = None
+
+# LogRecord 自带的字段，json 格式输出时其余字段视为 extra
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+def get_logger(name: str) -> logging.Logger:
+    """获取模块日志器（qwen3_tts.<模块名>）"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def current_request_id() -> str:
+    """当前请求的 ID，不在请求中时返回 "-" """
+    return _request_id.get()
+
+
+class _RequestIdFilter(logging.Filter):
+    """在产生日志的线程中记下 request_id（写日志的后台线程拿不到请求上下文）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = _request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出一行 JSON，extra 中的字段原样并入"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """写到写出时的 sys.stdout，而不是创建时的（redirect_stdout 结束后文件已关闭）"""
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT):
+    """配置 qwen3_tts 日志器：队列 + 后台写线程（重复调用只生效一次）"""
+    global _listener
+    if _listener is not None:
+        return
+
+    console = _StdoutHandler()
+    if fmt == "json":
+        console.setFormatter(JsonFormatter())
+    else:
+        console.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(message)s",
+                                               datefmt="%H:%M:%S"))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(_RequestIdFilter())
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(level.upper())
+    root.addHandler(queue_handler)
+    root.propagate = False
+
+    _listener = QueueListener(log_queue, console, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """停止后台写线程，写出队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestIdMiddleware:
+    """ASGI 中间件：为每个请求分配 request_id（沿用请求头 X-Request-ID），并写回响应头"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = ""
+        for key, value in scope.get("headers", []):
+            if key == REQUEST_ID_HEADER:
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex[:12]
+        token = _request_id.set(request_id)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER, request_id.encode("latin-1")))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _request_id.reset(token)
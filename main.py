@@ -1,12 +1,16 @@
 import os
 import sys
+import json
 import shutil
+import hashlib
 import time
 import wave
 import gc
 import re
+import argparse
 import subprocess
 import warnings
+import importlib.util
 from datetime import datetime
 
 # Suppress harmless library warnings
@@ -14,10 +18,9 @@ os.environ["TOKENIZERS_PARALLELISM"] = "false"
 warnings.filterwarnings("ignore", category=UserWarning)
 warnings.filterwarnings("ignore", category=FutureWarning)
 
-try:
-    from mlx_audio.tts.utils import load_model
-    from mlx_audio.tts.generate import generate_audio
-except ImportError:
+# mlx_audio pulls in transformers, librosa and numba; only check that it is
+# installed here and import it on first use so the menu shows up immediately
+if importlib.util.find_spec("mlx_audio") is None:
     print("Error: 'mlx_audio' library not found.")
     print("Run: source .venv/bin/activate")
     sys.exit(1)
@@ -51,6 +54,16 @@ SPEAKER_MAP = {
     "Korean": ["Sohee"]
 }
 
+# (mode, use_lite) -> MODELS key, used by batch mode
+BATCH_MODEL_KEYS = {
+    ("custom", False): "1",
+    ("design", False): "2",
+    ("clone", False): "3",
+    ("custom", True): "4",
+    ("design", True): "5",
+    ("clone", True): "6",
+}
+
 EMOTION_EXAMPLES = [
     "Sad and crying, speaking slowly",
     "Excited and happy, speaking very fast",
@@ -71,6 +84,59 @@ def clean_memory():
     gc.collect()
 
 
+# Loaded models, keyed by model folder (interactive sessions keep one at a time, see get_session_model)
+_loaded_models = {}
+_player = None
+
+
+def get_model(model_key):
+    info = MODELS[model_key]
+    if info["folder"] in _loaded_models:
+        return _loaded_models[info["folder"]]
+
+    model_path = get_smart_path(info["folder"])
+    if not model_path:
+        raise FileNotFoundError(f"Model not found: {info['folder']}")
+
+    print(f"\nLoading {info['name']}...", file=sys.stderr)
+    from mlx_audio.tts.utils import load_model
+    _loaded_models[info["folder"]] = load_model(model_path)
+    return _loaded_models[info["folder"]]
+
+
+def generate_audio(**kwargs):
+    from mlx_audio.tts.generate import generate_audio as _generate_audio
+    return _generate_audio(**kwargs)
+
+
+def unload_models():
+    _loaded_models.clear()
+    clean_memory()
+
+
+def get_session_model(model_key):
+    """Interactive sessions keep only one model resident: switching to another model unloads the previous ones"""
+    folder = MODELS[model_key]["folder"]
+    if any(f != folder for f in _loaded_models):
+        unload_models()
+    return get_model(model_key)
+
+
+def play_audio(path, interrupt=True):
+    """Play in the background. interrupt=True stops the current clip,
+    otherwise wait for it so queued clips play in order."""
+    global _player
+    if _player is not None and _player.poll() is None:
+        if interrupt:
+            _player.terminate()
+        else:
+            _player.wait()
+    try:
+        _player = subprocess.Popen(["afplay", path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except FileNotFoundError:
+        _player = None
+
+
 def make_temp_dir():
     return f"temp_{int(time.time())}"
 
@@ -106,11 +172,7 @@ def save_audio_file(temp_folder, subfolder, text_snippet):
 
         if AUTO_PLAY:
             print("Playing...")
-            try:
-                subprocess.run(["afplay", final_path], check=False, 
-                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            except FileNotFoundError:
-                pass
+            play_audio(final_path)
 
     if os.path.exists(temp_folder):
         shutil.rmtree(temp_folder, ignore_errors=True)
@@ -224,14 +286,12 @@ def enroll_new_voice():
 
 def run_custom_session(model_key):
     info = MODELS[model_key]
-    model_path = get_smart_path(info["folder"])
-    if not model_path:
+    if not get_smart_path(info["folder"]):
         print("Error: Model not found.")
         return
 
-    print(f"\nLoading {info['name']}...")
     try:
-        model = load_model(model_path)
+        model = get_session_model(model_key)
     except Exception as e:
         print(f"Load failed: {e}")
         return
@@ -281,14 +341,12 @@ def run_custom_session(model_key):
 
 def run_design_session(model_key):
     info = MODELS[model_key]
-    model_path = get_smart_path(info["folder"])
-    if not model_path:
+    if not get_smart_path(info["folder"]):
         print("Error: Model not found.")
         return
 
-    print(f"\nLoading {info['name']}...")
     try:
-        model = load_model(model_path)
+        model = get_session_model(model_key)
     except Exception as e:
         print(f"Load failed: {e}")
         return
@@ -327,14 +385,12 @@ def run_clone_manager(model_key):
         return
 
     info = MODELS[model_key]
-    model_path = get_smart_path(info["folder"])
-    if not model_path:
+    if not get_smart_path(info["folder"]):
         print("Error: Model not found.")
         return
 
-    print("\nLoading Base Model...")
     try:
-        model = load_model(model_path)
+        model = get_session_model(model_key)
     except Exception as e:
         print(f"Load failed: {e}")
         return
@@ -391,6 +447,312 @@ def run_clone_manager(model_key):
     clean_memory()
 
 
+def run_batch_file(batch_path, use_lite=False, output_dir=None):
+    from batch import parse_batch_file, normalize_batch_items, render_batch, write_manifest
+
+    try:
+        with open(batch_path, 'r', encoding='utf-8-sig') as f:
+            items = normalize_batch_items(parse_batch_file(f.read(), batch_path), use_lite)
+    except (IOError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    if not items:
+        print("No items found.")
+        return 1
+
+    if not output_dir:
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_dir = os.path.join(BASE_OUTPUT_DIR, "Batch", stamp)
+
+    # Items are rendered grouped by model, so only one model is kept in memory
+    current = {}
+    temp_dir = make_temp_dir()
+
+    def render_item(item, wav_path):
+        model_key = BATCH_MODEL_KEYS[(item["mode"], item["use_lite"])]
+        if current.get("key") != model_key:
+            unload_models()
+            current["key"] = model_key
+        model = get_model(model_key)
+
+        if item["mode"] == "design":
+            kwargs = {"instruct": item["description"]}
+        elif item["mode"] == "clone":
+            ref_audio = os.path.join(VOICES_DIR, f"{item['voice_name']}.wav")
+            if not os.path.exists(ref_audio):
+                raise RuntimeError(f"Voice not found: {item['voice_name']}")
+            ref_text = "."
+            txt_path = os.path.join(VOICES_DIR, f"{item['voice_name']}.txt")
+            if os.path.exists(txt_path):
+                with open(txt_path, 'r', encoding='utf-8') as f:
+                    ref_text = f.read().strip()
+            kwargs = {"ref_audio": ref_audio, "ref_text": ref_text}
+        else:
+            kwargs = {"voice": item["speaker"], "instruct": item["emotion"], "speed": item["speed"]}
+
+        generate_audio(model=model, text=item["text"], output_path=temp_dir, **kwargs)
+        source_file = os.path.join(temp_dir, "audio_000.wav")
+        if not os.path.exists(source_file):
+            raise RuntimeError("No audio generated")
+        shutil.move(source_file, wav_path)
+
+    def on_progress(result):
+        status = result["file"] if result["success"] else f"FAILED: {result['error']}"
+        print(f"  [{result['index'] + 1}/{len(items)}] {status}")
+
+    try:
+        results = render_batch(items, output_dir, render_item, on_progress)
+    finally:
+        if os.path.exists(temp_dir):
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    manifest_path = write_manifest(output_dir, results, {"source": os.path.basename(batch_path)})
+    failed = sum(1 for r in results if not r["success"])
+    print(f"\nDone: {len(results) - failed}/{len(results)} rendered")
+    print(f"Manifest: {manifest_path}")
+    return 1 if failed else 0
+
+
+def read_cli_texts(args):
+    """Collect input texts from positional args, --file and stdin ('-' or piped)."""
+    texts = list(args.text or [])
+    stdin_text = None
+    if not texts and not args.file and not sys.stdin.isatty():
+        texts = ["-"]
+    resolved = []
+    for text in texts:
+        if text == "-":
+            if stdin_text is None:
+                stdin_text = sys.stdin.read()
+            resolved.append(stdin_text)
+        else:
+            resolved.append(text)
+    for path in args.file or []:
+        with open(path, 'r', encoding='utf-8') as f:
+            resolved.append(f.read())
+
+    if args.lines:
+        resolved = [line for text in resolved for line in text.splitlines()]
+    return [t.strip() for t in resolved if t.strip()]
+
+
+def cli_output_path(args, subfolder, text, params):
+    """Deterministic output path: the same text and settings always map to the same file."""
+    if args.output:
+        return args.output
+    digest = hashlib.sha1(json.dumps([text, params], sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()[:10]
+    clean_text = re.sub(r'[^\w\s-]', '', text)[:FILENAME_MAX_LEN].strip().replace(' ', '_') or "audio"
+    return os.path.join(args.output_dir or os.path.join(BASE_OUTPUT_DIR, subfolder), f"{clean_text}_{digest}.wav")
+
+
+def file_digest(path):
+    """SHA-1 of a file's content."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cli_render(args, model_key, texts, params, name_params=None):
+    """Render every text with one loaded model; prints each output path to stdout.
+
+    name_params replaces params in the output file name when params hold per-run values
+    (e.g. the temporary path of a converted reference audio).
+    """
+    if args.output and len(texts) > 1:
+        print("Error: --output can only be used with a single input; use --output-dir.", file=sys.stderr)
+        return 2
+
+    info = MODELS[model_key]
+    failed = 0
+    temp_dir = make_temp_dir()
+    try:
+        for text in texts:
+            target = cli_output_path(args, info["output_subfolder"], text,
+                                     dict(name_params or params, model=info["folder"]))
+            if args.skip_existing and os.path.exists(target):
+                print(target)
+                continue
+            try:
+                model = get_model(model_key)
+            except Exception as e:
+                print(f"Load failed: {e}", file=sys.stderr)
+                return 1
+            try:
+                generate_audio(model=model, text=text, output_path=temp_dir, **params)
+            except Exception as e:
+                print(f"Error: {e}", file=sys.stderr)
+                failed += 1
+                continue
+            source_file = os.path.join(temp_dir, "audio_000.wav")
+            if not os.path.exists(source_file):
+                print("Error: No audio generated", file=sys.stderr)
+                failed += 1
+                continue
+            os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+            shutil.move(source_file, target)
+            print(target, flush=True)
+            if args.play:
+                play_audio(target, interrupt=False)
+    finally:
+        if os.path.exists(temp_dir):
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    return 1 if failed else 0
+
+
+def cli_tts(args):
+    texts = read_cli_texts(args)
+    if not texts:
+        print("Error: No input text.", file=sys.stderr)
+        return 2
+    params = {"voice": args.speaker, "instruct": args.emotion, "speed": args.speed}
+    return cli_render(args, "4" if args.lite else "1", texts, params)
+
+
+def cli_design(args):
+    texts = read_cli_texts(args)
+    if not texts:
+        print("Error: No input text.", file=sys.stderr)
+        return 2
+    return cli_render(args, "5" if args.lite else "2", texts, {"instruct": args.description})
+
+
+def cli_clone(args):
+    texts = read_cli_texts(args)
+    if not texts:
+        print("Error: No input text.", file=sys.stderr)
+        return 2
+
+    if args.voice:
+        ref_audio = os.path.join(VOICES_DIR, f"{args.voice}.wav")
+        if not os.path.exists(ref_audio):
+            print(f"Error: Voice not found: {args.voice}", file=sys.stderr)
+            return 1
+        ref_text = args.ref_text
+        txt_path = os.path.join(VOICES_DIR, f"{args.voice}.txt")
+        if ref_text is None and os.path.exists(txt_path):
+            with open(txt_path, 'r', encoding='utf-8') as f:
+                ref_text = f.read().strip()
+    else:
+        ref_audio = convert_audio_if_needed(clean_path(args.ref_audio))
+        if not ref_audio:
+            return 1
+        ref_text = args.ref_text
+
+    params = {"ref_audio": ref_audio, "ref_text": ref_text or "."}
+    # Non-WAV references are converted to a new temp file on every run; name outputs by the reference content
+    name_params = dict(params, ref_audio=file_digest(ref_audio if args.voice else clean_path(args.ref_audio)))
+    try:
+        return cli_render(args, "6" if args.lite else "3", texts, params, name_params)
+    finally:
+        if not args.voice and ref_audio != clean_path(args.ref_audio) and os.path.exists(ref_audio):
+            os.remove(ref_audio)
+
+
+def cli_stt(args):
+    from config import ASR_MODELS
+    from mlx_audio.stt.utils import load_model as load_stt_model
+    from mlx_audio.stt.generate import generate_transcription
+
+    model_key = args.model or next((k for k, v in ASR_MODELS.items() if v.get("default")), None)
+    if model_key not in ASR_MODELS:
+        print(f"Error: Unknown ASR model: {args.model}", file=sys.stderr)
+        return 2
+
+    folder = ASR_MODELS[model_key]["folder"]
+    if folder not in _loaded_models:
+        model_path = get_smart_path(folder)
+        if not model_path:
+            print(f"Error: Model not found: {folder}", file=sys.stderr)
+            return 1
+        print(f"\nLoading {folder}...", file=sys.stderr)
+        _loaded_models[folder] = load_stt_model(model_path)
+    model = _loaded_models[folder]
+
+    failed = 0
+    for audio in args.audio:
+        wav_path = convert_audio_if_needed(clean_path(audio))
+        if not wav_path:
+            failed += 1
+            continue
+        temp_dir = make_temp_dir()
+        os.makedirs(temp_dir, exist_ok=True)
+        try:
+            result = generate_transcription(model=model, audio=wav_path, output_path=os.path.join(temp_dir, "transcript"),
+                                            format="txt", verbose=False, language=args.language)
+            text = (getattr(result, "text", None) or str(result)).strip()
+        except Exception as e:
+            print(f"Error: {audio}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            if wav_path != clean_path(audio) and os.path.exists(wav_path):
+                os.remove(wav_path)
+
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+            txt_path = os.path.join(args.output_dir, os.path.splitext(os.path.basename(audio))[0] + ".txt")
+            with open(txt_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            print(txt_path, flush=True)
+        else:
+            print(text, flush=True)
+    return 1 if failed else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Qwen3-TTS Manager (no arguments: interactive menu)")
+    parser.add_argument("--batch", metavar="FILE", help="Render every line of a JSONL/CSV script non-interactively")
+    # Separate dests: subcommands define their own --lite / --output-dir, whose defaults would otherwise override these
+    parser.add_argument("--lite", dest="batch_lite", action="store_true",
+                        help="Use Lite (0.6B) models for batch items without use_lite")
+    parser.add_argument("--output-dir", dest="batch_output_dir",
+                        help="Batch output directory (default: outputs/Batch/<timestamp>)")
+    sub = parser.add_subparsers(dest="command")
+
+    def add_render_options(p):
+        p.add_argument("text", nargs="*", help="Text to render ('-' reads stdin; piped stdin is read when omitted)")
+        p.add_argument("-f", "--file", action="append", help="Read text from a .txt file (repeatable)")
+        p.add_argument("--lines", action="store_true", help="Render each input line as a separate file")
+        p.add_argument("--lite", action="store_true", help="Use the Lite (0.6B) model")
+        p.add_argument("-o", "--output", help="Output WAV path (single input only)")
+        p.add_argument("--output-dir", help="Output directory (default: outputs/<model subfolder>)")
+        p.add_argument("--skip-existing", action="store_true", help="Skip inputs whose output file already exists")
+        p.add_argument("--play", action="store_true", help="Play results in the background")
+
+    p = sub.add_parser("tts", help="Render with a preset speaker")
+    add_render_options(p)
+    p.add_argument("--speaker", default="Vivian")
+    p.add_argument("--emotion", default="Normal tone")
+    p.add_argument("--speed", type=float, default=1.0)
+    p.set_defaults(func=cli_tts)
+
+    p = sub.add_parser("design", help="Render with a described voice")
+    add_render_options(p)
+    p.add_argument("--description", required=True, help="Voice description, e.g. 'calm British narrator'")
+    p.set_defaults(func=cli_design)
+
+    p = sub.add_parser("clone", help="Render with a cloned voice")
+    add_render_options(p)
+    ref = p.add_mutually_exclusive_group(required=True)
+    ref.add_argument("--voice", help="Saved voice name in voices/")
+    ref.add_argument("--ref-audio", help="Reference audio file (quick clone)")
+    p.add_argument("--ref-text", help="Transcript of the reference audio")
+    p.set_defaults(func=cli_clone)
+
+    p = sub.add_parser("stt", help="Transcribe audio files")
+    p.add_argument("audio", nargs="+", help="Audio or video files")
+    p.add_argument("--model", help="ASR model key from config.ASR_MODELS")
+    p.add_argument("--language", default="Chinese")
+    p.add_argument("--output-dir", help="Write <name>.txt files here instead of printing text")
+    p.set_defaults(func=cli_stt)
+
+    return parser
+
+
 def main_menu():
     print("\n" + "=" * 40)
     print(" Qwen3-TTS Manager")
@@ -431,8 +793,17 @@ def main_menu():
 
 
 if __name__ == "__main__":
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.command and (args.batch_lite or args.batch_output_dir):
+        parser.error("--lite/--output-dir before a subcommand only apply to --batch; put them after the subcommand")
+
     try:
         os.makedirs(BASE_OUTPUT_DIR, exist_ok=True)
+        if args.command:
+            sys.exit(args.func(args))
+        if args.batch:
+            sys.exit(run_batch_file(args.batch, args.batch_lite, args.batch_output_dir))
         while True:
             main_menu()
     except KeyboardInterrupt:
@@ -0,0 +1,185 @@
+"""
+内存回收策略
+
+请求结束时不再同步执行 gc.collect()，而是通知后台线程检查内存水位：
+- 低于软水位：什么都不做
+- 超过软水位：执行 gc 并释放 MLX 的缓存显存
+- 超过硬水位：按最近最少使用顺序卸载模型，直到回到硬水位以下
+"""
+import gc
+import os
+import sys
+import time
+import threading
+import subprocess
+from typing import Optional
+from config import MEMORY_SOFT_LIMIT_MB, MEMORY_HARD_LIMIT_MB, MEMORY_CHECK_INTERVAL
+from metrics import GC_RUNS, GC_SECONDS, MODELS_EVICTED, PROCESS_RSS_MB
+from logs import get_logger
+
+_MB = 1024 * 1024
+logger = get_logger(__name__)
+
+
+def get_rss_mb() -> float:
+    """获取当前进程的常驻内存（MB）"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / _MB
+    except ImportError:
+        pass
+
+    # Linux
+    if os.path.exists("/proc/self/statm"):
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / _MB
+
+    # macOS 没有 /proc，退回到 ps（只在后台线程中调用）
+    try:
+        output = subprocess.run(["ps", "-o", "rss=", "-p", str(os.getpid())],
+                                capture_output=True, text=True, check=True).stdout
+        return int(output.strip()) / 1024
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError):
+        return 0.0
+
+
+def _mlx_core():
+    """已导入 mlx 时返回 mlx.core，否则返回 None（不为了查询内存而触发导入）"""
+    return sys.modules.get("mlx.core")
+
+
+def get_accelerator_memory_mb() -> Optional[float]:
+    """获取 MLX 当前占用的显存（MB），不可用时返回 None"""
+    mx = _mlx_core()
+    if mx is None:
+        return None
+    getter = getattr(mx, "get_active_memory", None) or getattr(getattr(mx, "metal", None), "get_active_memory", None)
+    if getter is None:
+        return None
+    try:
+        return getter() / _MB
+    except Exception:
+        return None
+
+
+def clear_accelerator_cache():
+    """释放 MLX 缓存的显存"""
+    mx = _mlx_core()
+    if mx is None:
+        return
+    clear = getattr(mx, "clear_cache", None) or getattr(getattr(mx, "metal", None), "clear_cache", None)
+    if clear is not None:
+        clear()
+
+
+class MemoryGovernor:
+    """后台内存回收线程"""
+
+    def __init__(self, soft_limit_mb: float, hard_limit_mb: float, interval: float):
+        self.soft_limit_mb = soft_limit_mb
+        self.hard_limit_mb = hard_limit_mb
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "checks": 0,
+            "gc_runs": 0,
+            "gc_seconds_total": 0.0,
+            "gc_last_seconds": 0.0,
+            "gc_last_at": None,
+            "models_evicted": 0,
+            "rss_mb": 0.0,
+            "accelerator_mb": None,
+        }
+
+    def start(self):
+        """启动后台线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-governor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台线程"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def request_check(self):
+        """请求尽快检查一次内存水位（立即返回，不阻塞请求）"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.check()
+            except Exception as e:
+                logger.exception("[内存回收] 检查失败: %s", e)
+
+    def _measure(self) -> float:
+        rss = get_rss_mb()
+        accelerator = get_accelerator_memory_mb()
+        with self._lock:
+            self._stats["checks"] += 1
+            self._stats["rss_mb"] = round(rss, 1)
+            self._stats["accelerator_mb"] = round(accelerator, 1) if accelerator is not None else None
+        # Apple Silicon 为统一内存，两者取较大值作为内存压力
+        return max(rss, accelerator or 0.0)
+
+    def _collect(self):
+        start = time.perf_counter()
+        gc.collect()
+        clear_accelerator_cache()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._stats["gc_runs"] += 1
+            self._stats["gc_seconds_total"] += elapsed
+            self._stats["gc_last_seconds"] = round(elapsed, 4)
+            self._stats["gc_last_at"] = time.time()
+
+    def check(self):
+        """检查内存水位，必要时回收"""
+        used = self._measure()
+        if used < self.soft_limit_mb:
+            return
+
+        self._collect()
+        used = self._measure()
+        if used < self.hard_limit_mb:
+            return
+
+        from models import evict_least_recent_model
+        while used >= self.hard_limit_mb:
+            if evict_least_recent_model() is None:
+                break
+            with self._lock:
+                self._stats["models_evicted"] += 1
+            self._collect()
+            used = self._measure()
+
+    def status(self) -> dict:
+        """回收统计"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["gc_seconds_total"] = round(stats["gc_seconds_total"], 4)
+        stats["soft_limit_mb"] = self.soft_limit_mb
+        stats["hard_limit_mb"] = self.hard_limit_mb
+        stats["interval_seconds"] = self.interval
+        return stats
+
+
+governor = MemoryGovernor(MEMORY_SOFT_LIMIT_MB, MEMORY_HARD_LIMIT_MB, MEMORY_CHECK_INTERVAL)
+
+GC_RUNS.set_callback(lambda: [({}, governor.status()["gc_runs"])])
+GC_SECONDS.set_callback(lambda: [({}, governor.status()["gc_seconds_total"])])
+MODELS_EVICTED.set_callback(lambda: [({}, governor.status()["models_evicted"])])
+PROCESS_RSS_MB.set_callback(lambda: [({}, governor.status()["rss_mb"])])
@@ -0,0 +1,277 @@
+"""
+Prometheus 格式的指标采集
+
+不依赖 prometheus_client，只实现本项目需要的 Counter / Gauge / Histogram，
+通过 GET /metrics 以文本格式导出。
+"""
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# 秒级耗时的默认分桶
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+# 实时率（音频秒数 / 墙钟秒数）的分桶
+RTF_BUCKETS = (0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 4.0, 8.0, 16.0)
+
+_registry: List["_Metric"] = []
+
+# 当前请求的上下文（由 MetricsMiddleware 设置）
+_request_context: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("metrics_request", default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def collect(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self.collect())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """数值型指标；设置了 callback 时在导出时调用 callback 取值"""
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 callback: Optional[Callable[[], Iterable[Tuple[dict, float]]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callback = callback
+
+    def set_callback(self, callback: Callable[[], Iterable[Tuple[dict, float]]]):
+        self._callback = callback
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def collect(self) -> List[str]:
+        if self._callback is not None:
+            items = [(self._key(labels), value) for labels, value in self._callback()]
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class CounterFunc(Gauge):
+    """由 callback 提供累计值的计数器（如内存回收线程的统计）"""
+    type_name = "counter"
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # key -> [各分桶计数..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """统计 with 块的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {int(state[-1])}")
+        return lines
+
+
+def render_latest() -> str:
+    """导出全部指标（Prometheus 文本格式）"""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+# ---- 指标定义 ----
+
+MODEL_LOAD_SECONDS = Histogram(
+    "qwen3_tts_model_load_seconds", "模型加载耗时", ["model", "variant"])
+QUEUE_WAIT_SECONDS = Histogram(
+    "qwen3_tts_queue_wait_seconds", "请求到达至开始推理的等待时间", ["endpoint", "model", "variant"])
+SYNTHESIS_SECONDS = Histogram(
+    "qwen3_tts_synthesis_seconds", "语音合成（generate_audio）耗时", ["endpoint", "model", "variant"])
+TRANSCRIPTION_SECONDS = Histogram(
+    "qwen3_tts_transcription_seconds", "语音识别（generate_transcription）耗时", ["endpoint", "model", "variant"])
+REAL_TIME_FACTOR = Histogram(
+    "qwen3_tts_real_time_factor", "实时率：音频秒数 / 墙钟秒数", ["endpoint", "model", "variant"], RTF_BUCKETS)
+FFMPEG_SECONDS = Histogram(
+    "qwen3_tts_ffmpeg_seconds", "ffmpeg 转换耗时", ["operation"])
+ALIGNMENT_SECONDS = Histogram(
+    "qwen3_tts_alignment_seconds", "强制对齐耗时", ["model"])
+POSTPROCESS_SECONDS = Histogram(
+    "qwen3_tts_postprocess_seconds", "音频后处理（去静音、响度归一化、淡入淡出）耗时")
+HISTORY_WRITE_SECONDS = Histogram(
+    "qwen3_tts_history_write_seconds", "历史记录写入耗时", ["operation"])
+IN_FLIGHT_REQUESTS = Gauge(
+    "qwen3_tts_in_flight_requests", "正在处理的请求数", ["endpoint"])
+LOADED_MODELS = Gauge(
+    "qwen3_tts_loaded_models", "已加载的模型（1 为已加载）", ["kind", "model", "variant"])
+GC_RUNS = CounterFunc(
+    "qwen3_tts_gc_runs_total", "内存回收线程执行 gc 的次数")
+GC_SECONDS = CounterFunc(
+    "qwen3_tts_gc_seconds_total", "内存回收线程执行 gc 的累计耗时")
+MODELS_EVICTED = CounterFunc(
+    "qwen3_tts_models_evicted_total", "因内存压力被卸载的模型数")
+COALESCED_REQUESTS = Counter(
+    "qwen3_tts_coalesced_requests_total", "合并到进行中的相同计算的请求数（即节省的推理次数）", ["name"])
+QUALITY_DECISIONS = Counter(
+    "qwen3_tts_quality_decisions_total", "负载自适应质量选择的结果（reason 为 idle / queue / latency / memory 等）",
+    ["model", "variant", "reason"])
+CANCELLED_REQUESTS = Counter(
+    "qwen3_tts_cancelled_requests_total", "因客户端断开或超过耗时上限而中止的推理数", ["reason"])
+MODEL_PREFETCHES = Counter(
+    "qwen3_tts_model_prefetches_total", "页面导航提示触发的模型预加载（result 为 loaded / loaded_already / memory / failed 等）",
+    ["model", "result"])
+SENTENCE_UNITS = Counter(
+    "qwen3_tts_sentence_units_total", "长文本分段合成的段数（result 为 reused：命中缓存 / rendered：重新合成）", ["result"])
+LANGUAGE_RUNS = Counter(
+    "qwen3_tts_language_runs_total", "混合语言文本按语言分段合成的段数", ["language"])
+PROCESS_RSS_MB = Gauge(
+    "qwen3_tts_process_rss_megabytes", "最近一次测得的进程常驻内存")
+
+
+# ---- 请求上下文 ----
+
+def current_endpoint() -> str:
+    """当前请求的路由模板（如 /api/tts），不在请求中时返回空字符串"""
+    context = _request_context.get()
+    return context["endpoint"] if context else ""
+
+
+def observe_queue_wait(model: str, variant: str):
+    """记录从请求到达到开始推理的等待时间"""
+    context = _request_context.get()
+    if context is None:
+        return
+    QUEUE_WAIT_SECONDS.observe(time.perf_counter() - context["start"],
+                               endpoint=context["endpoint"], model=model, variant=variant)
+
+
+def reset_request_start():
+    """长连接（WebSocket）中每个推理任务排队前调用，排队耗时从该任务开始计算"""
+    context = _request_context.get()
+    if context is not None:
+        context["start"] = time.perf_counter()
+
+
+def _route_template(scope) -> str:
+    """找到请求对应的路由模板，避免把路径参数（如音频路径）写进标签"""
+    app = scope.get("app")
+    for route in getattr(app, "routes", []):
+        matches = getattr(route, "matches", None)
+        if matches is None:
+            continue
+        match, _ = matches(scope)
+        if match.name != "NONE":
+            return getattr(route, "path", scope["path"])
+    return "other"
+
+
+class MetricsMiddleware:
+    """ASGI 中间件：统计进行中的请求数，并记录请求开始时间供排队耗时使用"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket") or not scope["path"].startswith(("/api", "/ws")):
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = _route_template(scope)
+        token = _request_context.set({"endpoint": endpoint, "start": time.perf_counter()})
+        IN_FLIGHT_REQUESTS.inc(endpoint=endpoint)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            IN_FLIGHT_REQUESTS.dec(endpoint=endpoint)
+            _request_context.reset(token)
@@ -1,12 +1,19 @@
 """
 模型加载和缓存管理
+
+mlx_audio 在首次加载模型时才导入，服务启动不等待 transformers 等依赖的导入。
 """
+import time
 import threading
+from typing import Optional
 from fastapi import HTTPException
-from mlx_audio.tts.utils import load_model
-from mlx_audio.stt.utils import load_model as load_stt_model
-from config import MODELS, ASR_MODELS, FORCED_ALIGNER_MODELS
+from config import MODELS, ASR_MODELS, FORCED_ALIGNER_MODELS, WORKER_MODELS, MODEL_WEIGHTS_PREFETCH
 from utils import get_smart_path
+import weights
+from metrics import MODEL_LOAD_SECONDS, LOADED_MODELS
+from logs import get_logger
+
+logger = get_logger(__name__)
 
 # 缓存的模型
 _cached_models = {}
@@ -15,21 +22,81 @@ _cached_forced_aligner_models = {}
 _model_loading_lock = {}
 _asr_model_loading_lock = {}
 _forced_aligner_model_loading_lock = {}
+# 最近一次使用时间，供内存回收策略按 LRU 卸载模型
+_model_last_used = {}
+_caches = {"tts": _cached_models, "asr": _cached_asr_models, "aligner": _cached_forced_aligner_models}
+# 内存回收线程会卸载模型，与请求线程读写上面几个字典时都持有该锁
+_cache_lock = threading.Lock()
+
+
+def _get_cached(kind: str, key: str):
+    """取缓存的模型并记录使用时间，未缓存时返回 None"""
+    with _cache_lock:
+        model = _caches[kind].get(key)
+        if model is not None:
+            _model_last_used[(kind, key)] = time.monotonic()
+        return model
+
+
+def _store(kind: str, key: str, model):
+    """缓存加载完成的模型"""
+    with _cache_lock:
+        _caches[kind][key] = model
+        _model_last_used[(kind, key)] = time.monotonic()
+
+
+def _check_assigned(model_class: str):
+    """多进程部署时，拒绝加载不属于本进程的模型类别"""
+    if WORKER_MODELS is not None and model_class not in WORKER_MODELS:
+        raise HTTPException(status_code=503, detail=f"当前工作进程未加载 {model_class} 模型")
+
+
+def _prefetch_weights(model_path: str):
+    """加载前映射权重分片并请求内核预读：多进程共享页缓存，卸载后重新加载时不再读盘"""
+    if MODEL_WEIGHTS_PREFETCH:
+        weights.prefetch(model_path)
+
+
+def load_tts_model(model_path: str):
+    """服务加载 TTS 模型的实际路径：预读权重分片后由 mlx_audio 加载（权重复制到 MLX 缓冲区）；不缓存
+
+    load_model_cached 与 benchmarks/bench_weights.py 共用，基准测试测量的就是服务的加载方式
+    """
+    _prefetch_weights(model_path)
+    from mlx_audio.tts.utils import load_model
+    return load_model(model_path)
+
+
+def default_model_key(models: dict) -> str:
+    """返回模型表中标记为 default 的模型，没有标记时返回第一个"""
+    for key, config in models.items():
+        if config.get("default", False):
+            return key
+    return next(iter(models))
+
+
+def loaded_model_keys() -> list:
+    """已加载的模型标识（TTS 为 mode_variant，ASR / ForcedAligner 为模型表中的键）"""
+    with _cache_lock:
+        return list(_cached_models) + list(_cached_asr_models) + list(_cached_forced_aligner_models)
 
 
 def load_model_cached(mode: str, use_lite: bool = False):
     """加载并缓存 TTS 模型"""
+    _check_assigned(mode)
     key = f"{mode}_{'lite' if use_lite else 'pro'}"
     
-    if key in _cached_models:
-        return _cached_models[key]
+    model = _get_cached("tts", key)
+    if model is not None:
+        return model
     
     if key not in _model_loading_lock:
         _model_loading_lock[key] = threading.Lock()
     
     with _model_loading_lock[key]:
-        if key in _cached_models:
-            return _cached_models[key]
+        model = _get_cached("tts", key)
+        if model is not None:
+            return model
         
         model_type = "lite" if use_lite else "pro"
         if mode not in MODELS or model_type not in MODELS[mode]:
@@ -40,34 +107,34 @@ def load_model_cached(mode: str, use_lite: bool = False):
         if not model_path:
             raise HTTPException(status_code=404, detail=f"模型未找到: {model_info['folder']}")
         
-        print(f"[模型加载] 开始加载模型: {key} ({model_path})")
-        _cached_models[key] = load_model(model_path)
-        print(f"[模型加载] 模型加载完成: {key}")
-        return _cached_models[key]
+        logger.info("[模型加载] 开始加载模型: %s (%s)", key, model_path)
+        with MODEL_LOAD_SECONDS.time(model=mode, variant=model_type):
+            model = load_tts_model(model_path)
+        _store("tts", key, model)
+        logger.info("[模型加载] 模型加载完成: %s", key)
+        return model
 
 
 def load_asr_model_cached(model_key: str = None):
     """加载并缓存 ASR 模型"""
+    _check_assigned("stt")
     if model_key is None:
-        for key, config in ASR_MODELS.items():
-            if config.get("default", False):
-                model_key = key
-                break
-        if model_key is None:
-            model_key = list(ASR_MODELS.keys())[0]
+        model_key = default_model_key(ASR_MODELS)
     
     if model_key not in ASR_MODELS:
         raise HTTPException(status_code=500, detail=f"ASR 模型配置错误: {model_key}")
     
-    if model_key in _cached_asr_models:
-        return _cached_asr_models[model_key]
+    model = _get_cached("asr", model_key)
+    if model is not None:
+        return model
     
     if model_key not in _asr_model_loading_lock:
         _asr_model_loading_lock[model_key] = threading.Lock()
     
     with _asr_model_loading_lock[model_key]:
-        if model_key in _cached_asr_models:
-            return _cached_asr_models[model_key]
+        model = _get_cached("asr", model_key)
+        if model is not None:
+            return model
         
         model_info = ASR_MODELS[model_key]
         folder = model_info.get("folder")
@@ -78,40 +145,40 @@ def load_asr_model_cached(model_key: str = None):
         if not model_path:
             raise HTTPException(status_code=404, detail=f"ASR 模型未找到: {folder}，请确认模型已下载到 models/ 目录")
         
-        print(f"[ASR模型加载] 从本地加载模型: {model_key} ({model_path})")
+        logger.info("[ASR模型加载] 从本地加载模型: %s (%s)", model_key, model_path)
         try:
-            _cached_asr_models[model_key] = load_stt_model(model_path)
-            print(f"[ASR模型加载] 本地模型加载完成: {model_key}")
-            return _cached_asr_models[model_key]
+            _prefetch_weights(model_path)
+            from mlx_audio.stt.utils import load_model as load_stt_model
+            with MODEL_LOAD_SECONDS.time(model=model_key, variant=""):
+                model = load_stt_model(model_path)
+            _store("asr", model_key, model)
+            logger.info("[ASR模型加载] 本地模型加载完成: %s", model_key)
+            return model
         except Exception as e:
-            import traceback
-            print(f"[ASR模型加载] 本地加载失败: {str(e)}")
-            print(f"Traceback: {traceback.format_exc()}")
+            logger.exception("[ASR模型加载] 本地加载失败: %s", e)
             raise HTTPException(status_code=500, detail=f"ASR 模型加载失败: {str(e)}")
 
 
 def load_forced_aligner_model_cached(model_key: str = None):
     """加载并缓存 ForcedAligner 模型"""
+    _check_assigned("stt")
     if model_key is None:
-        for key, config in FORCED_ALIGNER_MODELS.items():
-            if config.get("default", False):
-                model_key = key
-                break
-        if model_key is None:
-            model_key = list(FORCED_ALIGNER_MODELS.keys())[0]
+        model_key = default_model_key(FORCED_ALIGNER_MODELS)
 
     if model_key not in FORCED_ALIGNER_MODELS:
         raise HTTPException(status_code=500, detail=f"ForcedAligner 模型配置错误: {model_key}")
 
-    if model_key in _cached_forced_aligner_models:
-        return _cached_forced_aligner_models[model_key]
+    model = _get_cached("aligner", model_key)
+    if model is not None:
+        return model
 
     if model_key not in _forced_aligner_model_loading_lock:
         _forced_aligner_model_loading_lock[model_key] = threading.Lock()
 
     with _forced_aligner_model_loading_lock[model_key]:
-        if model_key in _cached_forced_aligner_models:
-            return _cached_forced_aligner_models[model_key]
+        model = _get_cached("aligner", model_key)
+        if model is not None:
+            return model
 
         model_info = FORCED_ALIGNER_MODELS[model_key]
         folder = model_info.get("folder")
@@ -122,22 +189,63 @@ def load_forced_aligner_model_cached(model_key: str = None):
         if not model_path:
             raise HTTPException(status_code=404, detail=f"ForcedAligner 模型未找到: {folder}，请确认模型已下载到 models/ 目录")
 
-        print(f"[ForcedAligner模型加载] 从本地加载模型: {model_key} ({model_path})")
+        logger.info("[ForcedAligner模型加载] 从本地加载模型: %s (%s)", model_key, model_path)
         try:
-            _cached_forced_aligner_models[model_key] = load_stt_model(model_path)
-            print(f"[ForcedAligner模型加载] 本地模型加载完成: {model_key}")
-            return _cached_forced_aligner_models[model_key]
+            _prefetch_weights(model_path)
+            from mlx_audio.stt.utils import load_model as load_stt_model
+            with MODEL_LOAD_SECONDS.time(model=model_key, variant=""):
+                model = load_stt_model(model_path)
+            _store("aligner", model_key, model)
+            logger.info("[ForcedAligner模型加载] 本地模型加载完成: %s", model_key)
+            return model
         except Exception as e:
-            import traceback
-            print(f"[ForcedAligner模型加载] 本地加载失败: {str(e)}")
-            print(f"Traceback: {traceback.format_exc()}")
+            logger.exception("[ForcedAligner模型加载] 本地加载失败: %s", e)
             raise HTTPException(status_code=500, detail=f"ForcedAligner 模型加载失败: {str(e)}")
 
 
+def evict_least_recent_model() -> Optional[str]:
+    """卸载最近最少使用的一个模型（正在推理的请求仍持有引用，不受影响）
+
+    Returns:
+        被卸载的模型标识，没有可卸载的模型时返回 None
+    """
+    with _cache_lock:
+        loaded = [(kind, key) for kind, cache in _caches.items() for key in cache]
+        if not loaded:
+            return None
+        kind, key = min(loaded, key=lambda k: _model_last_used.get(k, 0.0))
+        _caches[kind].pop(key, None)
+        _model_last_used.pop((kind, key), None)
+    logger.warning("[模型卸载] 内存压力过高，卸载模型: %s/%s", kind, key)
+    return f"{kind}/{key}"
+
+
+def _loaded_model_samples():
+    """导出已加载模型的指标样本"""
+    with _cache_lock:
+        tts_keys = list(_cached_models)
+        asr_keys = list(_cached_asr_models)
+        aligner_keys = list(_cached_forced_aligner_models)
+    samples = []
+    for key in tts_keys:
+        mode, model_type = key.rsplit("_", 1)
+        samples.append(({"kind": "tts", "model": mode, "variant": model_type}, 1))
+    for key in asr_keys:
+        samples.append(({"kind": "asr", "model": key, "variant": ""}, 1))
+    for key in aligner_keys:
+        samples.append(({"kind": "aligner", "model": key, "variant": ""}, 1))
+    return samples
+
+
+LOADED_MODELS.set_callback(_loaded_model_samples)
+
+
 def get_models_status():
     """获取模型加载状态"""
+    with _cache_lock:
+        loaded_keys = list(_cached_models)
     status = {}
-    for key in _cached_models.keys():
+    for key in loaded_keys:
         mode, model_type = key.rsplit("_", 1)
         status[key] = {
             "mode": mode,
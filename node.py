@@ -0,0 +1,160 @@
+"""
+推理节点
+
+只提供模型推理的 HTTP 服务，由前端进程（设置 QWEN3_TTS_INFERENCE_NODES）转发合成、识别与对齐请求。
+历史记录、输出文件和限流都留在前端，节点只返回音频或识别结果。
+默认只监听本机；供其他机器访问时用 --host 指定地址，并在节点与前端设置同一个 QWEN3_TTS_NODE_TOKEN。
+
+用法：
+    python node.py --port 8780
+    python node.py --port 8781 --models custom,design
+    QWEN3_TTS_NODE_TOKEN=secret python node.py --host 0.0.0.0 --port 8780
+    # 本地联调：使用基准测试的替身模型
+    PYTHONPATH=benchmarks/stubs python node.py --port 8780
+"""
+import os
+import sys
+import hmac
+import json
+import argparse
+
+# 节点接受的合成参数（透传给 generate_audio）；ref_audio 只能来自上传的文件
+NODE_TTS_KWARGS = {"voice", "instruct", "speed", "lang_code", "ref_text"}
+
+
+def create_app():
+    """创建节点应用（需在设置好环境变量之后调用）"""
+    from fastapi import FastAPI, Form, File, UploadFile, Request, HTTPException
+    from fastapi.responses import Response, JSONResponse
+    from fastapi.concurrency import run_in_threadpool
+    from config import WORKER_MODELS, TMP_DIR, NODE_TOKEN
+    from nodes import NODE_TOKEN_HEADER
+    from admission import admission
+    from models import loaded_model_keys
+    from synthesis import synthesize_to_temp
+    from api.stt import transcribe
+    from api.stt_aligner import run_forced_alignment
+    from api import metrics as metrics_api
+    from utils import get_temp_path, cleanup_temp_files
+    from memory import governor
+    from logs import RequestIdMiddleware
+    from contextlib import asynccontextmanager
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        os.makedirs(TMP_DIR, exist_ok=True)
+        governor.start()
+        yield
+        governor.stop()
+
+    app = FastAPI(title="Qwen3-TTS Inference Node", lifespan=lifespan)
+    app.add_middleware(RequestIdMiddleware)
+
+    @app.middleware("http")
+    async def check_token(request: Request, call_next):
+        """设置了 QWEN3_TTS_NODE_TOKEN 时拒绝口令不符的请求"""
+        if NODE_TOKEN and not hmac.compare_digest(request.headers.get(NODE_TOKEN_HEADER, ""), NODE_TOKEN):
+            return JSONResponse({"detail": "节点口令无效"}, status_code=401)
+        return await call_next(request)
+    app.include_router(metrics_api.router, tags=["metrics"])
+
+    def _params(params: str) -> dict:
+        try:
+            return json.loads(params)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="params 不是合法的 JSON")
+
+    async def _save_upload(upload: UploadFile, prefix: str) -> str:
+        path = get_temp_path(prefix, "audio.wav")
+        with open(path, "wb") as f:
+            f.write(await upload.read())
+        return path
+
+    @app.get("/node/status")
+    async def node_status():
+        """节点负责的模型类别、已加载的模型与排队深度"""
+        queues = admission.status()["queues"]
+        return {
+            "models": sorted(WORKER_MODELS) if WORKER_MODELS is not None else None,
+            "loaded": loaded_model_keys(),
+            "queue_depth": sum(q["in_flight"] + q["waiting"] for q in queues.values()),
+            "queues": queues,
+        }
+
+    @app.post("/node/tts")
+    async def node_tts(request: Request, params: str = Form(...), ref_audio: UploadFile = File(None)):
+        """合成并直接返回 WAV"""
+        p = _params(params)
+        kwargs = p.get("kwargs", {})
+        if not isinstance(kwargs, dict):
+            raise HTTPException(status_code=400, detail="kwargs 应为对象")
+        unknown = set(kwargs) - NODE_TTS_KWARGS
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"不支持的合成参数: {', '.join(sorted(unknown))}")
+        ref_path = await _save_upload(ref_audio, "node_ref") if ref_audio is not None else None
+        if ref_path:
+            kwargs["ref_audio"] = ref_path
+        temp_dir = None
+        try:
+            async with admission.admit(request, "tts", check_rate=False):
+                temp_dir = await run_in_threadpool(synthesize_to_temp, p["mode"], p.get("use_lite", False),
+                                                   p["text"], prefix="temp_node", **kwargs)
+            with open(os.path.join(temp_dir, "audio_000.wav"), "rb") as f:
+                return Response(f.read(), media_type="audio/wav")
+        finally:
+            cleanup_temp_files(ref_path, temp_dir)
+
+    @app.post("/node/stt")
+    async def node_stt(request: Request, params: str = Form(...), audio: UploadFile = File(...)):
+        """识别文本"""
+        p = _params(params)
+        wav_path = await _save_upload(audio, "node_stt")
+        try:
+            async with admission.admit(request, "stt", check_rate=False):
+                text, language = await run_in_threadpool(transcribe, wav_path, p.get("model_key"),
+                                                         p.get("language", "Chinese"))
+            return {"text": text, "language": language}
+        finally:
+            cleanup_temp_files(wav_path)
+
+    @app.post("/node/align")
+    async def node_align(request: Request, params: str = Form(...), audio: UploadFile = File(...)):
+        """强制对齐，返回带时间戳的片段"""
+        p = _params(params)
+        wav_path = await _save_upload(audio, "node_align")
+        try:
+            async with admission.admit(request, "stt", check_rate=False):
+                segments = await run_in_threadpool(run_forced_alignment, wav_path, p["text"],
+                                                   p.get("language", "Chinese"))
+            return {"segments": segments}
+        finally:
+            cleanup_temp_files(wav_path)
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Qwen3-TTS 推理节点")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="监听地址；供其他机器访问时指定（如 0.0.0.0），并设置 QWEN3_TTS_NODE_TOKEN")
+    parser.add_argument("--port", type=int, default=8780, help="监听端口")
+    parser.add_argument("--models", default=None,
+                        help="节点负责的模型类别，逗号分隔（custom / design / clone / stt），默认全部")
+    args = parser.parse_args(argv)
+
+    # 节点自己执行推理，不再转发；限流由前端负责
+    os.environ.pop("QWEN3_TTS_INFERENCE_NODES", None)
+    os.environ.setdefault("QWEN3_TTS_RATE_LIMIT_PER_SECOND", "0")
+    if args.models:
+        os.environ["QWEN3_TTS_WORKER_MODELS"] = args.models
+
+    from logs import setup_logging
+    setup_logging()
+
+    import uvicorn
+    uvicorn.run(create_app(), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
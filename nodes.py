@@ -0,0 +1,259 @@
+"""
+远程推理节点池
+
+设置 QWEN3_TTS_INFERENCE_NODES 后，本进程只做路由：合成、识别与对齐不在本地加载模型，
+而是通过 HTTP 转发给 node.py 启动的推理节点执行。
+- 按负载（节点上报的其他来源的排队深度 + 本进程发往该节点的在途请求）选择节点，未加载所需模型的节点额外计入
+  QWEN3_TTS_NODE_COLD_PENALTY 个请求：空闲时总是复用已加载模型的节点，排队过长时才在其他节点加载
+- 后台线程定期查询各节点的 /node/status，连接失败的节点暂停使用，恢复后自动重新启用
+- 连接失败、节点中途断开或节点繁忙（503）时换下一个节点重试
+"""
+import os
+import json
+import time
+import threading
+from typing import TYPE_CHECKING, List, Optional, Set, Tuple
+from fastapi import HTTPException
+from config import (INFERENCE_NODES, NODE_HEALTH_INTERVAL, NODE_REQUEST_TIMEOUT, NODE_COLD_PENALTY, NODE_TOKEN,
+                    ASR_MODELS, FORCED_ALIGNER_MODELS)
+from logs import get_logger, current_request_id
+
+# 节点口令的请求头（见 config.NODE_TOKEN）
+NODE_TOKEN_HEADER = "X-Node-Token"
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = get_logger(__name__)
+
+
+class InferenceNode:
+    """一个推理节点的最近状态"""
+
+    def __init__(self, url: str):
+        self.url = url
+        # 首次健康检查之前先假定可用
+        self.healthy = True
+        # 节点负责的模型类别，None 表示全部
+        self.models: Optional[Set[str]] = None
+        self.loaded: Set[str] = set()
+        # 节点上报的排队深度减去当时本进程的在途请求，即其他前端带来的负载
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_checked: Optional[float] = None
+
+    def serves(self, model_class: str) -> bool:
+        return self.models is None or model_class in self.models
+
+    def load(self) -> int:
+        return self.queue_depth + self.in_flight
+
+    def status(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "models": sorted(self.models) if self.models is not None else None,
+            "loaded": sorted(self.loaded),
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_checked": self.last_checked,
+        }
+
+
+class NodePool:
+    """推理节点池：健康检查、按模型亲和与负载选择节点、失败转移"""
+
+    def __init__(self, urls: List[str], interval: float, timeout: float, cold_penalty: int):
+        self.nodes = [InferenceNode(url) for url in urls]
+        self.interval = interval
+        self.timeout = timeout
+        self.cold_penalty = cold_penalty
+        self.failovers = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._client: Optional["httpx.Client"] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.nodes)
+
+    def _http(self) -> "httpx.Client":
+        # 只有配置了节点才会用到 httpx，按需导入
+        import httpx
+
+        if self._client is None:
+            headers = {NODE_TOKEN_HEADER: NODE_TOKEN} if NODE_TOKEN else None
+            self._client = httpx.Client(timeout=httpx.Timeout(self.timeout, connect=5.0), headers=headers)
+        return self._client
+
+    def start(self):
+        """启动后台健康检查线程"""
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="node-health", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台线程并关闭连接"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval)
+
+    def refresh(self):
+        """查询所有节点的状态"""
+        import httpx
+
+        for node in self.nodes:
+            try:
+                response = self._http().get(node.url + "/node/status", timeout=2.0)
+                response.raise_for_status()
+                data = response.json()
+            except (httpx.HTTPError, ValueError) as e:
+                with self._lock:
+                    self._mark_failed(node, e)
+                continue
+            with self._lock:
+                if not node.healthy:
+                    logger.info("[推理节点] %s 已恢复", node.url)
+                node.healthy = True
+                node.models = set(data["models"]) if data.get("models") is not None else None
+                node.loaded = set(data.get("loaded", []))
+                node.queue_depth = max(0, int(data.get("queue_depth", 0)) - node.in_flight)
+                node.last_checked = time.time()
+                node.last_error = None
+
+    def _mark_failed(self, node: InferenceNode, error: Exception):
+        node.failures += 1
+        node.last_error = str(error) or type(error).__name__
+        if node.healthy:
+            logger.warning("[推理节点] %s 不可用: %s", node.url, node.last_error)
+        node.healthy = False
+
+    def _acquire(self, model_class: str, model_key: str, tried: List[InferenceNode]) -> Optional[InferenceNode]:
+        """选择负载最低的节点并计入在途请求（未加载模型的节点计入加载代价，同分时选实际负载低的）"""
+        with self._lock:
+            candidates = [n for n in self.nodes if n.healthy and n.serves(model_class) and n not in tried]
+            if not candidates:
+                return None
+            node = min(candidates, key=lambda n: (n.load() + (0 if model_key in n.loaded else self.cold_penalty),
+                                                  n.load()))
+            node.in_flight += 1
+            node.requests += 1
+            return node
+
+    def _post(self, model_class: str, model_key: str, path: str, data: dict, files: Optional[dict] = None) -> "httpx.Response":
+        """把推理请求发给合适的节点，必要时转移到其他节点
+
+        Raises:
+            HTTPException: 没有可用节点（503）、推理超时（504）或节点返回的错误
+        """
+        import httpx
+
+        headers = {}
+        request_id = current_request_id()
+        if request_id:
+            headers["X-Request-ID"] = request_id
+
+        tried: List[InferenceNode] = []
+        while True:
+            node = self._acquire(model_class, model_key, tried)
+            if node is None:
+                if tried:
+                    raise HTTPException(status_code=503, detail="推理节点繁忙或不可用，请稍后重试",
+                                        headers={"Retry-After": "5"})
+                raise HTTPException(status_code=503, detail=f"没有可用的推理节点（{model_class}）",
+                                    headers={"Retry-After": "5"})
+            tried.append(node)
+            try:
+                response = self._http().post(node.url + path, data=data, files=files, headers=headers)
+            except httpx.ReadTimeout:
+                # 节点仍在推理，换节点重试只会加重负载
+                raise HTTPException(status_code=504, detail="推理节点响应超时")
+            except httpx.TransportError as e:
+                with self._lock:
+                    self._mark_failed(node, e)
+                    self.failovers += 1
+                continue
+            finally:
+                with self._lock:
+                    node.in_flight -= 1
+
+            if response.status_code == 503:
+                logger.warning("[推理节点] %s 繁忙，尝试其他节点", node.url)
+                with self._lock:
+                    self.failovers += 1
+                continue
+            if response.status_code >= 400:
+                try:
+                    detail = response.json().get("detail", response.text)
+                except ValueError:
+                    detail = response.text
+                raise HTTPException(status_code=response.status_code, detail=detail)
+            with self._lock:
+                node.loaded.add(model_key)
+            logger.debug("[推理节点] %s %s 完成", node.url, path)
+            return response
+
+    def synthesize(self, mode: str, use_lite: bool, text: str, output_dir: str, generate_kwargs: dict):
+        """在节点上合成，音频写入 output_dir/audio_000.wav（与本地 generate_audio 的输出一致）"""
+        kwargs = {k: v for k, v in generate_kwargs.items() if k != "verbose"}
+        files = None
+        ref_audio = kwargs.pop("ref_audio", None)
+        if ref_audio:
+            with open(ref_audio, "rb") as f:
+                files = {"ref_audio": (os.path.basename(ref_audio), f.read(), "audio/wav")}
+        params = {"mode": mode, "use_lite": use_lite, "text": text, "kwargs": kwargs}
+        key = f"{mode}_{'lite' if use_lite else 'pro'}"
+        response = self._post(mode, key, "/node/tts", {"params": json.dumps(params, ensure_ascii=False)}, files)
+        with open(os.path.join(output_dir, "audio_000.wav"), "wb") as f:
+            f.write(response.content)
+
+    def transcribe(self, wav_path: str, model_key: Optional[str], language: str) -> Tuple[str, Optional[str]]:
+        """在节点上识别，返回 (文本, 检测到的语言)"""
+        from models import default_model_key
+
+        with open(wav_path, "rb") as f:
+            files = {"audio": (os.path.basename(wav_path), f.read(), "audio/wav")}
+        key = model_key or default_model_key(ASR_MODELS)
+        params = {"model_key": model_key, "language": language}
+        result = self._post("stt", key, "/node/stt", {"params": json.dumps(params)}, files).json()
+        return result["text"], result.get("language")
+
+    def align(self, wav_path: str, text: str, language: str) -> list:
+        """在节点上做强制对齐，返回与 run_forced_alignment 相同的片段列表"""
+        from models import default_model_key
+
+        with open(wav_path, "rb") as f:
+            files = {"audio": (os.path.basename(wav_path), f.read(), "audio/wav")}
+        params = {"text": text, "language": language}
+        response = self._post("stt", default_model_key(FORCED_ALIGNER_MODELS), "/node/align",
+                              {"params": json.dumps(params, ensure_ascii=False)}, files)
+        return response.json()["segments"]
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "failovers": self.failovers,
+                "nodes": [node.status() for node in self.nodes],
+            }
+
+
+node_pool = NodePool(INFERENCE_NODES, NODE_HEALTH_INTERVAL, NODE_REQUEST_TIMEOUT, NODE_COLD_PENALTY)
@@ -0,0 +1,120 @@
+"""
+合成结果的音频后处理
+
+保存合成结果（utils.save_audio_file）时在进程内完成以下处理，不再逐个文件调用 ffmpeg：
+- 去除首尾静音：按 10ms 分块取峰值，首尾峰值低于 POSTPROCESS_TRIM_DB 的部分去掉，两端各保留一小段
+- 响度归一化：用 pyloudnorm 测量积分响度（ITU-R BS.1770），增益调整到目标 LUFS，并限制峰值不超过 POSTPROCESS_PEAK_DB
+- 淡入淡出：首尾各加一段升余弦包络，避免裁剪处的爆音
+
+去静音只是在内存中的采样上取切片，增益与淡入淡出合成一条包络，对切片只做一次乘法。
+每个请求可以单独开关各项或调整目标响度与淡入淡出时长（PostProcessOptions）。
+"""
+import os
+import json
+from typing import Optional
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+from config import (POSTPROCESS_ENABLED, POSTPROCESS_TRIM_DB, POSTPROCESS_TRIM_PAD_MS, POSTPROCESS_LOUDNESS_LUFS,
+                    POSTPROCESS_PEAK_DB, POSTPROCESS_FADE_MS)
+from timestretch import read_wav, write_wav
+from metrics import POSTPROCESS_SECONDS
+from tracing import span
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# 去静音时计算峰值的分块时长（秒）
+TRIM_BLOCK_SECONDS = 0.01
+# pyloudnorm 测量积分响度至少需要一个 400ms 的门限块
+MIN_LOUDNESS_SECONDS = 0.4
+
+
+class PostProcessOptions(BaseModel):
+    """音频后处理选项，未指定的项使用服务端配置"""
+    enabled: bool = POSTPROCESS_ENABLED
+    trim: bool = True
+    loudness_lufs: Optional[float] = POSTPROCESS_LOUDNESS_LUFS  # null 表示不做响度归一化
+    fade_ms: float = POSTPROCESS_FADE_MS
+
+
+def parse_options(value: Optional[str]) -> PostProcessOptions:
+    """解析表单中以 JSON 字符串提交的后处理选项
+
+    Raises:
+        HTTPException: 不是有效的选项（400）
+    """
+    if not value:
+        return PostProcessOptions()
+    try:
+        return PostProcessOptions(**json.loads(value))
+    except (ValueError, TypeError, ValidationError) as e:
+        raise HTTPException(status_code=400, detail=f"postprocess 参数无效: {e}")
+
+
+def trim_bounds(samples, sample_rate: int, threshold_db: float = POSTPROCESS_TRIM_DB,
+                pad_ms: float = POSTPROCESS_TRIM_PAD_MS):
+    """首尾静音之外的采样范围 (start, end)；整段都是静音时返回整段"""
+    import numpy as np
+    total = samples.shape[0]
+    block = max(1, int(sample_rate * TRIM_BLOCK_SECONDS))
+    blocks = -(-total // block)
+    peaks = np.abs(samples).max(axis=1)
+    peaks = np.pad(peaks, (0, blocks * block - total)).reshape(blocks, block).max(axis=1)
+    loud = peaks >= 10 ** (threshold_db / 20)
+    if not loud.any():
+        return 0, total
+    pad = int(sample_rate * pad_ms / 1000)
+    first = int(np.argmax(loud))
+    last = blocks - 1 - int(np.argmax(loud[::-1]))
+    return max(0, first * block - pad), min(total, (last + 1) * block + pad)
+
+
+def loudness_gain(samples, sample_rate: int, target_lufs: float, peak_db: float = POSTPROCESS_PEAK_DB) -> float:
+    """把积分响度调整到 target_lufs 所需的线性增益（受峰值上限约束）；音频过短或为静音时返回 1"""
+    import numpy as np
+    if samples.shape[0] < sample_rate * MIN_LOUDNESS_SECONDS:
+        return 1.0
+    import pyloudnorm
+    loudness = pyloudnorm.Meter(sample_rate).integrated_loudness(samples)
+    if not np.isfinite(loudness):
+        return 1.0
+    gain = 10 ** ((target_lufs - loudness) / 20)
+    peak = float(np.abs(samples).max())
+    if peak > 0:
+        gain = min(gain, 10 ** (peak_db / 20) / peak)
+    return gain
+
+
+def fade_envelope(length: int, sample_rate: int, fade_ms: float):
+    """首尾升余弦淡入淡出包络（float32）"""
+    import numpy as np
+    envelope = np.ones(length, dtype=np.float32)
+    fade = min(int(sample_rate * fade_ms / 1000), length // 2)
+    if fade > 0:
+        ramp = (0.5 - 0.5 * np.cos(np.linspace(0, np.pi, fade, dtype=np.float32)))
+        envelope[:fade] = ramp
+        envelope[length - fade:] = ramp[::-1]
+    return envelope
+
+
+def process(samples, sample_rate: int, options: PostProcessOptions):
+    """对帧数 x 声道数的 float32 采样做后处理，返回新的采样"""
+    if options.trim:
+        start, end = trim_bounds(samples, sample_rate)
+        samples = samples[start:end]
+    gain = 1.0
+    if options.loudness_lufs is not None:
+        gain = loudness_gain(samples, sample_rate, options.loudness_lufs)
+    envelope = fade_envelope(samples.shape[0], sample_rate, options.fade_ms) * gain
+    return samples * envelope[:, None]
+
+
+def process_wav(source: str, output: str, options: PostProcessOptions):
+    """读取 source，后处理后写到 output（output 为新文件，不修改 source）"""
+    with span("postprocess"), POSTPROCESS_SECONDS.time():
+        samples, params = read_wav(source)
+        before = samples.shape[0]
+        processed = process(samples, params.framerate, options)
+        write_wav(output, processed, params)
+    logger.debug("[音频后处理] %s: %.2fs → %.2fs", os.path.basename(output),
+                 before / params.framerate, processed.shape[0] / params.framerate)
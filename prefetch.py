@@ -0,0 +1,286 @@
+"""
+预测性模型预加载
+
+页面导航时前端调用 POST /api/prefetch 提示服务端当前所在的页面，服务端在后台预先加载该页面接下来
+最可能用到的模型，页面上的第一个请求不必再等待冷启动的 load_model：
+- 每个页面可能用到的模型类别见 PAGE_MODELS；只可能用到一种模型的页面直接预加载
+- 可能用到多种模型时，按历史记录学到的使用规律预测：上一次使用的模型 → 下一次使用的模型的转移频率，
+  以及当前时段（小时）各模型的使用频率，两者平均后在页面的候选模型中归一化，只预加载概率不低于
+  PREFETCH_MIN_SCORE 的模型
+- 模型版本（Pro / Lite）取提示中的 use_lite，未指定时沿用该模型最近一次使用的版本
+- 预加载前按权重文件大小估算内存，加载后会超过内存软水位时不预加载，避免为猜测的请求卸载正在使用的模型
+- 预加载在单个后台线程中依次执行；与真实请求共用模型加载锁，同一模型不会重复加载
+"""
+import os
+import time
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from config import (MODELS, ASR_MODELS, FORCED_ALIGNER_MODELS, MODEL_CLASSES, WORKER_MODELS, PREFETCH_ENABLED,
+                    PREFETCH_HISTORY_LIMIT, PREFETCH_REFRESH_INTERVAL, PREFETCH_SESSION_GAP, PREFETCH_MIN_SCORE)
+from history import get_usage_records
+from memory import governor
+from nodes import node_pool
+import weights
+from metrics import MODEL_PREFETCHES
+from utils import get_smart_path
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# 页面 → 该页面可能用到的模型类别
+PAGE_MODELS = {
+    "tts": ["custom", "clone"],
+    "speakers": ["custom", "clone"],
+    "clone": ["clone"],
+    "stt": ["stt"],
+    # 历史页面本身不做推理，按使用规律预测离开后最可能使用的模型
+    "history": list(MODEL_CLASSES),
+}
+
+
+def model_class_of(record: dict) -> str:
+    """历史记录对应的模型类别"""
+    if record["type"] == "stt":
+        return "stt"
+    speaker = record.get("speaker") or ""
+    if speaker.startswith("设计音色"):
+        return "design"
+    if speaker.startswith("克隆音色"):
+        return "clone"
+    return "custom"
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+class UsageModel:
+    """从历史记录统计的使用规律"""
+
+    def __init__(self, session_gap: float):
+        self.session_gap = session_gap
+        # 小时 → {模型类别: 次数}
+        self.hours: Dict[int, Dict[str, int]] = {}
+        # 上一个模型类别 → {下一个模型类别: 次数}
+        self.transitions: Dict[str, Dict[str, int]] = {}
+        # 模型类别 → 最近一次使用的版本（pro / lite）
+        self.variants: Dict[str, str] = {}
+        self.last_class: Optional[str] = None
+        self.last_used: Optional[datetime] = None
+        self.records = 0
+
+    def fit(self, records: List[dict]):
+        """按时间顺序（最早的在前）统计"""
+        previous: Optional[Tuple[str, datetime]] = None
+        for record in records:
+            created_at = _parse_time(record.get("created_at"))
+            if created_at is None:
+                continue
+            model_class = model_class_of(record)
+            self.records += 1
+            hour = self.hours.setdefault(created_at.hour, {})
+            hour[model_class] = hour.get(model_class, 0) + 1
+            if record.get("model_type"):
+                self.variants[model_class] = record["model_type"]
+            # 批量合成的各条记录时间相同，只算一次使用
+            if previous is not None and previous[1] != created_at \
+                    and (created_at - previous[1]).total_seconds() <= self.session_gap:
+                following = self.transitions.setdefault(previous[0], {})
+                following[model_class] = following.get(model_class, 0) + 1
+            previous = (model_class, created_at)
+        if previous is not None:
+            self.last_class, self.last_used = previous
+
+    @staticmethod
+    def _smoothed(counts: Dict[str, int], model_class: str) -> float:
+        """加一平滑后的频率"""
+        return (counts.get(model_class, 0) + 1) / (sum(counts.values()) + len(MODEL_CLASSES))
+
+    def predict(self, candidates: List[str], now: Optional[datetime] = None) -> Dict[str, float]:
+        """候选模型类别的使用概率（在候选中归一化）"""
+        now = now or datetime.now()
+        # 距上一次使用已超过会话间隔时，转移频率不再适用，只按时段预测
+        recent = self.last_class is not None and self.last_used is not None \
+            and (now - self.last_used).total_seconds() <= self.session_gap
+        following = self.transitions.get(self.last_class, {}) if recent else {}
+        hour = self.hours.get(now.hour, {})
+        scores = {c: (self._smoothed(following, c) + self._smoothed(hour, c)) / 2 for c in candidates}
+        total = sum(scores.values()) or 1.0
+        return {c: round(score / total, 3) for c, score in scores.items()}
+
+    def summary(self) -> dict:
+        return {
+            "records": self.records,
+            "last_model": self.last_class,
+            "last_used": self.last_used.isoformat() if self.last_used else None,
+            "transitions": self.transitions,
+            "variants": self.variants,
+        }
+
+
+def _model_paths(model_class: str, variant: str) -> List[Optional[str]]:
+    """模型类别对应的模型目录（stt 包含 ASR 与 ForcedAligner），未下载的为 None"""
+    from models import default_model_key
+    if model_class == "stt":
+        return [get_smart_path(ASR_MODELS[default_model_key(ASR_MODELS)]["folder"]),
+                get_smart_path(FORCED_ALIGNER_MODELS[default_model_key(FORCED_ALIGNER_MODELS)]["folder"])]
+    return [get_smart_path(MODELS[model_class][variant]["folder"])]
+
+
+def _model_keys(model_class: str, variant: str) -> List[str]:
+    """模型类别在 loaded_model_keys() 中的标识"""
+    from models import default_model_key
+    if model_class == "stt":
+        return [default_model_key(ASR_MODELS), default_model_key(FORCED_ALIGNER_MODELS)]
+    return [f"{model_class}_{variant}"]
+
+
+def _weights_mb(paths: List[str]) -> float:
+    """模型权重文件的总大小（MB），用于估算加载后的内存占用"""
+    total = 0
+    for path in paths:
+        total += sum(os.path.getsize(f) for f in weights.checkpoint_files(path) if os.path.exists(f))
+    return total / 1024 / 1024
+
+
+class Prefetcher:
+    """接收页面导航提示，在后台预加载预测的模型"""
+
+    def __init__(self, enabled: bool, history_limit: int, refresh_interval: float, session_gap: float,
+                 min_score: float):
+        self.enabled = enabled
+        self.history_limit = history_limit
+        self.refresh_interval = refresh_interval
+        self.session_gap = session_gap
+        self.min_score = min_score
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._usage: Optional[UsageModel] = None
+        self._built_at = 0.0
+        # 排队或正在加载的模型标识
+        self._pending = set()
+        # (模型标识, 结果) → 次数
+        self._results: Dict[Tuple[str, str], int] = {}
+
+    def usage(self) -> UsageModel:
+        """使用规律（超过 refresh_interval 后重新统计）"""
+        with self._lock:
+            if self._usage is None or time.monotonic() - self._built_at >= self.refresh_interval:
+                usage = UsageModel(self.session_gap)
+                usage.fit(get_usage_records(self.history_limit))
+                self._usage, self._built_at = usage, time.monotonic()
+            return self._usage
+
+    def _record(self, key: str, result: str):
+        with self._lock:
+            self._results[(key, result)] = self._results.get((key, result), 0) + 1
+        MODEL_PREFETCHES.inc(model=key, result=result)
+
+    def hint(self, page: str, use_lite: Optional[bool] = None) -> dict:
+        """处理页面导航提示，返回预测结果与已安排预加载的模型（不等待加载完成）
+
+        Raises:
+            HTTPException: 未知页面（400）
+        """
+        if page not in PAGE_MODELS:
+            raise HTTPException(status_code=400, detail=f"未知页面: {page}")
+        result = {"page": page, "predictions": {}, "scheduled": []}
+        if not self.enabled or node_pool.enabled:
+            # 推理在远程节点执行时，本进程不加载模型
+            return result
+
+        candidates = PAGE_MODELS[page]
+        usage = self.usage()
+        predictions = usage.predict(candidates)
+        result["predictions"] = predictions
+
+        for model_class, score in sorted(predictions.items(), key=lambda item: -item[1]):
+            if len(candidates) > 1 and score < self.min_score:
+                continue
+            # 多进程部署时只预加载本进程负责的模型（cluster.py 把提示转发给所有进程）
+            if WORKER_MODELS is not None and model_class not in WORKER_MODELS:
+                continue
+            if model_class == "stt":
+                variant = ""
+            elif use_lite is not None:
+                variant = "lite" if use_lite else "pro"
+            else:
+                variant = usage.variants.get(model_class, "pro")
+            key = f"{model_class}_{variant}" if variant else model_class
+            if self._schedule(model_class, variant, key):
+                result["scheduled"].append(key)
+        return result
+
+    def _schedule(self, model_class: str, variant: str, key: str) -> bool:
+        from models import loaded_model_keys
+        loaded = loaded_model_keys()
+        if all(k in loaded for k in _model_keys(model_class, variant)):
+            return False
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+        self._executor.submit(self._load, model_class, variant, key)
+        return True
+
+    def _load(self, model_class: str, variant: str, key: str):
+        """后台线程：检查内存余量后加载模型"""
+        from models import (loaded_model_keys, load_model_cached, load_asr_model_cached,
+                            load_forced_aligner_model_cached)
+        try:
+            if all(k in loaded_model_keys() for k in _model_keys(model_class, variant)):
+                self._record(key, "loaded_already")
+                return
+            paths = _model_paths(model_class, variant)
+            if None in paths:
+                self._record(key, "unavailable")
+                return
+            stats = governor.status()
+            used = max(stats["rss_mb"], stats["accelerator_mb"] or 0.0)
+            needed = _weights_mb(paths)
+            if used + needed > stats["soft_limit_mb"]:
+                logger.info("[模型预加载] %s: 内存余量不足（已用 %.0fMB，需要约 %.0fMB），跳过", key, used, needed)
+                self._record(key, "memory")
+                return
+
+            logger.info("[模型预加载] 开始预加载: %s", key)
+            if model_class == "stt":
+                load_asr_model_cached()
+                load_forced_aligner_model_cached()
+            else:
+                load_model_cached(model_class, variant == "lite")
+            self._record(key, "loaded")
+            governor.request_check()
+        except Exception as e:
+            logger.warning("[模型预加载] %s 预加载失败: %s", key, e)
+            self._record(key, "failed")
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def status(self) -> dict:
+        usage = self.usage() if self.enabled else None
+        with self._lock:
+            pending = sorted(self._pending)
+            results = sorted(self._results.items())
+        return {
+            "enabled": self.enabled,
+            "min_score": self.min_score,
+            "usage": usage.summary() if usage else None,
+            "predictions": {page: usage.predict(candidates) for page, candidates in PAGE_MODELS.items()} if usage else {},
+            "pending": pending,
+            "results": [{"model": key, "result": result, "count": count} for (key, result), count in results],
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+prefetcher = Prefetcher(PREFETCH_ENABLED, PREFETCH_HISTORY_LIMIT, PREFETCH_REFRESH_INTERVAL, PREFETCH_SESSION_GAP,
+                        PREFETCH_MIN_SCORE)
@@ -0,0 +1,99 @@
+"""
+负载自适应的模型质量选择
+
+请求 Pro 模型（use_lite=false）时，按当前负载决定实际使用的模型：
+- 空闲时使用 Pro（1.7B）
+- 合成队列排队数达到 QUALITY_DEGRADE_QUEUE，或预计排队等待超过延迟目标 QUALITY_LATENCY_SLO 时改用 Lite（0.6B），
+  让高峰期的排队时间保持在可控范围内
+- 内存余量（距软水位）不足且 Pro 模型尚未加载时改用 Lite，避免为加载大模型而卸载其他模型
+请求 Lite 模型时总是使用 Lite；quality=strict 的请求不做调整。
+"""
+from typing import Dict, Optional, Tuple
+from fastapi import HTTPException
+from config import (MODELS, QUALITY_AUTO_ENABLED, QUALITY_DEGRADE_QUEUE, QUALITY_LATENCY_SLO,
+                    QUALITY_MIN_HEADROOM_MB)
+from admission import admission
+from memory import governor
+from nodes import node_pool
+from metrics import QUALITY_DECISIONS
+from utils import get_smart_path
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+QUALITY_AUTO = "auto"
+QUALITY_STRICT = "strict"
+QUALITY_CHOICES = (QUALITY_AUTO, QUALITY_STRICT)
+
+
+class QualityPolicy:
+    """根据排队深度、预计等待与内存余量选择 Pro / Lite 模型"""
+
+    def __init__(self, enabled: bool, degrade_queue: int, latency_slo: float, min_headroom_mb: float):
+        self.enabled = enabled
+        self.degrade_queue = degrade_queue
+        self.latency_slo = latency_slo
+        self.min_headroom_mb = min_headroom_mb
+        # (实际使用的模型, 原因) → 次数
+        self._decisions: Dict[Tuple[str, str], int] = {}
+
+    def _pressure(self, mode: str) -> Optional[str]:
+        """返回需要降级的原因，负载正常时返回 None"""
+        queue = admission.queues["tts"]
+        if self.degrade_queue > 0 and queue.waiting >= self.degrade_queue:
+            return "queue"
+        if self.latency_slo > 0 and queue.expected_wait() > self.latency_slo:
+            return "latency"
+        if self.min_headroom_mb > 0 and not node_pool.enabled:
+            from models import loaded_model_keys
+            if f"{mode}_pro" not in loaded_model_keys():
+                stats = governor.status()
+                used = max(stats["rss_mb"], stats["accelerator_mb"] or 0.0)
+                if stats["soft_limit_mb"] - used < self.min_headroom_mb:
+                    return "memory"
+        return None
+
+    def _lite_available(self, mode: str) -> bool:
+        return node_pool.enabled or get_smart_path(MODELS[mode]["lite"]["folder"]) is not None
+
+    def choose(self, mode: str, use_lite: bool, quality: str = QUALITY_AUTO) -> bool:
+        """返回实际是否使用 Lite 模型
+
+        Raises:
+            HTTPException: quality 取值无效（400）
+        """
+        if quality not in QUALITY_CHOICES:
+            raise HTTPException(status_code=400, detail=f"quality 只能是 {' / '.join(QUALITY_CHOICES)}")
+        if use_lite:
+            reason = "requested"
+        elif quality == QUALITY_STRICT or not self.enabled:
+            reason = "strict" if quality == QUALITY_STRICT else "requested"
+        else:
+            reason = self._pressure(mode)
+            if reason is None:
+                reason = "idle"
+            elif self._lite_available(mode):
+                use_lite = True
+                logger.info("[质量选择] %s: 负载较高（%s），改用 Lite 模型", mode, reason)
+            else:
+                reason = "lite_unavailable"
+        variant = "lite" if use_lite else "pro"
+        self._decisions[(variant, reason)] = self._decisions.get((variant, reason), 0) + 1
+        QUALITY_DECISIONS.inc(model=mode, variant=variant, reason=reason)
+        return use_lite
+
+    def status(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "degrade_queue": self.degrade_queue,
+            "latency_slo_seconds": self.latency_slo,
+            "min_headroom_mb": self.min_headroom_mb,
+            "decisions": [
+                {"variant": variant, "reason": reason, "count": count}
+                for (variant, reason), count in sorted(self._decisions.items())
+            ],
+        }
+
+
+quality_policy = QualityPolicy(QUALITY_AUTO_ENABLED, QUALITY_DEGRADE_QUEUE, QUALITY_LATENCY_SLO,
+                               QUALITY_MIN_HEADROOM_MB)
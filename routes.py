@@ -1,7 +1,19 @@
 """
 页面路由
+
+页面在启动时（或首次访问时）渲染一次，之后直接从内存返回：
+- 预先计算 gzip 压缩结果与 ETag，浏览器带 If-None-Match 重新验证时返回 304
+- 页面中的静态资源 URL 带内容指纹，可被浏览器长期缓存
 """
-from fastapi.responses import HTMLResponse, RedirectResponse
+import re
+import gzip
+import json
+import hashlib
+from typing import Dict
+from fastapi import Request
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
+from assets import static_url, module_urls, tailwind_tag, accepted_encodings
+from config import PAGE_CACHE_ENABLED
 from templates import (
     get_html_template,
     get_tts_page,
@@ -11,54 +23,115 @@ from templates import (
     get_history_page
 )
 
+# 导航页 → 页面内容
+PAGES = {
+    'tts': get_tts_page,
+    'stt': get_stt_page,
+    'speakers': get_speakers_page,
+    'clone': get_clone_page,
+    'history': get_history_page,
+}
+
+_STATIC_URL_PATTERN = re.compile(r"\{\{ static_url\('([^']+)'\) \}\}")
+
 
 def render_page(template_func, active_page: str):
     """渲染页面"""
     template = get_html_template()
     content = template.replace('{{ content | safe }}', template_func())
-    content = content.replace("{{ 'active' if page == 'tts' else '' }}", "active" if active_page == 'tts' else "")
-    content = content.replace("{{ 'active' if page == 'stt' else '' }}", "active" if active_page == 'stt' else "")
-    content = content.replace("{{ 'active' if page == 'speakers' else '' }}", "active" if active_page == 'speakers' else "")
-    content = content.replace("{{ 'active' if page == 'clone' else '' }}", "active" if active_page == 'clone' else "")
-    content = content.replace("{{ 'active' if page == 'history' else '' }}", "active" if active_page == 'history' else "")
-    return content
+    for page in PAGES:
+        content = content.replace(f"{{{{ 'active' if page == '{page}' else '' }}}}",
+                                  "active" if active_page == page else "")
+    content = content.replace('{{ tailwind_tag | safe }}', tailwind_tag())
+    content = content.replace('{{ asset_urls | safe }}', json.dumps(module_urls()))
+    return _STATIC_URL_PATTERN.sub(lambda m: static_url(m.group(1)), content)
+
+
+class CachedPage:
+    """渲染好的页面：原文与 gzip 压缩结果，两种表示各有一个 ETag"""
+
+    def __init__(self, html: str):
+        self.body = html.encode("utf-8")
+        self.gzipped = gzip.compress(self.body, compresslevel=9, mtime=0)
+        digest = hashlib.sha256(self.body).hexdigest()[:16]
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gz"'
+
+
+_page_cache: Dict[str, CachedPage] = {}
+
+
+def get_page(active_page: str) -> CachedPage:
+    """返回渲染好的页面（关闭页面缓存时每次重新渲染）"""
+    page = _page_cache.get(active_page) if PAGE_CACHE_ENABLED else None
+    if page is None:
+        page = CachedPage(render_page(PAGES[active_page], active_page))
+        if PAGE_CACHE_ENABLED:
+            _page_cache[active_page] = page
+    return page
+
+
+def warm_pages():
+    """预先渲染全部页面"""
+    for active_page in PAGES:
+        get_page(active_page)
+
+
+def page_response(request: Request, active_page: str) -> Response:
+    """返回页面，处理 If-None-Match 与 gzip 协商"""
+    page = get_page(active_page)
+    accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+    use_gzip = "gzip" in accepted or "*" in accepted
+    etag = page.gzip_etag if use_gzip else page.etag
+    # HTML 不长期缓存：每次都向服务器验证，页面未变化时只返回 304
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in tags or page.etag in tags or page.gzip_etag in tags:
+            return Response(status_code=304, headers=headers)
+
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return HTMLResponse(page.gzipped, headers=headers)
+    return HTMLResponse(page.body, headers=headers)
 
 
 def register_routes(app):
     """注册页面路由"""
-    
+
     @app.get("/", response_class=HTMLResponse)
     async def root():
         """根路径重定向到 TTS 页面"""
         return RedirectResponse(url="/tts")
-    
+
     @app.get("/tts", response_class=HTMLResponse)
-    async def tts_page():
+    async def tts_page(request: Request):
         """文字转语音页面"""
-        return render_page(get_tts_page, 'tts')
-    
+        return page_response(request, 'tts')
+
     @app.get("/speakers", response_class=HTMLResponse)
-    async def speakers_page():
+    async def speakers_page(request: Request):
         """音色库页面"""
-        return render_page(get_speakers_page, 'speakers')
-    
+        return page_response(request, 'speakers')
+
     @app.get("/clone", response_class=HTMLResponse)
-    async def clone_page():
+    async def clone_page(request: Request):
         """克隆声音页面"""
-        return render_page(get_clone_page, 'clone')
-    
+        return page_response(request, 'clone')
+
     @app.get("/stt", response_class=HTMLResponse)
-    async def stt_page():
+    async def stt_page(request: Request):
         """语音转文字页面"""
-        return render_page(get_stt_page, 'stt')
-    
+        return page_response(request, 'stt')
+
     @app.get("/history", response_class=HTMLResponse)
-    async def history_page():
+    async def history_page(request: Request):
         """生成历史页面"""
-        return render_page(get_history_page, 'history')
+        return page_response(request, 'history')
 
     @app.get("/@vite/client")
     async def vite_client():
         """处理 Vite 客户端请求（浏览器插件或缓存导致）"""
         return {"message": "Not a Vite project"}
-
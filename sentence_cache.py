@@ -0,0 +1,141 @@
+"""
+长文本分段音频缓存
+
+长文本按句分段合成（synthesis.split_text_segments），每段的音频按
+(模型, 版本, 音色 / 描述 / 语速等合成参数, 本段文本, 前后相邻段的文本) 的哈希缓存在磁盘上。
+修改长文本中的个别句子后重新提交时，未改动的段直接取缓存，只重新合成改动的段及其相邻段，再重新拼接。
+
+- 相邻段文本计入键：一句改动后，与它相接的段也重新合成，衔接处的语气与停顿保持一致
+- 克隆音色的参考音频被替换后（修改时间变化）缓存不再命中
+- 缓存总大小超过 SENTENCE_CACHE_MAX_MB 时按最近使用时间删除最旧的文件
+"""
+import os
+import json
+import shutil
+import hashlib
+import threading
+from typing import Optional
+from config import SENTENCE_CACHE_DIR, SENTENCE_CACHE_MAX_MB
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+
+class SentenceCache:
+    """以文件形式保存的分段音频缓存（线程安全，多个工作进程可共享同一目录）"""
+
+    def __init__(self, directory: str, max_mb: int):
+        self.directory = directory
+        self.max_bytes = max_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        # 缓存目录的总字节数，首次使用时统计
+        self._size: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def key(mode: str, variant: str, text: str, previous: str, following: str, generate_kwargs: dict) -> str:
+        """分段的缓存键"""
+        params = {k: round(v, 3) if isinstance(v, float) else v
+                  for k, v in generate_kwargs.items() if k != "verbose"}
+        ref_audio = params.get("ref_audio")
+        if ref_audio and os.path.exists(ref_audio):
+            params["ref_audio_mtime"] = os.path.getmtime(ref_audio)
+        payload = json.dumps([mode, variant, text, previous, following, params], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.wav")
+
+    def fetch(self, key: str, dest: str) -> bool:
+        """缓存命中时把音频放到 dest（硬链接，跨文件系统时复制）并返回 True"""
+        if not self.enabled:
+            return False
+        path = self._path(key)
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                try:
+                    os.link(path, dest)
+                except OSError:
+                    if not os.path.exists(path):
+                        raise
+                    shutil.copyfile(path, dest)
+                # 更新修改时间，供按最近使用删除
+                os.utime(path)
+            except FileNotFoundError:
+                self.misses += 1
+                return False
+            self.hits += 1
+            return True
+
+    def store(self, key: str, source: str):
+        """保存一段合成结果（写入临时文件后改名，并发写入同一键时不会读到不完整的文件）"""
+        if not self.enabled or not os.path.exists(source):
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f"{path}.{os.getpid()}.{threading.get_ident()}.partial"
+        try:
+            shutil.copyfile(source, partial)
+            os.replace(partial, path)
+        except OSError as e:
+            logger.warning("[分段缓存] 写入失败: %s", e)
+            if os.path.exists(partial):
+                os.remove(partial)
+            return
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan()
+            else:
+                self._size += os.path.getsize(path)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _scan(self) -> int:
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            total += sum(os.path.getsize(os.path.join(root, f)) for f in files if f.endswith(".wav"))
+        return total
+
+    def _evict(self):
+        """删除最久未用的文件，直到总大小降到上限的 90%"""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for f in files:
+                if f.endswith(".wav"):
+                    path = os.path.join(root, f)
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        self._size = total
+        logger.info("[分段缓存] 超过上限，删除了 %d 个最久未用的分段", removed)
+
+    def status(self) -> dict:
+        with self._lock:
+            size = self._size
+        return {
+            "enabled": self.enabled,
+            "max_mb": self.max_bytes // 1024 // 1024,
+            "size_mb": round(size / 1024 / 1024, 1) if size is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+sentence_cache = SentenceCache(SENTENCE_CACHE_DIR, SENTENCE_CACHE_MAX_MB)
@@ -0,0 +1,110 @@
+"""
+相同请求合并（single-flight）
+
+参数相同的并发请求只执行一次计算，其余请求挂到进行中的计算上并共享结果：
+- 计算在独立任务中执行，发起计算的客户端断开时，其他等待者照常得到结果
+- 所有请求都已离开而计算仍在进行时调用 on_abandon（如取消推理令牌），不再为无人等待的结果继续计算
+- 结果需要每个请求各自持有时（如合成出的临时音频目录），除最后一个取结果的请求直接接管原结果外，
+  其余请求各自复制一份；没有请求取走结果时（全部断开）由 release 清理
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+from metrics import COALESCED_REQUESTS
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+
+class _Flight:
+    """一次进行中的计算"""
+
+    def __init__(self, task: asyncio.Future, on_abandon: Optional[Callable[[], None]]):
+        self.task = task
+        self.on_abandon = on_abandon
+        # 尚未取走结果的请求数
+        self.waiters = 0
+        # 原结果已被接管或清理
+        self.settled = False
+
+
+class SingleFlight:
+    """按 key 合并并发计算
+
+    Args:
+        name: 指标与日志中使用的名称
+        copy: 为每个请求复制一份结果（同步执行，不与其他请求交错）；None 表示共享同一结果
+        release: 没有请求接管原结果时的清理函数
+    """
+
+    def __init__(self, name: str, copy: Optional[Callable[[Any], Any]] = None,
+                 release: Optional[Callable[[Any], None]] = None):
+        self.name = name
+        self.copy = copy
+        self.release = release
+        self._flights: Dict[str, _Flight] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, compute: Callable[[], Awaitable[Any]],
+                 on_abandon: Optional[Callable[[], None]] = None) -> Any:
+        """执行 compute 或挂到相同 key 的进行中计算上，返回结果（计算抛出的异常对所有请求抛出）
+
+        on_abandon 只在本次调用发起计算时生效：所有请求都离开而计算尚未结束时调用
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(compute()), on_abandon)
+            self._flights[key] = flight
+            self.executions += 1
+            # 先于等待者的回调执行：等待者恢复时该计算已不再接受新的请求
+            flight.task.add_done_callback(lambda task: self._finished(key, flight))
+        else:
+            self.coalesced += 1
+            COALESCED_REQUESTS.inc(name=self.name)
+            logger.debug("[请求合并] %s: 合并到进行中的计算", self.name)
+
+        flight.waiters += 1
+        taken = False
+        try:
+            result = await asyncio.shield(flight.task)
+            flight.waiters -= 1
+            taken = True
+            if self.copy is None:
+                return result
+            if flight.waiters == 0:
+                # 最后一个请求直接接管原结果
+                flight.settled = True
+                return result
+            return self.copy(result)
+        finally:
+            if not taken:
+                flight.waiters -= 1
+                if flight.waiters == 0 and not flight.task.done() and flight.on_abandon is not None:
+                    logger.debug("[请求合并] %s: 所有请求都已离开，取消计算", self.name)
+                    # 之后到达的相同请求重新计算，不再合并到已取消的计算上
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+                    flight.on_abandon()
+                self._settle(flight)
+
+    def _finished(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        self._settle(flight)
+
+    def _settle(self, flight: _Flight):
+        """计算已结束且没有请求会再取结果时，清理无人接管的结果"""
+        if flight.settled or flight.waiters > 0 or not flight.task.done():
+            return
+        flight.settled = True
+        if flight.task.cancelled() or flight.task.exception() is not None:
+            return
+        if self.release is not None and self.copy is not None:
+            self.release(flight.task.result())
+
+    def status(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+        }
@@ -15,10 +15,16 @@ const scripts = [
 
 // 动态加载脚本
 function loadScripts(scripts, callback) {
+    // 构建后的 app.js（build_static.py）已包含全部模块
+    if (window.ASSET_BUNDLED) {
+        callback();
+        return;
+    }
     let loaded = 0;
     scripts.forEach(src => {
         const script = document.createElement('script');
-        script.src = src;
+        // 使用页面注入的带指纹 URL（可被浏览器长期缓存）
+        script.src = (window.ASSET_URLS && window.ASSET_URLS[src]) || src;
         script.onload = () => {
             loaded++;
             if (loaded === scripts.length && callback) {
@@ -36,6 +42,32 @@ function loadScripts(scripts, callback) {
     });
 }
 
+// 页面导航提示：服务端在后台预加载该页面接下来最可能用到的模型（失败不影响页面）
+function sendPrefetchHint(path) {
+    const page = path === '/' ? 'tts' : path.replace(/^\//, '');
+    const hint = { page };
+    const liteCheckbox = document.getElementById('tts-lite');
+    if (page === 'speakers') {
+        // 音色试听使用 Lite 模型
+        hint.use_lite = true;
+    } else if (liteCheckbox) {
+        hint.use_lite = liteCheckbox.checked;
+    }
+    fetch('/api/prefetch', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(hint)
+    }).catch(() => {});
+}
+
+function setupPrefetchHint(path) {
+    sendPrefetchHint(path);
+    const liteCheckbox = document.getElementById('tts-lite');
+    if (liteCheckbox) {
+        liteCheckbox.addEventListener('change', () => sendPrefetchHint(path));
+    }
+}
+
 // 页面初始化
 loadScripts(scripts, () => {
     document.addEventListener('DOMContentLoaded', function() {
@@ -54,6 +86,7 @@ loadScripts(scripts, () => {
         } else if (path === '/history') {
             loadHistoryPage();
         }
+        setupPrefetchHint(path);
     });
 
     // 如果 DOM 已经加载完成，直接执行
@@ -75,5 +108,6 @@ loadScripts(scripts, () => {
         } else if (path === '/history') {
             loadHistoryPage();
         }
+        setupPrefetchHint(path);
     }
 });
@@ -31,6 +31,7 @@ async function loadHistoryPage() {
                         <p class="history-text">${escapeHtml(item.text)}</p>
                         <div class="history-meta">
                             ${item.speaker ? `<span><i class="fas fa-user" style="margin-right: 4px;"></i>${item.speaker}</span>` : ''}
+                            ${item.model_type ? `<span><i class="fas fa-microchip" style="margin-right: 4px;"></i>${item.model_type === 'lite' ? 'Lite' : 'Pro'}</span>` : ''}
                             <span><i class="fas fa-clock" style="margin-right: 4px;"></i>${formatDate(item.created_at)}</span>
                             ${item.type === 'stt' ? '<span><i class="fas fa-microphone" style="margin-right: 4px;"></i>语音转文字</span>' : ''}
                         </div>
@@ -305,6 +305,19 @@ function setupTTSListeners() {
             }
         });
     }
+
+    // 快速变速模式下切换语速时立即重新生成（服务端只做变速或直接取缓存，不再推理）
+    const speedSelect = document.getElementById('tts-speed');
+    if (speedSelect) {
+        speedSelect.addEventListener('change', () => {
+            const fastSpeed = document.getElementById('tts-fast-speed');
+            const resultDiv = document.getElementById('tts-result');
+            if (fastSpeed && fastSpeed.checked && currentSpeakerType !== 'cloned'
+                && resultDiv && !resultDiv.classList.contains('hidden')) {
+                generateTTS();
+            }
+        });
+    }
 }
 
 async function generateTTS() {
@@ -332,6 +345,7 @@ async function generateTTS() {
         const emotion = document.getElementById('tts-emotion').value;
         const speed = parseFloat(document.getElementById('tts-speed').value);
         const useLite = document.getElementById('tts-lite').checked;
+        const fastSpeed = document.getElementById('tts-fast-speed').checked;
         
         let response;
         
@@ -355,7 +369,8 @@ async function generateTTS() {
                     speaker: currentSpeaker,
                     emotion,
                     speed,
-                    use_lite: useLite
+                    use_lite: useLite,
+                    fast_speed: fastSpeed
                 })
             });
         }
@@ -401,6 +416,7 @@ async function previewSpeaker() {
         const emotion = document.getElementById('tts-emotion').value;
         const speed = parseFloat(document.getElementById('tts-speed').value);
         const useLite = document.getElementById('tts-lite').checked;
+        const fastSpeed = document.getElementById('tts-fast-speed').checked;
         
         let response;
         
@@ -427,7 +443,8 @@ async function previewSpeaker() {
                     speaker: currentSpeaker,
                     emotion,
                     speed,
-                    use_lite: useLite
+                    use_lite: useLite,
+                    fast_speed: fastSpeed
                 })
             });
         }
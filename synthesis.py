@@ -0,0 +1,351 @@
+"""
+语音合成公共流程（各 TTS 接口共用，统一采集耗时指标）
+"""
+import os
+import re
+import json
+import time
+import shutil
+import asyncio
+import threading
+from typing import List, Optional, Tuple
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from config import VOICES_DIR, MODEL_VERBOSE, SYNTHESIS_TIMEOUT, SYNTHESIS_SEGMENT_CHARS, SYNTHESIS_UNIT_MIN_CHARS
+from models import load_model_cached
+from nodes import node_pool
+from admission import admission
+from singleflight import SingleFlight
+from sentence_cache import sentence_cache
+from timestretch import stretch_wav, MIN_RATE, MAX_RATE
+from cancellation import CancelToken, use_token, check_cancelled, until_disconnected
+from utils import get_temp_path, get_wav_duration, cleanup_temp_files, stitch_wav_files
+from metrics import (SYNTHESIS_SECONDS, REAL_TIME_FACTOR, SENTENCE_UNITS, LANGUAGE_RUNS, current_endpoint,
+                     observe_queue_wait)
+from tracing import span
+
+
+def get_cloned_voice_reference(voice_name: str) -> Tuple[str, str]:
+    """获取克隆音色的参考音频与参考文本
+
+    Returns:
+        (参考音频路径, 参考文本)；没有文本文件时参考文本为 "."
+    """
+    ref_audio = os.path.join(VOICES_DIR, f"{voice_name}.wav")
+    ref_txt = os.path.join(VOICES_DIR, f"{voice_name}.txt")
+
+    if not os.path.exists(ref_audio):
+        raise HTTPException(status_code=404, detail=f"音色未找到: {voice_name}")
+
+    ref_text = "."
+    if os.path.exists(ref_txt):
+        with open(ref_txt, 'r', encoding='utf-8') as f:
+            ref_text = f.read().strip()
+    return ref_audio, ref_text
+
+
+# 分段位置：句末标点之后（英文句号需后接空白）
+_SEGMENT_BOUNDARY = re.compile(r"(?<=[。！？!?；;…\n])|(?<=\.)(?=\s)")
+# 分段合成统计（段数、命中缓存数、重新合成数），与音频一起保存在临时目录中
+UNIT_STATS_FILE = "units.json"
+
+
+def split_text_segments(text: str, max_chars: int = SYNTHESIS_SEGMENT_CHARS,
+                        min_chars: int = SYNTHESIS_UNIT_MIN_CHARS) -> List[str]:
+    """把超过 max_chars 字的长文本按句切成段；不需要分段时返回 [text]
+
+    每句一段，不足 min_chars 字的短句并入下一句。分段只取决于每句本身，修改一句不会改变其他句子的分段，
+    未改动的段可以从分段缓存中取回（sentence_cache.py）。
+    """
+    if max_chars <= 0 or len(text) <= max_chars:
+        return [text]
+    segments = []
+    current = ""
+    for sentence in _SEGMENT_BOUNDARY.split(text):
+        current += sentence
+        if len(sentence.strip()) >= min_chars:
+            segments.append(current)
+            current = ""
+    segments.append(current)
+    segments = [segment.strip() for segment in segments if segment.strip()]
+    return segments or [text]
+
+
+def read_unit_stats(temp_dir: str) -> Optional[dict]:
+    """读取 synthesize_to_temp 保存的分段合成统计：total / reused / rendered"""
+    try:
+        with open(os.path.join(temp_dir, UNIT_STATS_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_unit_stats(temp_dir: str, stats: dict):
+    with open(os.path.join(temp_dir, UNIT_STATS_FILE), "w", encoding="utf-8") as f:
+        json.dump(stats, f)
+
+
+def _generate(mode: str, use_lite: bool, model, text: str, output_dir: str, generate_kwargs: dict):
+    """合成一段文本到 output_dir/audio_000.wav"""
+    if node_pool.enabled:
+        node_pool.synthesize(mode, use_lite, text, output_dir, generate_kwargs)
+    else:
+        from mlx_audio.tts.generate import generate_audio
+        generate_audio(
+            model=model,
+            text=text,
+            output_path=output_dir,
+            **generate_kwargs
+        )
+
+
+def synthesize_to_temp(mode: str, use_lite: bool, text: str, prefix: str = "temp_synth",
+                       temp_dir: Optional[str] = None, language_runs: Optional[List[dict]] = None,
+                       **generate_kwargs) -> str:
+    """在 tmp 目录下合成一段音频
+
+    Args:
+        mode: 模型类型 (custom / design / clone)
+        use_lite: 是否使用 Lite 模型
+        text: 要合成的文本
+        prefix: 临时目录前缀
+        temp_dir: 复用已有的临时目录（批量合成时避免每条都新建目录）
+        language_runs: 混合语言文本的语言段（langseg.plan_language_runs），各段以自己的 lang_code / voice 合成
+        **generate_kwargs: 透传给 generate_audio 的参数（voice、instruct、speed、lang_code、ref_audio 等）
+
+    配置了远程推理节点时由节点合成，输出位置不变。长文本按句分段，未改动的段从分段缓存中取回，
+    其余各段依次合成后拼接；每段开始前检查请求是否已被取消（check_cancelled）。
+    指定 language_runs 时，各语言段再按句分段，所有段依次合成后按原文顺序拼接（本地模型不支持并发推理）。
+    段数与命中缓存数保存在临时目录的 units.json 中（read_unit_stats）。
+
+    Returns:
+        临时目录路径，生成的音频位于其中的 audio_000.wav；调用方负责清理
+
+    Raises:
+        RequestCancelled: 请求已被取消或超过耗时上限
+    """
+    variant = "lite" if use_lite else "pro"
+    observe_queue_wait(mode, variant)
+    check_cancelled()
+    generate_kwargs.setdefault("verbose", MODEL_VERBOSE)
+    model = None
+    model_lock = threading.Lock()
+
+    def get_model():
+        nonlocal model
+        with model_lock:
+            if model is None and not node_pool.enabled:
+                with span("model_load"):
+                    model = load_model_cached(mode, use_lite)
+        return model
+
+    # 合成单元：(文本, 合成参数)
+    if language_runs:
+        units = [(segment, {**generate_kwargs, **{k: v for k, v in run.items() if k != "text"}})
+                 for run in language_runs for segment in split_text_segments(run["text"])]
+    else:
+        units = [(segment, generate_kwargs) for segment in split_text_segments(text)]
+    if len(units) == 1:
+        # 所有段都命中缓存时不需要加载模型，因此只在单段合成时预先加载
+        get_model()
+
+    created = temp_dir is None
+    if created:
+        temp_dir = get_temp_path(prefix)
+    os.makedirs(temp_dir, exist_ok=True)
+    stats = {"total": len(units), "reused": 0, "rendered": 0}
+    if language_runs:
+        stats["languages"] = [run["lang_code"] for run in language_runs]
+    start = time.perf_counter()
+
+    try:
+        with span("synthesis"):
+            if len(units) == 1:
+                check_cancelled()
+                _generate(mode, use_lite, model, units[0][0], temp_dir, units[0][1])
+                stats["rendered"] = 1
+            else:
+                for i, (segment, kwargs) in enumerate(units):
+                    check_cancelled()
+                    segment_dir = os.path.join(temp_dir, f"segment_{i:03d}")
+                    segment_file = os.path.join(segment_dir, "audio_000.wav")
+                    key = sentence_cache.key(mode, variant, segment, units[i - 1][0] if i > 0 else "",
+                                             units[i + 1][0] if i + 1 < len(units) else "", kwargs)
+                    if sentence_cache.fetch(key, segment_file):
+                        stats["reused"] += 1
+                    else:
+                        _generate(mode, use_lite, get_model(), segment, segment_dir, kwargs)
+                        sentence_cache.store(key, segment_file)
+                        stats["rendered"] += 1
+                segment_files = [os.path.join(temp_dir, f"segment_{i:03d}", "audio_000.wav") for i in range(len(units))]
+                stitch_wav_files(segment_files, os.path.join(temp_dir, "audio_000.wav"), markers=False)
+                cleanup_temp_files(*(os.path.dirname(path) for path in segment_files))
+                SENTENCE_UNITS.inc(stats["reused"], result="reused")
+                SENTENCE_UNITS.inc(stats["rendered"], result="rendered")
+            for run in language_runs or []:
+                LANGUAGE_RUNS.inc(language=run["lang_code"])
+        _write_unit_stats(temp_dir, stats)
+    except BaseException:
+        if created:
+            cleanup_temp_files(temp_dir)
+        raise
+    elapsed = time.perf_counter() - start
+
+    labels = {"endpoint": current_endpoint(), "model": mode, "variant": variant}
+    SYNTHESIS_SECONDS.observe(elapsed, **labels)
+    audio_seconds = get_wav_duration(os.path.join(temp_dir, "audio_000.wav"))
+    if audio_seconds > 0 and elapsed > 0:
+        REAL_TIME_FACTOR.observe(audio_seconds / elapsed, **labels)
+    return temp_dir
+
+
+def synthesis_key(mode: str, use_lite: bool, text: str, preview: bool, generate_kwargs: dict) -> str:
+    """合并相同合成请求用的键：文本去掉首尾空白并合并连续空白，浮点参数统一精度"""
+    params = {k: round(v, 3) if isinstance(v, float) else v
+              for k, v in generate_kwargs.items() if k != "verbose"}
+    return json.dumps([mode, bool(use_lite), bool(preview), " ".join(text.split()), params],
+                      sort_keys=True, ensure_ascii=False)
+
+
+def _link_or_copy(source: str, dest: str):
+    """硬链接文件（跨文件系统时复制）"""
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copy2(source, dest)
+
+
+def copy_synthesis_result(temp_dir: str) -> str:
+    """为合并进来的请求复制一份合成结果
+
+    在事件循环中同步执行（SingleFlight 依赖复制不与其他请求交错），因此以硬链接代替复制文件内容，
+    耗时与音频大小无关。结果文件之后只会被移动或以新文件替换，不会原地修改，共享 inode 是安全的。
+    """
+    copy_dir = get_temp_path("temp_synth_copy")
+    shutil.copytree(temp_dir, copy_dir, copy_function=_link_or_copy)
+    return copy_dir
+
+
+synthesis_flights = SingleFlight("synthesis", copy=copy_synthesis_result, release=cleanup_temp_files)
+
+
+def _stitch_language_runs(run_dirs: List[str], prefix: str, language_runs: List[dict]) -> str:
+    """按原文顺序拼接各语言段的合成结果，合并各段的统计"""
+    temp_dir = get_temp_path(prefix)
+    os.makedirs(temp_dir, exist_ok=True)
+    try:
+        stitch_wav_files([os.path.join(d, "audio_000.wav") for d in run_dirs],
+                         os.path.join(temp_dir, "audio_000.wav"), markers=False)
+        stats = {"total": 0, "reused": 0, "rendered": 0}
+        for run_dir in run_dirs:
+            run_stats = read_unit_stats(run_dir) or {}
+            for key in stats:
+                stats[key] += run_stats.get(key, 0)
+        stats["languages"] = [run["lang_code"] for run in language_runs]
+        _write_unit_stats(temp_dir, stats)
+    except BaseException:
+        cleanup_temp_files(temp_dir)
+        raise
+    return temp_dir
+
+
+async def _synthesize_runs_on_nodes(request: Request, mode: str, use_lite: bool, prefix: str, preview: bool,
+                                    language_runs: List[dict], generate_kwargs: dict) -> str:
+    """各语言段分别排队取得准入名额，同时分发到远程推理节点合成，再按原文顺序拼接
+
+    同时合成的段数因此受 TTS 队列的 max_in_flight（默认等于节点数）限制，与其他请求一起排队。
+    """
+    async def render_run(run: dict) -> str:
+        async with admission.admit(request, "tts", preview=preview, check_rate=False):
+            return await run_in_threadpool(synthesize_to_temp, mode, use_lite, run["text"], prefix=prefix,
+                                           language_runs=[run], **generate_kwargs)
+
+    tasks = [asyncio.ensure_future(render_run(run)) for run in language_runs]
+    try:
+        run_dirs = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+            if task.done() and not task.cancelled() and task.exception() is None:
+                cleanup_temp_files(task.result())
+        raise
+    try:
+        return await run_in_threadpool(_stitch_language_runs, run_dirs, prefix, language_runs)
+    finally:
+        cleanup_temp_files(*run_dirs)
+
+
+async def synthesize_shared(request: Request, mode: str, use_lite: bool, text: str, prefix: str = "temp_synth",
+                            preview: bool = False, language_runs: Optional[List[dict]] = None,
+                            **generate_kwargs) -> str:
+    """限流、排队后在线程池中合成；参数相同的并发请求只合成一次，每个请求各得到一份临时目录
+
+    language_runs 为混合语言文本的语言段（见 synthesize_to_temp）。本地模型上各段占用同一个准入名额依次合成；
+    配置了远程推理节点时各段分别取得准入名额，同时分发到不同节点。
+
+    客户端断开时不再等待结果；合并在一起的请求全部断开或超过耗时上限时，合成在当前文本段结束后中止。
+
+    Raises:
+        HTTPException: 429（超出速率）或 503（队列已满）
+        RequestCancelled: 499（客户端已断开）或 504（超过耗时上限）
+    """
+    admission.check_rate(request)
+    token = CancelToken(SYNTHESIS_TIMEOUT)
+
+    async def compute() -> str:
+        with use_token(token):
+            if node_pool.enabled and language_runs and len(language_runs) > 1:
+                return await _synthesize_runs_on_nodes(request, mode, use_lite, prefix, preview, language_runs,
+                                                       generate_kwargs)
+            async with admission.admit(request, "tts", preview=preview, check_rate=False):
+                return await run_in_threadpool(synthesize_to_temp, mode, use_lite, text, prefix=prefix,
+                                               language_runs=language_runs, **generate_kwargs)
+
+    key = synthesis_key(mode, use_lite, text, preview, {**generate_kwargs, "language_runs": language_runs})
+    return await until_disconnected(request, synthesis_flights.do(key, compute, on_abandon=token.cancel))
+
+
+async def synthesize_fast_speed(request: Request, mode: str, use_lite: bool, text: str, speed: float,
+                                prefix: str = "temp_synth", preview: bool = False,
+                                language_runs: Optional[List[dict]] = None, **generate_kwargs) -> str:
+    """快速变速：以 1.0x 合成一次，其他语速由 1.0x 的结果保持音高地变速得到（timestretch.py）
+
+    1.0x 的结果与各语速的变速结果都存入分段缓存，同一文本切换语速时不再推理，只需变速或直接取缓存。
+    generate_kwargs 中不应包含 speed。
+
+    Raises:
+        HTTPException: speed 超出可变速的范围（400），以及 synthesize_shared 的各种错误
+    """
+    if not MIN_RATE <= speed <= MAX_RATE:
+        raise HTTPException(status_code=400, detail=f"快速变速的语速应在 {MIN_RATE} 到 {MAX_RATE} 之间")
+    admission.check_rate(request)
+    variant = "lite" if use_lite else "pro"
+    base_kwargs = {**generate_kwargs, "speed": 1.0}
+    key_kwargs = {**base_kwargs, "language_runs": language_runs} if language_runs else base_kwargs
+    base_key = sentence_cache.key(mode, variant, text, "", "", key_kwargs)
+    stretched_key = sentence_cache.key(mode, variant, text, "", "", {**key_kwargs, "time_stretch": round(speed, 3)})
+
+    # 分段缓存的取回与存入会复制音频文件，首次使用时还要扫描缓存目录，都放在线程池中执行
+    temp_dir = get_temp_path(prefix)
+    output = os.path.join(temp_dir, "audio_000.wav")
+    reused = {"total": 1, "reused": 1, "rendered": 0}
+    try:
+        if speed != 1.0 and await run_in_threadpool(sentence_cache.fetch, stretched_key, output):
+            await run_in_threadpool(_write_unit_stats, temp_dir, reused)
+            return temp_dir
+        if await run_in_threadpool(sentence_cache.fetch, base_key, output):
+            await run_in_threadpool(_write_unit_stats, temp_dir, reused)
+        else:
+            cleanup_temp_files(temp_dir)
+            temp_dir = await synthesize_shared(request, mode, use_lite, text, prefix=prefix, preview=preview,
+                                               language_runs=language_runs, **base_kwargs)
+            output = os.path.join(temp_dir, "audio_000.wav")
+            await run_in_threadpool(sentence_cache.store, base_key, output)
+        if speed != 1.0:
+            with span("time_stretch"):
+                await run_in_threadpool(stretch_wav, output, output, speed)
+            await run_in_threadpool(sentence_cache.store, stretched_key, output)
+    except BaseException:
+        cleanup_temp_files(temp_dir)
+        raise
+    return temp_dir
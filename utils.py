@@ -7,10 +7,19 @@ import wave
 import subprocess
 import time
 import re
+import struct
+import uuid
+import threading
+import logging
 from datetime import datetime
 from typing import Optional, List
 from config import BASE_DIR, BASE_OUTPUT_DIR, STT_OUTPUT_DIR, MODELS_DIR, SAMPLE_RATE, FILENAME_MAX_LEN, TMP_DIR
-from typing import Optional
+from metrics import FFMPEG_SECONDS
+from langseg import detect_language, LANGUAGE_NAMES
+from tracing import span
+from logs import get_logger
+
+logger = get_logger(__name__)
 
 
 def get_smart_path(folder_name: str) -> Optional[str]:
@@ -39,7 +48,8 @@ def get_temp_path(prefix: str = "temp", suffix: str = "") -> str:
         临时文件或目录的完整路径
     """
     os.makedirs(TMP_DIR, exist_ok=True)
-    timestamp = int(time.time())
+    # 时间戳之外附加随机串，避免同一秒内的并发请求拿到相同路径
+    timestamp = f"{int(time.time())}_{uuid.uuid4().hex[:8]}"
     if suffix:
         # 返回文件路径
         return os.path.join(TMP_DIR, f"{prefix}_{timestamp}_{suffix}")
@@ -49,6 +59,9 @@ def get_temp_path(prefix: str = "temp", suffix: str = "") -> str:
 
 def detect_language_from_text(text: str) -> str:
     """从文本内容检测语言
+
+    含汉字为中文，否则含假名为日语，否则含谚文为韩语；整段文本只扫描一遍（langseg.detect_language）。
+    混合语言文本按语言分段合成见 langseg.plan_language_runs。
     
     Args:
         text: 要检测的文本
@@ -56,21 +69,7 @@ def detect_language_from_text(text: str) -> str:
     Returns:
         语言代码: 'zh' (中文), 'ja' (日语), 'ko' (韩语), 'en' (英语)
     """
-    if not text:
-        return 'en'
-    
-    # 检测中文字符
-    if any('\u4e00' <= c <= '\u9fff' for c in text):
-        return 'zh'
-    # 检测日文字符
-    elif any('\u3040' <= c <= '\u309f' or '\u30a0' <= c <= '\u30ff' for c in text):
-        return 'ja'
-    # 检测韩文字符
-    elif any('\uac00' <= c <= '\ud7af' for c in text):
-        return 'ko'
-    # 默认为英语
-    else:
-        return 'en'
+    return detect_language(text)
 
 
 def language_name_to_code(language_name: str) -> str:
@@ -129,12 +128,7 @@ def get_speaker_language_code(speaker_name: str, text: str = "") -> str:
         if len(languages) > 1 and text:
             text_lang_code = detect_language_from_text(text)
             # 检查检测到的语言是否在音色支持的语言列表中
-            text_lang_name = {
-                "zh": "Chinese",
-                "ja": "Japanese",
-                "ko": "Korean",
-                "en": "English"
-            }.get(text_lang_code, "English")
+            text_lang_name = LANGUAGE_NAMES.get(text_lang_code, "English")
             
             if text_lang_name in languages:
                 return text_lang_code
@@ -164,7 +158,7 @@ def cleanup_temp_files(*paths):
                 else:
                     os.remove(path)
             except Exception as e:
-                print(f"[清理临时文件] 警告: 无法删除 {path}: {e}")
+                logger.warning("[清理临时文件] 无法删除 %s: %s", path, e)
 
 
 def cleanup_stt_temp_files(temp_output_dir: str):
@@ -189,7 +183,7 @@ def cleanup_stt_temp_files(temp_output_dir: str):
             if filename.startswith(base_name) and os.path.isfile(os.path.join(current_dir, filename)):
                 cleanup_temp_files(os.path.join(current_dir, filename))
     except Exception as e:
-        print(f"[清理STT临时文件] 警告: 无法列出目录: {e}")
+        logger.warning("[清理STT临时文件] 无法列出目录: %s", e)
 
 
 def is_video_file(file_path: str) -> bool:
@@ -227,10 +221,11 @@ def extract_audio_from_video(video_path: str, output_wav_path: str) -> bool:
     ]
     
     try:
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        with FFMPEG_SECONDS.time(operation="extract"):
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
         return os.path.exists(output_wav_path) and os.path.getsize(output_wav_path) > 0
     except (subprocess.CalledProcessError, FileNotFoundError) as e:
-        print(f"[提取音频] 错误: {e}")
+        logger.error("[提取音频] 错误: %s", e)
         return False
 
 
@@ -247,7 +242,7 @@ def convert_audio_if_needed(input_path: str) -> Optional[str]:
     
     # 检查是否为视频文件
     if is_video_file(input_path):
-        print(f"[转换] 检测到视频文件，提取音频: {filename}")
+        logger.debug("[转换] 检测到视频文件，提取音频: %s", filename)
         if extract_audio_from_video(input_path, temp_wav):
             return temp_wav
         else:
@@ -268,15 +263,36 @@ def convert_audio_if_needed(input_path: str) -> Optional[str]:
            "-ar", str(SAMPLE_RATE), "-ac", "1", "-c:a", "pcm_s16le", temp_wav]
 
     try:
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        with FFMPEG_SECONDS.time(operation="convert"):
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
         return temp_wav
     except (subprocess.CalledProcessError, FileNotFoundError):
         cleanup_temp_files(temp_wav)
         return None
 
 
-def save_audio_file(temp_folder: str, subfolder: str, text_snippet: str) -> str:
-    """保存生成的音频文件"""
+def unique_stem(directory: str, stem: str, extensions: List[str]) -> str:
+    """返回 directory 下不与已有文件重名的文件名主干：同名文件存在时依次追加 _2、_3……
+
+    同一秒内保存相同文本（如合并后的并发请求）时避免互相覆盖。
+    """
+    candidate, index = stem, 1
+    while any(os.path.exists(os.path.join(directory, candidate + ext)) for ext in extensions):
+        index += 1
+        candidate = f"{stem}_{index}"
+    return candidate
+
+
+_save_name_lock = threading.Lock()
+
+
+def save_audio_file(temp_folder: str, subfolder: str, text_snippet: str, postprocess=None) -> str:
+    """保存生成的音频文件
+
+    Args:
+        postprocess: 后处理选项（postprocess.PostProcessOptions），None 或未启用时按原样保存；
+            启用时包含读写与 numpy 运算，异步接口应通过 run_in_threadpool 调用
+    """
     save_path = os.path.join(BASE_OUTPUT_DIR, subfolder)
     os.makedirs(save_path, exist_ok=True)
 
@@ -284,22 +300,22 @@ def save_audio_file(temp_folder: str, subfolder: str, text_snippet: str) -> str:
     # 清理文本：移除换行符、特殊字符，只保留字母数字和中文
     clean_text = text_snippet.replace('\n', ' ').replace('\r', ' ')
     clean_text = re.sub(r'[^\w\s\u4e00-\u9fff-]', '', clean_text)[:FILENAME_MAX_LEN].strip().replace(' ', '_') or "audio"
-    filename = f"{timestamp}_{clean_text}.wav"
-    final_path = os.path.join(save_path, filename)
+    # 在线程池中并发保存时，选定文件名后立即创建占位文件，避免两个请求选中同一个文件名
+    with _save_name_lock:
+        filename = unique_stem(save_path, f"{timestamp}_{clean_text}", [".wav"]) + ".wav"
+        final_path = os.path.join(save_path, filename)
+        open(final_path, "xb").close()
 
     source_file = os.path.join(temp_folder, "audio_000.wav")
 
-    print(f"[save_audio_file] 临时目录: {temp_folder}")
-    print(f"[save_audio_file] 源文件: {source_file}")
-    print(f"[save_audio_file] 源文件存在: {os.path.exists(source_file)}")
-
     # 如果直接路径不存在，尝试查找tmp目录下的文件
     if not os.path.exists(source_file):
-        # 列出临时目录内容
-        if os.path.exists(temp_folder):
-            print(f"[save_audio_file] 临时目录内容: {os.listdir(temp_folder)}")
-        else:
-            print(f"[save_audio_file] 临时目录不存在!")
+        # 列出临时目录内容（只在调试级别下执行 listdir）
+        if logger.isEnabledFor(logging.DEBUG):
+            if os.path.exists(temp_folder):
+                logger.debug("[save_audio_file] 临时目录内容: %s", os.listdir(temp_folder))
+            else:
+                logger.debug("[save_audio_file] 临时目录不存在: %s", temp_folder)
 
         # 尝试在tmp目录下查找匹配的音频文件
         import glob
@@ -307,13 +323,24 @@ def save_audio_file(temp_folder: str, subfolder: str, text_snippet: str) -> str:
         if possible_files:
             # 使用最新的文件
             source_file = max(possible_files, key=os.path.getmtime)
-            print(f"[save_audio_file] 找到替代源文件: {source_file}")
+            logger.warning("[save_audio_file] %s 中没有音频，使用替代源文件: %s", temp_folder, source_file)
 
     if os.path.exists(source_file):
-        shutil.move(source_file, final_path)
-        print(f"[save_audio_file] 文件已移动到: {final_path}")
+        processed = False
+        if postprocess is not None and postprocess.enabled:
+            from postprocess import process_wav
+            try:
+                process_wav(source_file, final_path, postprocess)
+                processed = True
+            except Exception as e:
+                logger.warning("[save_audio_file] 音频后处理失败，按原样保存: %s", e)
+        if not processed:
+            with span("save_audio"):
+                shutil.move(source_file, final_path)
+            logger.debug("[save_audio_file] 文件已移动到: %s", final_path)
     else:
-        print(f"[save_audio_file] 错误: 源文件不存在!")
+        logger.error("[save_audio_file] 源文件不存在: %s", source_file)
+        cleanup_temp_files(final_path)
 
     cleanup_temp_files(temp_folder)
 
@@ -321,6 +348,97 @@ def save_audio_file(temp_folder: str, subfolder: str, text_snippet: str) -> str:
     return relative_path
 
 
+def get_wav_duration(wav_path: str) -> float:
+    """获取 WAV 文件时长（秒），读取失败时返回 0"""
+    try:
+        with wave.open(wav_path, 'rb') as f:
+            return f.getnframes() / float(f.getframerate() or 1)
+    except (wave.Error, OSError, EOFError):
+        return 0.0
+
+
+def stitch_wav_files(source_files: List[str], output_path: str, labels: Optional[List[str]] = None,
+                     gap_seconds: float = 0.0, markers: bool = True) -> List[dict]:
+    """按顺序拼接多个 WAV 文件，并写入章节标记（cue + LIST/adtl 标签块）
+
+    Args:
+        source_files: 待拼接的 WAV 文件（采样率、声道数、位深需一致）
+        output_path: 输出文件路径
+        labels: 每段对应的章节标题，默认 "Part N"
+        gap_seconds: 段与段之间插入的静音时长
+        markers: 是否写入章节标记
+
+    Returns:
+        章节列表，每项包含 index、title、start、end（秒）
+    """
+    if not source_files:
+        raise ValueError("没有可拼接的音频文件")
+
+    chapters = []
+    cue_offsets = []
+    params = None
+    with wave.open(output_path, 'wb') as out:
+        frame_pos = 0
+        for i, path in enumerate(source_files):
+            with wave.open(path, 'rb') as src:
+                if params is None:
+                    params = src.getparams()
+                    out.setnchannels(params.nchannels)
+                    out.setsampwidth(params.sampwidth)
+                    out.setframerate(params.framerate)
+                elif (src.getnchannels(), src.getsampwidth(), src.getframerate()) != \
+                        (params.nchannels, params.sampwidth, params.framerate):
+                    raise ValueError(f"音频格式不一致，无法拼接: {path}")
+                frames = src.readframes(src.getnframes())
+                nframes = src.getnframes()
+
+            if i > 0 and gap_seconds > 0:
+                gap_frames = int(gap_seconds * params.framerate)
+                out.writeframes(b"\x00" * gap_frames * params.nchannels * params.sampwidth)
+                frame_pos += gap_frames
+
+            out.writeframes(frames)
+            title = labels[i] if labels and i < len(labels) else f"Part {i + 1}"
+            cue_offsets.append(frame_pos)
+            chapters.append({
+                "index": i + 1,
+                "title": title,
+                "start": round(frame_pos / params.framerate, 3),
+                "end": round((frame_pos + nframes) / params.framerate, 3)
+            })
+            frame_pos += nframes
+
+    if markers:
+        _append_wav_cue_chunks(output_path, cue_offsets, [c["title"] for c in chapters])
+    return chapters
+
+
+def _append_wav_cue_chunks(wav_path: str, offsets: List[int], titles: List[str]):
+    """在 WAV 文件末尾追加 cue 与 LIST/adtl 块，并修正 RIFF 头中的长度"""
+    cue = struct.pack('<I', len(offsets))
+    for cue_id, offset in enumerate(offsets, 1):
+        cue += struct.pack('<II4sIII', cue_id, offset, b'data', 0, 0, offset)
+    chunks = b'cue ' + struct.pack('<I', len(cue)) + cue
+
+    adtl = b'adtl'
+    for cue_id, title in enumerate(titles, 1):
+        text = title.encode('utf-8') + b'\x00'
+        labl = struct.pack('<I', cue_id) + text
+        adtl += b'labl' + struct.pack('<I', len(labl)) + labl
+        if len(labl) % 2:
+            adtl += b'\x00'
+    chunks += b'LIST' + struct.pack('<I', len(adtl)) + adtl
+
+    with open(wav_path, 'r+b') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() % 2:
+            f.write(b'\x00')
+        f.write(chunks)
+        riff_size = f.tell() - 8
+        f.seek(4)
+        f.write(struct.pack('<I', riff_size))
+
+
 def format_timestamp(seconds: float) -> str:
     """将秒数转换为 SRT 时间戳格式 (HH:MM:SS,mmm)"""
     hours = int(seconds // 3600)
@@ -337,15 +455,17 @@ def save_stt_results(text: str, segments: List[dict], audio_filename: str, audio
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     base_name = os.path.splitext(os.path.basename(audio_filename))[0]
     base_name = re.sub(r'[^\w\s-]', '', base_name)[:FILENAME_MAX_LEN].strip().replace(' ', '_') or "audio"
+    audio_ext = (os.path.splitext(audio_path)[1] or ".wav") if audio_path else ".wav"
+    stem = unique_stem(STT_OUTPUT_DIR, f"{timestamp}_{base_name}", [".txt", ".srt", audio_ext])
     
     # 保存 TXT 文件（纯文本，无时间戳）
-    txt_filename = f"{timestamp}_{base_name}.txt"
+    txt_filename = f"{stem}.txt"
     txt_path = os.path.join(STT_OUTPUT_DIR, txt_filename)
     with open(txt_path, 'w', encoding='utf-8') as f:
         f.write(text)
     
     # 保存 SRT 文件（带时间戳）
-    srt_filename = f"{timestamp}_{base_name}.srt"
+    srt_filename = f"{stem}.srt"
     srt_path = os.path.join(STT_OUTPUT_DIR, srt_filename)
     with open(srt_path, 'w', encoding='utf-8') as f:
         for i, segment in enumerate(segments, 1):
@@ -364,9 +484,7 @@ def save_stt_results(text: str, segments: List[dict], audio_filename: str, audio
     # 保存原始音频文件（如果提供了音频路径）
     audio_output_path = None
     if audio_path and os.path.exists(audio_path):
-        # 获取原始音频文件的扩展名
-        audio_ext = os.path.splitext(audio_path)[1] or ".wav"
-        audio_filename_output = f"{timestamp}_{base_name}{audio_ext}"
+        audio_filename_output = f"{stem}{audio_ext}"
         audio_output_path = os.path.join(STT_OUTPUT_DIR, audio_filename_output)
         # 复制音频文件到输出目录
         shutil.copy2(audio_path, audio_output_path)
@@ -0,0 +1,171 @@
+"""
+safetensors 权重的内存映射
+
+模型目录下的 safetensors 分片以只读方式 mmap：
+- 文件页由操作系统页缓存持有，多个工作进程（cluster.py）映射同一文件时共享同一份物理内存；
+  模型被内存回收卸载后再次加载时直接命中页缓存，不再读盘
+- load_tensors() 返回指向映射区的 numpy 视图，不复制数据，只有真正访问到的页才占用内存
+- prefetch() 通过 madvise(MADV_WILLNEED) 让内核在后台预读整个分片，加载模型前调用，
+  读盘与模型构建并行进行
+
+MLX 加载 safetensors 时会把数据复制到自己的缓冲区，因此对 mlx_audio 模型共享的是页缓存
+（加载时从内存而不是磁盘读取），而不是加载后的模型参数。
+"""
+import os
+import json
+import mmap
+import glob
+import struct
+import threading
+from typing import Dict, List, Tuple
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+INDEX_FILE = "model.safetensors.index.json"
+# safetensors 数据类型 → numpy dtype（BF16 没有对应的 numpy 类型，按 uint16 原样返回）
+DTYPES = {
+    "F64": "<f8", "F32": "<f4", "F16": "<f2", "BF16": "<u2",
+    "I64": "<i8", "I32": "<i4", "I16": "<i2", "I8": "i1",
+    "U64": "<u8", "U32": "<u4", "U16": "<u2", "U8": "u1", "BOOL": "?",
+}
+
+
+class SafetensorsFile:
+    """一个以只读方式映射的 safetensors 文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            header_size = struct.unpack("<Q", f.read(8))[0]
+            header = json.loads(f.read(header_size))
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.metadata = header.pop("__metadata__", {})
+        data_start = 8 + header_size
+        # 张量名 → (dtype, shape, 起始偏移, 结束偏移)
+        self.tensors: Dict[str, Tuple[str, List[int], int, int]] = {
+            name: (info["dtype"], info["shape"],
+                   data_start + info["data_offsets"][0], data_start + info["data_offsets"][1])
+            for name, info in header.items()
+        }
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._mmap)
+
+    def array(self, name: str):
+        """返回张量的 numpy 视图（不复制，只读）"""
+        import numpy as np
+        dtype_name, shape, start, end = self.tensors[name]
+        dtype = np.dtype(DTYPES[dtype_name])
+        return np.frombuffer(self._mmap, dtype=dtype, count=(end - start) // dtype.itemsize, offset=start).reshape(shape)
+
+    def prefetch(self):
+        """请求内核预读整个文件（不阻塞）"""
+        if hasattr(mmap, "MADV_WILLNEED"):
+            self._mmap.madvise(mmap.MADV_WILLNEED)
+
+    def close(self):
+        self._mmap.close()
+
+
+def checkpoint_files(model_path: str) -> List[str]:
+    """模型目录下的 safetensors 分片（有索引文件时以索引为准）"""
+    index_path = os.path.join(model_path, INDEX_FILE)
+    if os.path.exists(index_path):
+        with open(index_path, encoding="utf-8") as f:
+            weight_map = json.load(f)["weight_map"]
+        return [os.path.join(model_path, name) for name in sorted(set(weight_map.values()))]
+    return sorted(glob.glob(os.path.join(model_path, "*.safetensors")))
+
+
+class MappedCheckpoint:
+    """一个模型目录下全部分片的映射"""
+
+    def __init__(self, model_path: str):
+        self.model_path = model_path
+        self.files = [SafetensorsFile(path) for path in checkpoint_files(model_path)]
+        self._owner: Dict[str, SafetensorsFile] = {}
+        for shard in self.files:
+            for name in shard.tensors:
+                self._owner[name] = shard
+
+    @property
+    def nbytes(self) -> int:
+        return sum(shard.nbytes for shard in self.files)
+
+    def names(self) -> List[str]:
+        return list(self._owner)
+
+    def array(self, name: str):
+        return self._owner[name].array(name)
+
+    def prefetch(self):
+        for shard in self.files:
+            shard.prefetch()
+
+    def close(self):
+        for shard in self.files:
+            shard.close()
+
+
+# 模型目录 → 映射；映射在进程内一直保留，模型卸载后再次加载时无需重新打开
+_checkpoints: Dict[str, MappedCheckpoint] = {}
+_lock = threading.Lock()
+
+
+def open_checkpoint(model_path: str) -> MappedCheckpoint:
+    """映射模型目录下的全部分片（同一目录只映射一次）"""
+    with _lock:
+        checkpoint = _checkpoints.get(model_path)
+        if checkpoint is None:
+            checkpoint = _checkpoints[model_path] = MappedCheckpoint(model_path)
+        return checkpoint
+
+
+def load_tensors(model_path: str, use_mmap: bool = True) -> Dict[str, "np.ndarray"]:
+    """读取模型目录下的全部张量
+
+    Args:
+        use_mmap: True 时返回映射区上的视图（不复制）；False 时把每个张量读入进程内存
+    """
+    if use_mmap:
+        checkpoint = open_checkpoint(model_path)
+        return {name: checkpoint.array(name) for name in checkpoint.names()}
+
+    import numpy as np
+    tensors = {}
+    for path in checkpoint_files(model_path):
+        with open(path, "rb") as f:
+            header_size = struct.unpack("<Q", f.read(8))[0]
+            header = json.loads(f.read(header_size))
+            header.pop("__metadata__", None)
+            for name, info in sorted(header.items(), key=lambda item: item[1]["data_offsets"][0]):
+                start, end = info["data_offsets"]
+                f.seek(8 + header_size + start)
+                tensors[name] = np.frombuffer(f.read(end - start), dtype=DTYPES[info["dtype"]]).reshape(info["shape"])
+    return tensors
+
+
+def prefetch(model_path: str) -> int:
+    """映射模型目录下的分片并请求内核预读，返回分片总字节数；没有 safetensors 文件或读取失败时返回 0"""
+    try:
+        checkpoint = open_checkpoint(model_path)
+        checkpoint.prefetch()
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning("[权重映射] 预读失败: %s (%s)", model_path, e)
+        return 0
+    return checkpoint.nbytes
+
+
+def status() -> dict:
+    """已映射的模型目录与大小"""
+    with _lock:
+        checkpoints = list(_checkpoints.values())
+    return {
+        "mapped": [
+            {"path": checkpoint.model_path, "files": len(checkpoint.files),
+             "mb": round(checkpoint.nbytes / 1024 / 1024, 1)}
+            for checkpoint in checkpoints
+        ],
+    }